@@ -1,4 +1,5 @@
-from typing import Dict, Any
+import os
+from typing import Dict, Any, Tuple
 
 try:
     # Placeholder: in a real setup load PySAD/Sintel models
@@ -6,237 +7,188 @@ try:
 except Exception:  # keep working even without numpy
     pass
 
+from analysis.rules import RULES, SEVERITY_CODE, generic_score
+from analysis.batch import FrameBatch, analyze_columns, score_columns
+from analysis.features import DerivedFeatures
+from analysis.frame import ECU_ERRORS, EMERGENCY_STOP, FUEL_LEAK, INDEX, OVERHEAT, Frame
+from analysis.sensors import SENSOR_IDS
+
+# frames of history behind the derived signals (rpm jitter, fuel leak, low fuel);
+# 1 keeps the original comparison with the single previous frame
+DERIVED_WINDOW = int(os.getenv('DERIVED_WINDOW', '1'))
+
+RPM = INDEX['rpm']
+FUEL_PRESSURE = INDEX['fuel_pressure']
+OIL_PRESSURE = INDEX['oil_pressure']
+VOLTAGE = INDEX['voltage']
+VIBRATION = INDEX['vibration']
+COOLANT_TEMP = INDEX['engine_temp_coolant']
+OIL_TEMP = INDEX['oil_temp']
+COOLANT_PRESSURE = INDEX['coolant_pressure']
+FUEL_LEVEL = INDEX['fuel_level']
+FUEL_CONSUMPTION = INDEX['fuel_consumption']
+# sensors that must all be normal for an emergency stop to clear
+STABLE = (OIL_PRESSURE, COOLANT_TEMP, VOLTAGE, VIBRATION, FUEL_PRESSURE)
+# risk probability of ecu_errors / overheat by severity code
+_DERIVED_PROB = (0.05, 0.6, 0.9)
+
 
 class RiskAnalyzer:
     """
     Placeholder wrapper for PySAD / Sintel-based anomaly & risk scoring.
     Currently computes simple probabilistic-looking scores.
+    Per-sensor thresholds live in analysis.rules.BANDS and are compiled once at import.
+    With window > 1 the derived signals read rolling features (analysis.features)
+    instead of the previous frame alone.
     """
-    def __init__(self):
+    __slots__ = ('prev_frame', 'emergency_active', 'emergency_clear_streak', 'features')
+
+    def __init__(self, window: int | None = None):
         self.prev_frame = {}
         self.emergency_active = False
         self.emergency_clear_streak = 0
+        window = DERIVED_WINDOW if window is None else window
+        self.features = DerivedFeatures(window) if window > 1 else None
+
+    def state(self) -> Dict[str, Any]:
+        """Everything analyze_frame carries between frames (see load())."""
+        return {
+            'prev_frame': dict(self.prev_frame),
+            'emergency_active': self.emergency_active,
+            'emergency_clear_streak': self.emergency_clear_streak,
+            'features': self.features.state() if self.features is not None else None,
+        }
+
+    def load(self, state: Dict[str, Any]) -> None:
+        """Continue from a state(); rolling features are kept only if this analyzer uses them."""
+        self.prev_frame = dict(state.get('prev_frame') or {})
+        self.emergency_active = bool(state.get('emergency_active'))
+        self.emergency_clear_streak = int(state.get('emergency_clear_streak') or 0)
+        feats = state.get('features')
+        if self.features is not None and feats:
+            self.features.load(feats)
+
+    @staticmethod
+    def _classify(s_id: str, sensor: Dict[str, Any], value: Any, prev_frame: Dict[str, Any]) -> Tuple[str, float]:
+        rule = RULES.get(s_id)
+        res = rule.classify(value, prev_frame) if rule is not None else None
+        return res if res is not None else generic_score(sensor, value)
 
     def score(self, sensor: Dict[str, Any]) -> Dict[str, Any]:
         s_id = str(sensor.get('id'))
-        value = sensor.get('value')
-
-        def resp(sev: str, p: float) -> Dict[str, Any]:
-            return { 'id': s_id, 'severity': sev, 'risk_probability': round(float(max(0.0, min(1.0, p))), 3) }
-
-        if s_id == 'rpm' and isinstance(value, (int, float)):
-            # Assume genset nominal 1500 rpm (50 Hz). Idle band: 600–800.
-            nominal = 1500.0
-            dev = abs(value - nominal) / nominal
-            if 600 <= value <= 800:
-                return resp('normal', 0.05)
-            if dev <= 0.08:
-                return resp('normal', 0.1)
-            if dev <= 0.12:
-                return resp('warning', 0.5)
-            return resp('critical', 0.9)
-
-        if s_id == 'engine_temp_coolant' and isinstance(value, (int, float)):
-            if 80 <= value <= 95:
-                return resp('normal', 0.05)
-            if 96 <= value <= 104:
-                return resp('warning', 0.5)
-            if value >= 105:
-                return resp('critical', 0.92 if value >= 110 else 0.8)
-            return resp('warning', 0.4)
-
-        if s_id == 'oil_temp' and isinstance(value, (int, float)):
-            if 80 <= value <= 110:
-                return resp('normal', 0.05)
-            if 111 <= value <= 120:
-                return resp('warning', 0.6)
-            if value >= 121:
-                return resp('critical', 0.92 if value >= 130 else 0.82)
-            return resp('warning', 0.4)
-
-        if s_id == 'oil_pressure' and isinstance(value, (int, float)):
-            # Норма 2.5–5.0; предупреждение рядом с границами; критика только при явных выходах
-            if 2.5 <= value <= 5.0:
-                return resp('normal', 0.06)
-            if (2.0 <= value < 2.5) or (5.0 < value <= 6.0):
-                return resp('warning', 0.5)
-            if value < 1.5 or value > 7.0:
-                return resp('critical', 0.9)
-            return resp('warning', 0.6)
-
-        if s_id == 'fuel_pressure' and isinstance(value, (int, float)):
-            if 2.5 <= value <= 5.0:
-                return resp('normal', 0.06)
-            if (2.0 <= value < 2.5) or (5.0 < value <= 6.0):
-                return resp('warning', 0.5)
-            if value < 1.8 or value > 7.0:
-                return resp('critical', 0.9)
-            return resp('warning', 0.6)
-
-        if s_id == 'fuel_level' and isinstance(value, (int, float)):
-            if value >= 30:
-                return resp('normal', 0.05)
-            if 15 <= value < 30:
-                return resp('warning', 0.5)
-            return resp('critical', 0.9)
-
-        if s_id == 'fuel_consumption' and isinstance(value, (int, float)):
-            # Контекст нагрузки по RPM: до ~1300 считаем низкой/средней, выше — высокой
-            rpm = self.prev_frame.get('rpm')
-            if isinstance(rpm, (int, float)) and rpm >= 1300:
-                if value <= 120:
-                    return resp('normal', 0.08)
-                if value <= 140:
-                    return resp('warning', 0.55)
-                return resp('critical', 0.9)
-            else:
-                if value <= 40:
-                    return resp('normal', 0.08)
-                if value <= 60:
-                    return resp('warning', 0.55)
-                return resp('critical', 0.9)
-
-        if s_id == 'voltage' and isinstance(value, (int, float)):
-            # 24V system typical
-            if (24.0 <= value <= 25.5) or (27.2 <= value <= 28.4):
-                return resp('normal', 0.06)
-            if (22.5 <= value < 24.0) or (28.5 <= value <= 29.5):
-                return resp('warning', 0.55)
-            return resp('critical', 0.9)
-
-        if s_id == 'current' and isinstance(value, (int, float)):
-            if 10 <= value <= 150:
-                return resp('normal', 0.08)
-            if 150 < value <= 220:
-                return resp('warning', 0.55)
-            return resp('critical', 0.9)
-
-        if s_id == 'ecu_errors':
-            # numeric 0/1 or bool
-            is_crit = (value is True) or (isinstance(value, (int, float)) and value >= 2)
-            if is_crit:
-                return resp('critical', 0.92)
-            has_warn = (isinstance(value, (int, float)) and value == 1)
-            if has_warn:
-                return resp('warning', 0.6)
-            return resp('normal', 0.05)
-
-        if s_id in ('fuel_leak', 'oil_leak'):
-            if bool(value):
-                return resp('critical', 0.97)
-            return resp('normal', 0.03)
-
-        if s_id == 'coolant_pressure' and isinstance(value, (int, float)):
-            if 0.8 <= value <= 1.5:
-                return resp('normal', 0.06)
-            if (0.6 <= value < 0.8) or (1.5 < value <= 1.8):
-                return resp('warning', 0.55)
-            return resp('critical', 0.9)
-
-        if s_id == 'overheat':
-            # bool or temperature-like value
-            if isinstance(value, (int, float)):
-                if value <= 110:
-                    return resp('normal', 0.05)
-                if value <= 120:
-                    return resp('warning', 0.6)
-                return resp('critical', 0.92)
-            else:
-                if bool(value):
-                    return resp('critical', 0.95)
-                return resp('normal', 0.03)
-
-        if s_id == 'vibration' and isinstance(value, (int, float)):
-            if 0.1 <= value <= 3.0:
-                return resp('normal', 0.08)
-            if 3.0 < value <= 5.0:
-                return resp('warning', 0.6)
-            return resp('critical', 0.9)
-
-        if s_id == 'emergency_stop':
-            if bool(value):
-                return resp('critical', 0.99)
-            return resp('normal', 0.02)
-
-        # Fallback generic numeric/bool handling
-        if isinstance(value, (int, float)):
-            vmin = sensor.get('min', 0) or 0
-            vmax = sensor.get('max', 1) or 1
-            span = max(1e-6, vmax - vmin)
-            dist = min(abs(value - vmin), abs(vmax - value)) / span
-            p = max(0.0, 1.0 - 2.0 * dist)
-            sev = 'critical' if p > 0.85 else 'warning' if p > 0.6 else 'normal'
-            return resp(sev, p)
-        if isinstance(value, bool):
-            return resp('critical' if value else 'normal', 0.95 if value else 0.05)
-        return resp('normal', 0.1)
+        res = self._classify(s_id, sensor, sensor.get('value'), self.prev_frame)
+        return { 'id': s_id, 'severity': res[0], 'risk_probability': res[1] }
+
+    def score_batch(self, columns: Dict[str, Any], meta: Dict[str, Dict[str, Any]] | None = None) -> Dict[str, Any]:
+        """
+        Columnar score(): {sensor_id: array} -> {sensor_id: (severity codes int8, probabilities)}.
+        Every value is scored on its own, with the current prev_frame as load context.
+        """
+        return score_columns(columns, self.prev_frame.get('rpm'), meta)
+
+    def analyze_frames(self, columns: Dict[str, Any], meta: Dict[str, Dict[str, Any]] | None = None) -> FrameBatch:
+        """
+        Columnar analyze_frame(): one array per sensor id, one row per timestamp.
+        Gives the same per-row result as calling analyze_frame row by row.
+        """
+        return analyze_columns(self, columns, meta)
 
     def analyze_frame(self, sensors: list[Dict[str, Any]]) -> list[Dict[str, Any]]:
-        # Build map by id for convenience
-        by_id = { str(s.get('id')): s for s in sensors if isinstance(s, dict) and s.get('id') }
+        return self.analyze(sensors).to_dicts()
+
+    def analyze(self, sensors: list[Dict[str, Any]]) -> Frame:
+        """analyze_frame() into a Frame: scores and derived signals by slot, no per-sensor dicts."""
+        frame = Frame.from_sensors(sensors)
+        values, codes, probs = frame.values, frame.codes, frame.probs
+        prev = self.prev_frame
+        classify = self._classify
 
         # Score base sensors first
-        scored = {}
-        for sid, s in by_id.items():
+        for i in frame.order:
+            if i < 0:
+                rec = frame.extra[-1 - i]
+                s = rec[0]
+                s_id, value = str(s.get('id')), s.get('value')
+            else:
+                s = frame.sensors[i]
+                s_id, value = SENSOR_IDS[i], values[i]
             try:
-                scored[sid] = self.score(s)
+                sev, prob = classify(s_id, s, value, prev)
+                code = SEVERITY_CODE[sev]
             except Exception:
-                scored[sid] = { 'id': sid, 'severity': 'normal', 'risk_probability': 0.1 }
+                code, prob = 0, 0.1
+            if i < 0:
+                rec[1], rec[2] = code, prob
+            else:
+                codes[i], probs[i] = code, prob
 
-        # Helper getters
-        def num(id_: str, default=None):
-            v = by_id.get(id_, {}).get('value')
+        # Helper getter
+        def num(i: int, default=None):
+            v = values[i]
             return v if isinstance(v, (int, float)) else default
 
-        rpm = num('rpm', 0.0)
-        fuel_p = num('fuel_pressure')
-        oil_p = num('oil_pressure')
-        volt = num('voltage')
-        vib = num('vibration')
-        cool_t = num('engine_temp_coolant')
-        oil_t = num('oil_temp')
-        cool_p = num('coolant_pressure')
-        fuel_level_now = num('fuel_level')
-        cons = num('fuel_consumption', 0.0)  # l/h approx
+        rpm = num(RPM, 0.0)
+        fuel_p = num(FUEL_PRESSURE)
+        oil_p = num(OIL_PRESSURE)
+        volt = num(VOLTAGE)
+        vib = num(VIBRATION)
+        cool_t = num(COOLANT_TEMP)
+        oil_t = num(OIL_TEMP)
+        cool_p = num(COOLANT_PRESSURE)
+        fuel_level_now = num(FUEL_LEVEL)
+        cons = num(FUEL_CONSUMPTION, 0.0)  # l/h approx
 
-        prev = self.prev_frame
         rpm_prev = prev.get('rpm')
         fuel_level_prev = prev.get('fuel_level')
 
+        # rpm swing and fuel level drop per frame: rolling features, or the previous frame alone
+        feats = self.features
+        if feats is not None:
+            feats.update(rpm, fuel_level_now if isinstance(fuel_level_now, (int, float)) else None, cons)
+            rpm_swing = feats.rpm_jitter()
+            fuel_drop = feats.fuel_drop()
+            cons_ref = feats.consumption.value
+        else:
+            rpm_swing = abs(rpm - rpm_prev) if isinstance(rpm, (int, float)) and isinstance(rpm_prev, (int, float)) else None
+            fuel_drop = (fuel_level_prev - fuel_level_now
+                         if isinstance(fuel_level_prev, (int, float)) and isinstance(fuel_level_now, (int, float)) else None)
+            cons_ref = cons
+
         # Compute anomalies count for ecu_errors according to rules
+        # (a code >= 1 is warning or critical; a sensor the frame lacks is ABSENT)
         anomalies = 0
         # fuel pressure outside normal
-        if scored.get('fuel_pressure', {}).get('severity') in ('warning', 'critical'):
+        fuel_p_bad = codes[FUEL_PRESSURE] >= 1
+        if fuel_p_bad:
             anomalies += 1
         # too low oil pressure for current RPM
         if isinstance(oil_p, (int, float)) and isinstance(rpm, (int, float)):
             if rpm >= 1200 and oil_p < 2.0:
                 anomalies += 1
         # voltage deviation
-        if scored.get('voltage', {}).get('severity') in ('warning', 'critical'):
+        if codes[VOLTAGE] >= 1:
             anomalies += 1
         # strong RPM jitter with low fuel pressure
-        if isinstance(rpm, (int, float)) and isinstance(rpm_prev, (int, float)):
-            if fuel_p is not None and scored.get('fuel_pressure', {}).get('severity') in ('warning', 'critical'):
-                if abs(rpm - rpm_prev) > 150:
+        if rpm_swing is not None:
+            if fuel_p is not None and fuel_p_bad:
+                if rpm_swing > 150:
                     anomalies += 1
         # too cold coolant at high load
         if isinstance(cool_t, (int, float)) and isinstance(rpm, (int, float)) and isinstance(cons, (int, float)):
             if cool_t < 70 and rpm > 1300 and cons > 20:
                 anomalies += 1
 
-        ecu_errors_val = anomalies
         # 0 — норм; 1–2 — внимание; >=3 — авария
-        ecu_errors_sev = 'normal' if anomalies == 0 else ('warning' if anomalies <= 2 else 'critical')
+        ecu_errors_code = 0 if anomalies == 0 else (1 if anomalies <= 2 else 2)
 
         # Fuel leak detection by fuel level drop beyond expected
         fuel_leak_val = None
-        if isinstance(fuel_level_prev, (int, float)) and isinstance(fuel_level_now, (int, float)):
-            drop = fuel_level_prev - fuel_level_now
+        if fuel_drop is not None:
+            drop = fuel_drop
             # более консервативные пороги: критично при >3%, предупреждение при >1.2% и малом расходе
             if drop > 3.0:
                 fuel_leak_val = 'critical'
-            elif drop > 1.2 and (cons is None or cons < 10):
+            elif drop > 1.2 and (cons_ref is None or cons_ref < 10):
                 fuel_leak_val = 'warning'
             else:
                 fuel_leak_val = 'normal'
@@ -247,14 +199,14 @@ class RiskAnalyzer:
 
         # Overheat determination
         overheat_val = False
-        overheat_sev = 'normal'
+        overheat_code = 0
         if (isinstance(cool_t, (int, float)) and cool_t >= 105) or (isinstance(oil_t, (int, float)) and oil_t >= 121):
             overheat_val = True
-            overheat_sev = 'critical' if (cool_t and cool_t >= 110) or (oil_t and oil_t >= 130) else 'warning'
+            overheat_code = 2 if (cool_t and cool_t >= 110) or (oil_t and oil_t >= 130) else 1
         if isinstance(cool_p, (int, float)) and isinstance(cool_t, (int, float)):
             if cool_p > 1.5 and cool_t > 100:
                 overheat_val = True
-                overheat_sev = 'critical'
+                overheat_code = 2
 
         # Emergency stop logic with auto-clear after stabilization
         emergency = self.emergency_active
@@ -263,16 +215,16 @@ class RiskAnalyzer:
         extreme_temp = isinstance(cool_t, (int, float)) and cool_t >= 125
         extreme_volt = isinstance(volt, (int, float)) and (volt < 22.0 or volt > 30.0)
         extreme_vib = isinstance(vib, (int, float)) and vib > 6.5
-        low_fuel = isinstance(fuel_level_now, (int, float)) and fuel_level_now < 15
+        # the rolling max is None after a non-finite level broke the series
+        level_max = fuel_level_now if feats is None else feats.level_max.max()
+        low_fuel = isinstance(fuel_level_now, (int, float)) and level_max is not None and level_max < 15
         confirmed_leak = bool(fuel_leak_val)
-        triggers = [extreme_oil, extreme_temp, extreme_volt, extreme_vib, (confirmed_leak and low_fuel)]
-        if any(triggers):
+        if extreme_oil or extreme_temp or extreme_volt or extreme_vib or (confirmed_leak and low_fuel):
             emergency = True
             self.emergency_clear_streak = 0
         else:
             # count consecutive stable frames to clear
-            all_normal = all(scored.get(k, {}).get('severity') == 'normal' for k in (
-                'oil_pressure', 'engine_temp_coolant', 'voltage', 'vibration', 'fuel_pressure')) and not confirmed_leak
+            all_normal = all(codes[i] == 0 for i in STABLE) and not confirmed_leak
             if all_normal:
                 self.emergency_clear_streak += 1
                 if self.emergency_clear_streak >= 2:
@@ -283,39 +235,17 @@ class RiskAnalyzer:
 
         self.emergency_active = emergency
 
-        # Build enriched output
-        enriched = []
-        for sid, s in by_id.items():
-            base = { **s }
-            sev = scored.get(sid, {}).get('severity', 'normal')
-            prob = scored.get(sid, {}).get('risk_probability', 0.1)
-            base['severity'] = sev
-            base['risk_probability'] = prob
-            enriched.append(base)
-
         # Override or append derived signals
-        def set_or_add(id_, value, severity, prob):
-            found = False
-            for it in enriched:
-                if it.get('id') == id_:
-                    it['value'] = value
-                    it['severity'] = severity
-                    it['risk_probability'] = prob
-                    found = True
-                    break
-            if not found:
-                enriched.append({ 'id': id_, 'type': id_, 'value': value, 'severity': severity, 'risk_probability': prob })
-
-        set_or_add('ecu_errors', ecu_errors_val, ecu_errors_sev, 0.9 if ecu_errors_sev == 'critical' else (0.6 if ecu_errors_sev == 'warning' else 0.05))
+        frame.set(ECU_ERRORS, anomalies, ecu_errors_code, _DERIVED_PROB[ecu_errors_code])
         # fuel_leak: различаем warning/critical
         if fuel_leak_val == 'critical':
-            set_or_add('fuel_leak', True, 'critical', 0.97)
+            frame.set(FUEL_LEAK, True, 2, 0.97)
         elif fuel_leak_val == 'warning':
-            set_or_add('fuel_leak', True, 'warning', 0.6)
+            frame.set(FUEL_LEAK, True, 1, 0.6)
         else:
-            set_or_add('fuel_leak', False, 'normal', 0.03)
-        set_or_add('overheat', bool(overheat_val), overheat_sev, 0.9 if overheat_sev == 'critical' else (0.6 if overheat_sev == 'warning' else 0.05))
-        set_or_add('emergency_stop', bool(emergency), 'critical' if emergency else 'normal', 0.99 if emergency else 0.02)
+            frame.set(FUEL_LEAK, False, 0, 0.03)
+        frame.set(OVERHEAT, bool(overheat_val), overheat_code, _DERIVED_PROB[overheat_code])
+        frame.set(EMERGENCY_STOP, bool(emergency), 2 if emergency else 0, 0.99 if emergency else 0.02)
 
         # Save state for next frame
         self.prev_frame = {
@@ -324,6 +254,37 @@ class RiskAnalyzer:
             'fuel_leak': bool(fuel_leak_val),
         }
 
-        return enriched
+        return frame
 
 
+def carries_trigger(sensors: list[Dict[str, Any]], prev_fuel_level: Any = None) -> bool:
+    """
+    Whether a raw frame raises fuel_leak, overheat or emergency_stop on its own: the
+    frame reports one of those flags, or a reading crosses the trigger thresholds of
+    RiskAnalyzer.analyze (for the leak: a fuel level drop against prev_fuel_level
+    beyond the warning threshold). No unit state, so a latched emergency or windowed
+    features do not count; admission control keeps such frames when it coalesces.
+    """
+    v = { s.get('id'): s.get('value') for s in sensors if isinstance(s, dict) }
+    for flag in ('fuel_leak', 'overheat', 'emergency_stop'):
+        x = v.get(flag)
+        if x is True or (isinstance(x, (int, float)) and x > 0):
+            return True
+
+    def num(sid: str):
+        x = v.get(sid)
+        return x if isinstance(x, (int, float)) and not isinstance(x, bool) else None
+
+    cool_t, oil_t, cool_p = num('engine_temp_coolant'), num('oil_temp'), num('coolant_pressure')
+    oil_p, volt, vib, level = num('oil_pressure'), num('voltage'), num('vibration'), num('fuel_level')
+    # overheat (cool_t >= 125 for the emergency stop is covered by the first test)
+    if (cool_t is not None and cool_t >= 105) or (oil_t is not None and oil_t >= 121):
+        return True
+    if cool_p is not None and cool_t is not None and cool_p > 1.5 and cool_t > 100:
+        return True
+    # emergency stop
+    if (oil_p is not None and oil_p < 1.0) or (volt is not None and (volt < 22.0 or volt > 30.0)) \
+            or (vib is not None and vib > 6.5):
+        return True
+    # fuel leak
+    return level is not None and isinstance(prev_fuel_level, (int, float)) and prev_fuel_level - level > 1.2
@@ -0,0 +1,272 @@
+from typing import Dict, Any, Iterator, List, Optional
+
+try:
+    import numpy as np
+except Exception:  # the columnar API is optional, per-frame scoring works without numpy
+    np = None
+
+from analysis.rules import RULES, SEVERITIES, SEVERITY_CODE, generic_score_array
+
+DERIVED_IDS = ('ecu_errors', 'fuel_leak', 'overheat', 'emergency_stop')
+
+_P_ECU = (0.05, 0.6, 0.9)
+_P_OVERHEAT = (0.05, 0.6, 0.9)
+
+
+class FrameBatch:
+    """
+    Columnar result of RiskAnalyzer.analyze_frames: one array per sensor id and row.
+    Severity is an int8 code into SEVERITIES; ids keep analyze_frame output order.
+    """
+
+    def __init__(self, ids: List[str], values: Dict[str, Any], severity: Dict[str, Any],
+                 risk_probability: Dict[str, Any], rows: int, appended=()):
+        self.ids = ids
+        self.appended = set(appended)
+        self.values = values
+        self.severity = severity
+        self.risk_probability = risk_probability
+        self.rows = rows
+
+    def __len__(self) -> int:
+        return self.rows
+
+    def counts(self) -> Dict[str, Dict[str, int]]:
+        """Per-sensor severity histogram over all rows."""
+        out = {}
+        for sid in self.ids:
+            hist = np.bincount(self.severity[sid].astype(np.int64) + 1, minlength=4)
+            out[sid] = { name: int(hist[i + 1]) for i, name in enumerate(SEVERITIES) }
+        return out
+
+    def frames(self, meta: Optional[Dict[str, Dict[str, Any]]] = None) -> Iterator[List[Dict[str, Any]]]:
+        """Lazily rebuild analyze_frame-shaped dict lists, one list per row."""
+        meta = meta or {}
+        cols = [(sid, self.values[sid].tolist(), self.severity[sid].tolist(),
+                 self.risk_probability[sid].tolist(),
+                 { 'type': sid } if sid in self.appended else meta.get(sid, {})) for sid in self.ids]
+        for i in range(self.rows):
+            frame = []
+            for sid, vals, sevs, probs, m in cols:
+                item = { 'id': sid, **m }
+                item['value'] = vals[i]
+                item['severity'] = SEVERITIES[sevs[i]]
+                item['risk_probability'] = probs[i]
+                frame.append(item)
+            yield frame
+
+
+def _require_numpy():
+    if np is None:
+        raise RuntimeError('numpy is required for batch scoring')
+
+
+def _columns(columns: Dict[str, Any]) -> Dict[str, Any]:
+    out = {}
+    for sid, col in columns.items():
+        arr = np.asarray(col)
+        if arr.ndim != 1 or arr.dtype.kind not in 'biuf':
+            raise TypeError(f'column {sid!r} must be a 1-D bool or numeric array')
+        out[str(sid)] = arr
+    n = { len(a) for a in out.values() }
+    if len(n) > 1:
+        raise ValueError('all columns must have the same length')
+    return out
+
+
+def score_columns(columns: Dict[str, Any], prev_rpm=None,
+                  meta: Optional[Dict[str, Dict[str, Any]]] = None) -> Dict[str, Any]:
+    """Score every value of every column independently, like RiskAnalyzer.score does."""
+    _require_numpy()
+    meta = meta or {}
+    out = {}
+    for sid, col in _columns(columns).items():
+        rule = RULES.get(sid)
+        res = rule.classify_array(col, prev_rpm) if rule is not None else None
+        if res is None:
+            m = meta.get(sid, {})
+            res = generic_score_array(col, m.get('min', 0), m.get('max', 1))
+        out[sid] = res
+    return out
+
+
+def _num(x) -> bool:
+    return isinstance(x, (int, float))
+
+
+def _analyze_rows(analyzer, cols: Dict[str, Any], meta: Dict[str, Dict[str, Any]], ids: List[str],
+                  appended: List[str], n: int) -> FrameBatch:
+    """
+    Row-by-row analyze_frame for analyzers with rolling-window features, whose
+    state is not modeled by the vectorized path; same FrameBatch result shape.
+    """
+    lists = { sid: c.tolist() for sid, c in cols.items() }
+    values = { sid: [] for sid in ids }
+    severity = { sid: [] for sid in ids }
+    probability = { sid: [] for sid in ids }
+    for i in range(n):
+        frame = [{ 'id': sid, **meta.get(sid, {}), 'value': col[i] } for sid, col in lists.items()]
+        for s in analyzer.analyze_frame(frame):
+            sid = s['id']
+            values[sid].append(s['value'])
+            severity[sid].append(SEVERITY_CODE[s['severity']])
+            probability[sid].append(s['risk_probability'])
+    return FrameBatch(
+        ids,
+        { sid: np.asarray(v, dtype=cols[sid].dtype if sid in cols else None) for sid, v in values.items() },
+        { sid: np.asarray(v, dtype=np.int8) for sid, v in severity.items() },
+        { sid: np.asarray(v, dtype=np.float64) for sid, v in probability.items() },
+        n, appended)
+
+
+def analyze_columns(analyzer, columns: Dict[str, Any],
+                    meta: Optional[Dict[str, Dict[str, Any]]] = None) -> FrameBatch:
+    """
+    Vectorized RiskAnalyzer.analyze_frame over rows of a columnar frame table.
+    Each row is one frame with every given column present; analyzer state
+    (prev_frame, emergency latch and clear streak) is read before and written after.
+    """
+    _require_numpy()
+    cols = _columns(columns)
+    n = len(next(iter(cols.values()))) if cols else 0
+    appended = [d for d in DERIVED_IDS if d not in cols]
+    ids = list(cols) + appended
+    if n == 0:
+        empty = { sid: np.empty(0) for sid in ids }
+        return FrameBatch(ids, empty, { sid: np.empty(0, dtype=np.int8) for sid in ids }, empty, 0, appended)
+    if getattr(analyzer, 'features', None) is not None:
+        return _analyze_rows(analyzer, cols, meta or {}, ids, appended, n)
+
+    prev = analyzer.prev_frame
+    f64 = { sid: c.astype(np.float64, copy=False) for sid, c in cols.items() }
+    rpm = f64.get('rpm', np.zeros(n))
+    cons = f64.get('fuel_consumption', np.zeros(n))
+
+    # previous-row rpm as load context; first row takes it from the analyzer state
+    rpm_prev0 = prev.get('rpm')
+    has_rpm_prev0 = _num(rpm_prev0)
+    rpm_prev = np.empty(n)
+    rpm_prev[0] = rpm_prev0 if has_rpm_prev0 else np.nan
+    rpm_prev[1:] = rpm[:-1]
+
+    scored = score_columns(cols, rpm_prev, meta)
+
+    def sev(sid):
+        return scored[sid][0] if sid in scored else None
+
+    def bad(sid):
+        s = sev(sid)
+        return s >= 1 if s is not None else np.zeros(n, dtype=bool)
+
+    fuel_p = f64.get('fuel_pressure')
+    oil_p = f64.get('oil_pressure')
+    volt = f64.get('voltage')
+    vib = f64.get('vibration')
+    cool_t = f64.get('engine_temp_coolant')
+    oil_t = f64.get('oil_temp')
+    cool_p = f64.get('coolant_pressure')
+    fuel_now = f64.get('fuel_level')
+    false = np.zeros(n, dtype=bool)
+
+    # ecu_errors anomaly count
+    anomalies = bad('fuel_pressure').astype(np.int64)
+    if oil_p is not None:
+        anomalies += (rpm >= 1200) & (oil_p < 2.0)
+    anomalies += bad('voltage')
+    if fuel_p is not None:
+        jitter = bad('fuel_pressure') & (np.abs(rpm - rpm_prev) > 150)
+        if not has_rpm_prev0:
+            jitter[0] = False
+        anomalies += jitter
+    if cool_t is not None:
+        anomalies += (cool_t < 70) & (rpm > 1300) & (cons > 20)
+    ecu_sev = np.where(anomalies == 0, 0, np.where(anomalies <= 2, 1, 2)).astype(np.int8)
+
+    # fuel_leak by level drop against the previous row
+    leak_sev = np.zeros(n, dtype=np.int8)
+    prev_leak = bool(prev.get('fuel_leak')) if prev.get('fuel_leak') is not None else False
+    if fuel_now is not None:
+        fuel_prev0 = prev.get('fuel_level')
+        has_pair = np.ones(n, dtype=bool)
+        has_pair[0] = _num(fuel_prev0)
+        fuel_prev = np.empty(n)
+        fuel_prev[0] = fuel_prev0 if has_pair[0] else np.nan
+        fuel_prev[1:] = fuel_now[:-1]
+        drop = fuel_prev - fuel_now
+        leak_sev = np.where(drop > 3.0, 2, np.where((drop > 1.2) & (cons < 10), 1, 0)).astype(np.int8)
+        leak_sev[~has_pair] = 0
+        # any computed verdict (even 'normal') counts as a confirmed leak downstream
+        confirmed = has_pair.copy()
+        confirmed[0] = has_pair[0] or prev_leak
+    else:
+        confirmed = np.full(n, prev_leak)
+    leak_p = np.where(leak_sev == 2, 0.97, np.where(leak_sev == 1, 0.6, 0.03))
+
+    # overheat
+    hot = false.copy()
+    very_hot = false.copy()
+    if cool_t is not None:
+        hot |= cool_t >= 105
+        very_hot |= cool_t >= 110
+    if oil_t is not None:
+        hot |= oil_t >= 121
+        very_hot |= oil_t >= 130
+    over_sev = np.where(hot, np.where(very_hot, 2, 1), 0).astype(np.int8)
+    if cool_p is not None and cool_t is not None:
+        boiling = (cool_p > 1.5) & (cool_t > 100)
+        hot |= boiling
+        over_sev[boiling] = 2
+
+    # emergency latch with auto-clear after two stable rows
+    trig = false.copy()
+    if oil_p is not None:
+        trig |= oil_p < 1.0
+    if cool_t is not None:
+        trig |= cool_t >= 125
+    if volt is not None:
+        trig |= (volt < 22.0) | (volt > 30.0)
+    if vib is not None:
+        trig |= vib > 6.5
+    if fuel_now is not None:
+        trig |= confirmed & (fuel_now < 15)
+    stable = ~confirmed
+    for k in ('oil_pressure', 'engine_temp_coolant', 'voltage', 'vibration', 'fuel_pressure'):
+        s = sev(k)
+        stable &= (s == 0) if s is not None else false
+    stable &= ~trig
+    # position inside each run of stable rows, the first run continues the stored streak
+    csum = np.cumsum(stable)
+    run_base = np.maximum.accumulate(np.where(stable, 0, csum))
+    k = csum - run_base
+    carry = np.where(np.cumsum(~stable) == 0, analyzer.emergency_clear_streak, 0)
+    streak = k + carry
+    cleared = stable & (streak % 2 == 0)
+    event = np.where(trig, 1, np.where(cleared, 0, -1))
+    last = np.maximum.accumulate(np.where(event >= 0, np.arange(n), -1))
+    emergency = np.where(last >= 0, event[np.maximum(last, 0)] == 1, analyzer.emergency_active)
+
+    values = dict(cols)
+    severity = { sid: scored[sid][0] for sid in cols }
+    probability = { sid: scored[sid][1] for sid in cols }
+    values['ecu_errors'] = anomalies
+    severity['ecu_errors'] = ecu_sev
+    probability['ecu_errors'] = np.take(_P_ECU, ecu_sev)
+    values['fuel_leak'] = leak_sev > 0
+    severity['fuel_leak'] = leak_sev
+    probability['fuel_leak'] = leak_p
+    values['overheat'] = hot
+    severity['overheat'] = over_sev
+    probability['overheat'] = np.take(_P_OVERHEAT, over_sev)
+    values['emergency_stop'] = emergency
+    severity['emergency_stop'] = np.where(emergency, 2, 0).astype(np.int8)
+    probability['emergency_stop'] = np.where(emergency, 0.99, 0.02)
+
+    # Save state for the next frame / batch
+    analyzer.emergency_active = bool(emergency[-1])
+    analyzer.emergency_clear_streak = int(streak[-1] % 2) if stable[-1] else 0
+    analyzer.prev_frame = {
+        'rpm': rpm[-1].item() if 'rpm' in cols else 0.0,
+        'fuel_level': fuel_now[-1].item() if fuel_now is not None else None,
+        'fuel_leak': bool(confirmed[-1]),
+    }
+    return FrameBatch(ids, values, severity, probability, n, appended)
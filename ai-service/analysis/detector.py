@@ -0,0 +1,199 @@
+import math
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+
+try:
+    import numpy as np
+except Exception:  # optional: the batched update falls back to one frame at a time
+    np = None
+
+from analysis.rules import BANDS
+
+# Continuous sensors the streaming model learns; flags and derived signals stay rule-only.
+MODELED_IDS = frozenset(sid for sid, spec in BANDS.items() if 'flag' not in spec)
+
+# mean absolute deviation -> standard deviation for a normal distribution
+_MAD_TO_SIGMA = math.sqrt(math.pi / 2.0)
+
+
+class RobustZ:
+    """
+    Exponentially weighted location/scale of one sensor. Residuals are clipped at
+    clip * scale before they update the state, so a burst of outliers moves the
+    baseline only a bounded amount. O(1) time and three floats of state.
+    """
+    __slots__ = ('n', 'mean', 'mad')
+
+    def __init__(self, n: int = 0, mean: float = 0.0, mad: float = 0.0):
+        self.n = n
+        self.mean = mean
+        self.mad = mad
+
+    def scale(self) -> float:
+        return max(self.mad * _MAD_TO_SIGMA, 1e-6 + 1e-4 * abs(self.mean))
+
+    def z(self, x: float) -> float:
+        return abs(x - self.mean) / self.scale()
+
+    def update(self, x: float, alpha: float, clip: float, warmup: int) -> float:
+        """Score x against the state before it, then learn from x; returns the z-score."""
+        if self.n == 0:
+            self.n = 1
+            self.mean = x
+            return 0.0
+        r = x - self.mean
+        sc = self.scale()
+        z = abs(r) / sc
+        self.n += 1
+        a = max(alpha, 1.0 / self.n)
+        if self.n > warmup:
+            lim = clip * sc
+            r = lim if r > lim else (-lim if r < -lim else r)
+        self.mean += a * r
+        self.mad += a * (abs(r) - self.mad)
+        return z
+
+
+def chi2_cdf(x: float, k: int) -> float:
+    """Wilson-Hilferty approximation of the chi-square CDF with k degrees of freedom."""
+    if x <= 0 or k <= 0:
+        return 0.0
+    h = 2.0 / (9.0 * k)
+    t = ((x / k) ** (1.0 / 3.0) - (1.0 - h)) / math.sqrt(h)
+    return 0.5 * math.erfc(-t / math.sqrt(2.0))
+
+
+class OnlineDetector:
+    """
+    Streaming anomaly model of one unit: a RobustZ per continuous sensor, combined
+    into a multivariate score (sum of squared z ~ chi-square with one degree of
+    freedom per warm sensor). Memory is bounded by the number of sensor ids.
+    """
+    __slots__ = ('models', 'alpha', 'clip', 'warmup', '__weakref__')
+
+    def __init__(self, alpha: float = 0.01, clip: float = 4.0, warmup: int = 50):
+        self.models: Dict[str, RobustZ] = {}
+        self.alpha = alpha
+        self.clip = clip
+        self.warmup = warmup
+
+    def _model(self, sid: Any, v: Any) -> Optional[RobustZ]:
+        """The model that learns v, created on first use; None if v is not a modeled reading."""
+        if sid not in MODELED_IDS or isinstance(v, bool) or not isinstance(v, (int, float)) or not math.isfinite(v):
+            return None
+        m = self.models.get(sid)
+        if m is None:
+            m = self.models[sid] = RobustZ()
+        return m
+
+    def update(self, values: Iterable[Tuple[str, Any]]) -> Tuple[Dict[str, float], float]:
+        """
+        Feed one frame of (sensor id, value); returns z-scores of warm sensors and the
+        multivariate tail probability of the frame (0.0 until some sensor is warm).
+        """
+        zs: Dict[str, float] = {}
+        for sid, v in values:
+            m = self._model(sid, v)
+            if m is None:
+                continue
+            warm = m.n > self.warmup
+            z = m.update(float(v), self.alpha, self.clip, self.warmup)
+            if warm:
+                zs[sid] = z
+        if not zs:
+            return zs, 0.0
+        return zs, chi2_cdf(sum(z * z for z in zs.values()), len(zs))
+
+    def score(self, sid: str, value: Any) -> Optional[float]:
+        """z-score of a single value without learning from it; None while cold."""
+        m = self.models.get(sid)
+        if (m is None or m.n <= self.warmup or isinstance(value, bool) or not isinstance(value, (int, float))
+                or not math.isfinite(value)):
+            return None
+        return m.z(float(value))
+
+    def state(self) -> Dict[str, List[float]]:
+        return { sid: [m.n, m.mean, m.mad] for sid, m in list(self.models.items()) }
+
+    def load(self, state: Dict[str, List[float]]) -> None:
+        for sid, (n, mean, mad) in state.items():
+            self.models[sid] = RobustZ(int(n), float(mean), float(mad))
+
+
+def update_many(detectors: Sequence[OnlineDetector], frames: Sequence[Iterable[Tuple[str, Any]]]
+                ) -> List[Tuple[Dict[str, float], float]]:
+    """
+    OnlineDetector.update of frames[i] on detectors[i] for a whole batch, with the
+    RobustZ arithmetic on arrays: one pass per round, where round k holds the k-th
+    reading of each model in the batch (a detector that appears twice learns its
+    frames in order). Same results as calling update() job by job; without numpy
+    that is what it does.
+    """
+    if np is None:
+        return [det.update(values) for det, values in zip(detectors, frames)]
+    rounds: List[Tuple[List[RobustZ], List[float], List[int], List[str]]] = []
+    depth: Dict[int, int] = {}
+    for i, (det, values) in enumerate(zip(detectors, frames)):
+        for sid, v in values:
+            m = det._model(sid, v)
+            if m is None:
+                continue
+            k = depth.get(id(m), 0)
+            depth[id(m)] = k + 1
+            if k == len(rounds):
+                rounds.append(([], [], [], []))
+            models, xs, jobs, sids = rounds[k]
+            models.append(m)
+            xs.append(float(v))
+            jobs.append(i)
+            sids.append(sid)
+    zs: List[Dict[str, float]] = [{} for _ in detectors]
+    for models, xs, jobs, sids in rounds:
+        det_of = [detectors[i] for i in jobs]
+        n = np.array([m.n for m in models], dtype=np.int64)
+        mean = np.array([m.mean for m in models])
+        mad = np.array([m.mad for m in models])
+        x = np.array(xs)
+        alpha = np.array([d.alpha for d in det_of])
+        clip = np.array([d.clip for d in det_of])
+        warmup = np.array([d.warmup for d in det_of])
+        first = n == 0
+        r = x - mean
+        sc = np.maximum(mad * _MAD_TO_SIGMA, 1e-6 + 1e-4 * np.abs(mean))
+        z = np.abs(r) / sc
+        n1 = n + 1
+        a = np.maximum(alpha, 1.0 / n1)
+        lim = clip * sc
+        r = np.where(n1 > warmup, np.clip(r, -lim, lim), r)
+        new_mean = np.where(first, x, mean + a * r)
+        new_mad = np.where(first, mad, mad + a * (np.abs(r) - mad))
+        warm = n > warmup
+        for m, i, sid, n_, mean_, mad_, z_, w in zip(models, jobs, sids, n1.tolist(), new_mean.tolist(),
+                                                      new_mad.tolist(), z.tolist(), warm.tolist()):
+            m.n, m.mean, m.mad = n_, mean_, mad_
+            if w:
+                zs[i][sid] = z_
+    return [(z, chi2_cdf(sum(v * v for v in z.values()), len(z)) if z else 0.0) for z in zs]
+
+
+def score_many(jobs: Sequence[Tuple[Optional[OnlineDetector], str, Any]]) -> List[Optional[float]]:
+    """OnlineDetector.score for (detector or None, sensor id, value) jobs, the z-scores as one array op."""
+    out: List[Optional[float]] = [None] * len(jobs)
+    picked, means, mads, xs = [], [], [], []
+    for i, (det, sid, value) in enumerate(jobs):
+        m = det.models.get(sid) if det is not None else None
+        if (m is None or m.n <= det.warmup or isinstance(value, bool) or not isinstance(value, (int, float))
+                or not math.isfinite(value)):
+            continue
+        if np is None:
+            out[i] = m.z(float(value))
+            continue
+        picked.append(i)
+        means.append(m.mean)
+        mads.append(m.mad)
+        xs.append(float(value))
+    if picked:
+        mean = np.array(means)
+        sc = np.maximum(np.array(mads) * _MAD_TO_SIGMA, 1e-6 + 1e-4 * np.abs(mean))
+        for i, z in zip(picked, (np.abs(np.array(xs) - mean) / sc).tolist()):
+            out[i] = z
+    return out
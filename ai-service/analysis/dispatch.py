@@ -0,0 +1,119 @@
+import threading
+import time
+from collections import deque
+from typing import Any, Callable, List, Optional, Sequence
+
+
+class _Batch:
+    """Results of one backend call, handed back to every caller that joined it."""
+    __slots__ = ('items', 'results', 'done', 'opened')
+
+    def __init__(self):
+        self.opened = time.monotonic()
+        self.items: List[Any] = []
+        self.results: Optional[Sequence[Any]] = None
+        self.done = threading.Event()
+
+
+class ScoreDispatcher:
+    """
+    Micro-batching front of a scoring backend. Request threads call call(item) and
+    block; a worker thread collects items for up to max_wait seconds after the first
+    one arrives (or until max_batch items), runs batch_fn(items) once and wakes the
+    callers. batch_fn returns one result per item, in order; a result that is an
+    exception is raised in its caller only. If batch_fn itself raises, every caller
+    of that batch gets the exception. Before start() calls are scored inline.
+    """
+
+    def __init__(self, batch_fn: Callable[[List[Any]], Sequence[Any]], max_batch: int = 64,
+                 max_wait: float = 0.002, name: str = 'score-dispatch'):
+        self.batch_fn = batch_fn
+        self.max_batch = max(1, max_batch)
+        self.max_wait = max(0.0, max_wait)
+        self.name = name
+        self._cond = threading.Condition()
+        self._pending: deque = deque()
+        self._thread: Optional[threading.Thread] = None
+        self._stop = False
+        self.batches = 0
+        self.items = 0
+        self.max_seen = 0
+
+    def start(self) -> 'ScoreDispatcher':
+        if self._thread is None:
+            self._stop = False
+            self._thread = threading.Thread(target=self._run, name=self.name, daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        with self._cond:
+            self._stop = True
+            self._cond.notify_all()
+        if self._thread is not None:
+            self._thread.join(timeout=2)
+            self._thread = None
+
+    def call(self, item: Any) -> Any:
+        if self._thread is None:
+            # not started (or stopped): score inline
+            res = self.batch_fn([item])[0]
+            if isinstance(res, BaseException):
+                raise res
+            return res
+        with self._cond:
+            pending = self._pending
+            batch = pending[-1] if pending and len(pending[-1].items) < self.max_batch else None
+            if batch is None:
+                batch = _Batch()
+                pending.append(batch)
+            idx = len(batch.items)
+            batch.items.append(item)
+            # wake the worker on the first item, and again when the batch is full
+            if idx == 0 or idx + 1 >= self.max_batch:
+                self._cond.notify()
+        batch.done.wait()
+        res = batch.results[idx]
+        if isinstance(res, BaseException):
+            raise res
+        return res
+
+    def _run(self) -> None:
+        cond = self._cond
+        while True:
+            with cond:
+                pending = self._pending
+                while not pending and not self._stop:
+                    cond.wait()
+                if not pending:
+                    return
+                batch = pending[0]
+                deadline = batch.opened + self.max_wait
+                while len(batch.items) < self.max_batch and not self._stop:
+                    left = deadline - time.monotonic()
+                    if left <= 0:
+                        break
+                    cond.wait(left)
+                pending.popleft()
+            items = batch.items
+            try:
+                results = self.batch_fn(items)
+                if len(results) != len(items):
+                    raise RuntimeError(f'batch_fn returned {len(results)} results for {len(items)} items')
+            except Exception as e:
+                results = [e] * len(items)
+            batch.results = results
+            self.batches += 1
+            self.items += len(items)
+            self.max_seen = max(self.max_seen, len(items))
+            batch.done.set()
+
+    def stats(self) -> dict:
+        return {
+            'batches': self.batches,
+            'items': self.items,
+            'avg_batch': round(self.items / self.batches, 2) if self.batches else 0.0,
+            'max_batch_seen': self.max_seen,
+            'max_batch': self.max_batch,
+            'max_wait_ms': self.max_wait * 1000.0,
+        }
@@ -0,0 +1,235 @@
+"""
+Incremental rolling-window features for the derived signals of RiskAnalyzer.
+
+Every update is O(1) (amortized for the min/max deques and the periodic resync
+of the slope sums) and every structure holds at most `window` samples, so the
+per-frame cost does not depend on the window length.
+"""
+import math
+from collections import deque
+from typing import Optional
+
+
+class Ewma:
+    """Exponentially weighted moving average; alpha=1 tracks the last sample exactly."""
+    __slots__ = ('alpha', 'value')
+
+    def __init__(self, alpha: float):
+        self.alpha = alpha
+        self.value: Optional[float] = None
+
+    def update(self, x: float) -> float:
+        v = self.value
+        self.value = x if v is None else (1.0 - self.alpha) * v + self.alpha * x
+        return self.value
+
+    def reset(self) -> None:
+        self.value = None
+
+
+class RollingStats:
+    """Mean and variance of the last `window` samples (sliding Welford update)."""
+    __slots__ = ('window', 'buf', 'mean', 'm2')
+
+    def __init__(self, window: int):
+        self.window = max(1, window)
+        self.buf: deque = deque()
+        self.mean = 0.0
+        self.m2 = 0.0
+
+    def __len__(self) -> int:
+        return len(self.buf)
+
+    def update(self, x: float) -> None:
+        buf = self.buf
+        if len(buf) < self.window:
+            buf.append(x)
+            d = x - self.mean
+            self.mean += d / len(buf)
+            self.m2 += d * (x - self.mean)
+            return
+        y = buf.popleft()
+        buf.append(x)
+        old = self.mean
+        self.mean = old + (x - y) / self.window
+        self.m2 += (x - y) * (x - self.mean + y - old)
+        if self.m2 < 0.0:
+            self.m2 = 0.0
+
+    def variance(self) -> float:
+        """Population variance of the window."""
+        return self.m2 / len(self.buf) if self.buf else 0.0
+
+    def std(self) -> float:
+        return math.sqrt(self.variance())
+
+    def reset(self) -> None:
+        self.buf.clear()
+        self.mean = self.m2 = 0.0
+
+
+class RollingMinMax:
+    """Min and max of the last `window` samples with monotonic deques."""
+    __slots__ = ('window', 'n', 'lo', 'hi')
+
+    def __init__(self, window: int):
+        self.window = max(1, window)
+        self.n = 0
+        self.lo: deque = deque()  # (index, value), values increasing
+        self.hi: deque = deque()  # (index, value), values decreasing
+
+    def update(self, x: float) -> None:
+        i = self.n
+        self.n = i + 1
+        lo, hi = self.lo, self.hi
+        while lo and lo[-1][1] >= x:
+            lo.pop()
+        lo.append((i, x))
+        while hi and hi[-1][1] <= x:
+            hi.pop()
+        hi.append((i, x))
+        first = i - self.window + 1
+        if lo[0][0] < first:
+            lo.popleft()
+        if hi[0][0] < first:
+            hi.popleft()
+
+    def min(self) -> Optional[float]:
+        return self.lo[0][1] if self.lo else None
+
+    def max(self) -> Optional[float]:
+        return self.hi[0][1] if self.hi else None
+
+    def reset(self) -> None:
+        self.n = 0
+        self.lo.clear()
+        self.hi.clear()
+
+
+class RollingSlope:
+    """
+    Least-squares slope (per sample) of the last `window` samples against their
+    position. Keeps sum(y) and sum(i*y) with positions relative to the oldest
+    sample; both are recomputed from the buffer once per window to stop drift.
+    """
+    __slots__ = ('window', 'buf', 'sy', 'sxy', 'since_sync')
+
+    def __init__(self, window: int):
+        self.window = max(2, window)
+        self.buf: deque = deque()
+        self.sy = 0.0
+        self.sxy = 0.0
+        self.since_sync = 0
+
+    def __len__(self) -> int:
+        return len(self.buf)
+
+    def update(self, y: float) -> None:
+        buf = self.buf
+        if len(buf) < self.window:
+            self.sxy += len(buf) * y
+            self.sy += y
+            buf.append(y)
+            return
+        y0 = buf.popleft()
+        buf.append(y)
+        # drop the oldest sample, shift every position down by one, append at window - 1
+        self.sxy += -(self.sy - y0) + (self.window - 1) * y
+        self.sy += y - y0
+        self.since_sync += 1
+        if self.since_sync >= self.window:
+            self.since_sync = 0
+            self.sy = math.fsum(buf)
+            self.sxy = math.fsum(i * v for i, v in enumerate(buf))
+
+    def slope(self) -> Optional[float]:
+        n = len(self.buf)
+        if n < 2:
+            return None
+        sx = n * (n - 1) / 2.0
+        sxx = (n - 1) * n * (2 * n - 1) / 6.0
+        return (n * self.sxy - sx * self.sy) / (n * sxx - sx * sx)
+
+    def reset(self) -> None:
+        self.buf.clear()
+        self.sy = self.sxy = 0.0
+        self.since_sync = 0
+
+
+class DerivedFeatures:
+    """
+    Per-unit features behind the derived signals, over the last `window` frames:
+      rpm        rolling std of the previous `window` frames plus the current one (jitter)
+      fuel_level rolling slope over the same span (leak rate, level units per frame)
+                 and rolling max of the last `window` levels (sustained low fuel);
+                 a frame without fuel_level breaks the series
+      fuel_consumption  EWMA with alpha = 2 / (window + 1)
+    NaN/inf samples are skipped (a non-finite fuel_level counts as missing): one
+    would poison the running sums and the EWMA for good.
+    With window=1 every feature reduces to the single-previous-frame comparison.
+    """
+    __slots__ = ('window', 'rpm', 'level_slope', 'level_max', 'consumption')
+
+    def __init__(self, window: int):
+        self.window = max(1, window)
+        self.rpm = RollingStats(self.window + 1)
+        self.level_slope = RollingSlope(self.window + 1)
+        self.level_max = RollingMinMax(self.window)
+        self.consumption = Ewma(2.0 / (self.window + 1))
+
+    def update(self, rpm: float, fuel_level: Optional[float], consumption: float) -> None:
+        if math.isfinite(rpm):
+            self.rpm.update(rpm)
+        if math.isfinite(consumption):
+            self.consumption.update(consumption)
+        if fuel_level is None or not math.isfinite(fuel_level):
+            self.level_slope.reset()
+            self.level_max.reset()
+        else:
+            self.level_slope.update(fuel_level)
+            self.level_max.update(fuel_level)
+
+    def rpm_jitter(self) -> Optional[float]:
+        """Peak-to-peak equivalent of the rpm spread (2 * std), None before two frames."""
+        return 2.0 * self.rpm.std() if len(self.rpm) >= 2 else None
+
+    def fuel_drop(self) -> Optional[float]:
+        """Fuel level drop per frame along the trend, None without two consecutive levels."""
+        s = self.level_slope.slope()
+        return -s if s is not None else None
+
+    def state(self) -> dict:
+        """Samples behind the features, for snapshots; load() rebuilds the same windows from them."""
+        return {
+            'window': self.window,
+            'rpm': list(self.rpm.buf),
+            'fuel_level': list(self.level_slope.buf),
+            'consumption': self.consumption.value,
+        }
+
+    def load(self, state: dict) -> None:
+        """Replay a state() (possibly taken with another window: only the newest samples that fit are kept)."""
+        for x in (self.rpm, self.level_slope, self.level_max):
+            x.reset()
+        for v in state.get('rpm') or ():
+            if math.isfinite(v):
+                self.rpm.update(v)
+        # level_max covers the newest `window` of the same levels level_slope holds
+        for v in state.get('fuel_level') or ():
+            if not math.isfinite(v):
+                continue
+            self.level_slope.update(v)
+            self.level_max.update(v)
+        c = state.get('consumption')
+        self.consumption.value = c if c is None or math.isfinite(c) else None
+
+    def values(self) -> dict:
+        """Current feature values (for inspection and debugging)."""
+        return {
+            'window': self.window,
+            'rpm_mean': self.rpm.mean,
+            'rpm_jitter': self.rpm_jitter(),
+            'fuel_drop': self.fuel_drop(),
+            'fuel_level_max': self.level_max.max(),
+            'consumption_ewma': self.consumption.value,
+        }
@@ -0,0 +1,118 @@
+"""
+Fixed-slot frame for RiskAnalyzer.analyze: one slot per sensor id in SENSOR_IDS
+order (the column layout of UnitHistory and the telemetry log), with parallel
+value, severity code and probability lists. The analyzer scores and writes
+derived signals by slot; the analyze_frame dict list is built once, by
+to_dicts(), where the frame leaves the service.
+"""
+import math
+from typing import Any, Dict, List, Optional, Tuple
+
+from analysis.rules import SEVERITIES
+from analysis.sensors import SENSOR_IDS
+
+INDEX = { sid: i for i, sid in enumerate(SENSOR_IDS) }
+N = len(SENSOR_IDS)
+ABSENT = -1  # severity code of a slot the frame does not carry
+
+ECU_ERRORS = INDEX['ecu_errors']
+FUEL_LEAK = INDEX['fuel_leak']
+OVERHEAT = INDEX['overheat']
+EMERGENCY_STOP = INDEX['emergency_stop']
+DERIVED = frozenset((ECU_ERRORS, FUEL_LEAK, OVERHEAT, EMERGENCY_STOP))
+
+
+class Frame:
+    """
+    values/codes/probs  per slot; codes are indices into SEVERITIES, ABSENT if not carried
+    sensors             the input dict of each slot (its id/type/min/max/unit pass through)
+    order               output order: a slot, or -1 - k for extra[k]
+    extra               [input dict, code, probability] for ids outside SENSOR_IDS
+    Repeated ids keep their first position and the last dict, like a dict keyed by id.
+    """
+    __slots__ = ('values', 'codes', 'probs', 'sensors', 'order', 'extra')
+
+    def __init__(self):
+        self.values: List[Any] = [None] * N
+        self.codes: List[int] = [ABSENT] * N
+        self.probs: List[float] = [0.0] * N
+        self.sensors: List[Optional[Dict[str, Any]]] = [None] * N
+        self.order: List[int] = []
+        self.extra: List[List[Any]] = []
+
+    @classmethod
+    def from_sensors(cls, sensors: List[Dict[str, Any]]) -> 'Frame':
+        f = cls()
+        slots, values, order, extra = f.sensors, f.values, f.order, f.extra
+        seen: Optional[Dict[str, int]] = None
+        for s in sensors:
+            if not isinstance(s, dict):
+                continue
+            sid = s.get('id')
+            if not sid:
+                continue
+            key = sid if type(sid) is str else str(sid)
+            i = INDEX.get(key)
+            if i is None:
+                if seen is None:
+                    seen = {}
+                k = seen.get(key)
+                if k is None:
+                    seen[key] = len(extra)
+                    order.append(-1 - len(extra))
+                    extra.append([s, ABSENT, 0.0])
+                else:
+                    extra[k][0] = s
+                continue
+            if slots[i] is None:
+                order.append(i)
+            slots[i] = s
+            values[i] = s.get('value')
+        return f
+
+    def set(self, i: int, value: Any, code: int, prob: float) -> None:
+        """Write a derived signal; a slot the input did not carry is appended to the output."""
+        if self.codes[i] == ABSENT and self.sensors[i] is None:
+            self.order.append(i)
+        self.values[i] = value
+        self.codes[i] = code
+        self.probs[i] = prob
+
+    def to_dicts(self) -> List[Dict[str, Any]]:
+        """The analyze_frame output: input dicts plus severity and risk_probability, derived signals last."""
+        out = []
+        slots, values, codes, probs = self.sensors, self.values, self.codes, self.probs
+        for i in self.order:
+            if i < 0:
+                s, code, prob = self.extra[-1 - i]
+                out.append({ **s, 'severity': SEVERITIES[code], 'risk_probability': prob })
+                continue
+            s = slots[i]
+            if s is None:
+                sid = SENSOR_IDS[i]
+                out.append({ 'id': sid, 'type': sid, 'value': values[i], 'severity': SEVERITIES[codes[i]],
+                             'risk_probability': probs[i] })
+                continue
+            d = { **s, 'severity': SEVERITIES[codes[i]], 'risk_probability': probs[i] }
+            if i in DERIVED:
+                d['value'] = values[i]
+            out.append(d)
+        return out
+
+    def severities(self) -> List[Tuple[Any, str]]:
+        """(sensor id, severity) in output order."""
+        out = []
+        for i in self.order:
+            if i < 0:
+                s, code, _ = self.extra[-1 - i]
+                out.append((s.get('id'), SEVERITIES[code]))
+            else:
+                s = self.sensors[i]
+                out.append((s.get('id') if s is not None else SENSOR_IDS[i], SEVERITIES[self.codes[i]]))
+        return out
+
+    def columns(self) -> Tuple[List[float], List[int]]:
+        """Numeric values (NaN if absent or not a number) and severity codes (0 if absent) in SENSOR_IDS order."""
+        nan = math.nan
+        vals = [v if isinstance(v, (int, float)) else nan for v in self.values]
+        return vals, [c if c > 0 else 0 for c in self.codes]
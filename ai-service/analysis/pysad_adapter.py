@@ -1,17 +1,50 @@
+import atexit
+import json
 import os
-from typing import Dict, Any
+import threading
+import time
+import weakref
+from typing import Any, Dict, List, Optional, Tuple
+
+from analysis.analyzer import RiskAnalyzer
+from analysis.detector import OnlineDetector, score_many, update_many
+from analysis.rules import SEVERITIES, SEVERITY_CODE
+from observability import logs
+
+log = logs.get('pysad')
+
+CHECKPOINT_VERSION = 1
 
 
 class PySADAdapter:
     """
-    PySAD/Sintel analyzer adapter (placeholder).
-    If PYSAD_ENABLED!="1", acts as unavailable.
-    Implement fit/score to use real models.
+    Online streaming anomaly detector on top of the rules (PYSAD_ENABLED=1).
+    Each unit gets an OnlineDetector (robust EW z-score per sensor plus a
+    multivariate chi-square score per frame). Until a sensor has seen PYSAD_WARMUP
+    samples only the rules speak; after that the reported severity and probability
+    are the max of the rule result and the model result.
+    Model state is checkpointed to PYSAD_CHECKPOINT (atomic JSON) every
+    PYSAD_CHECKPOINT_EVERY seconds and at exit, and restored by load_or_fit().
     """
 
     def __init__(self):
         self.enabled = os.getenv('PYSAD_ENABLED', '0') == '1'
         self.ready = False
+        self.alpha = float(os.getenv('PYSAD_ALPHA', '0.01'))
+        self.warmup = int(os.getenv('PYSAD_WARMUP', '50'))
+        self.clip = float(os.getenv('PYSAD_CLIP', '4'))
+        self.warn_z = float(os.getenv('PYSAD_WARN_Z', '4'))
+        self.crit_z = float(os.getenv('PYSAD_CRIT_Z', '8'))
+        # frame tail probability above which moderately off sensors are raised to warning
+        self.mv_p = float(os.getenv('PYSAD_MV_P', '0.9999'))
+        self.checkpoint_path = os.getenv('PYSAD_CHECKPOINT') or None
+        self.checkpoint_every = float(os.getenv('PYSAD_CHECKPOINT_EVERY', '60'))
+        # live detectors by unit_id; they are owned by UnitState and vanish with evicted units
+        self.detectors: 'weakref.WeakValueDictionary[str, OnlineDetector]' = weakref.WeakValueDictionary()
+        self._restored: Dict[str, Dict[str, List[float]]] = {}
+        self._save_lock = threading.Lock()
+        self._saver: Optional[threading.Thread] = None
+        self._rules = RiskAnalyzer()
 
     def is_available(self) -> bool:
         return self.enabled
@@ -19,13 +52,163 @@ class PySADAdapter:
     def load_or_fit(self):
         if not self.enabled:
             return
-        # TODO: load trained model or fit online detector (PySAD/Sintel)
+        if self.checkpoint_path:
+            self._restored = self.load_checkpoint(self.checkpoint_path)
+            if self.checkpoint_every > 0 and self._saver is None:
+                self._saver = threading.Thread(target=self._save_loop, name='pysad-checkpoint', daemon=True)
+                self._saver.start()
+            atexit.register(self._save_quietly)
         self.ready = True
 
-    def score(self, sensor: Dict[str, Any]) -> Dict[str, Any]:
+    def detector(self, unit) -> OnlineDetector:
+        det = getattr(unit, 'detector', None)
+        if det is None:
+            det = self.restore_unit(unit, self._restored.pop(unit.unit_id, None))
+        return det
+
+    def restore_unit(self, unit, state: Optional[Dict[str, List[float]]]) -> OnlineDetector:
+        """Give the unit a fresh model, continued from `state` if any (also used by unit snapshots)."""
+        det = OnlineDetector(self.alpha, self.clip, self.warmup)
+        if state:
+            det.load(state)
+            self._restored.pop(unit.unit_id, None)
+        unit.detector = det
+        self.detectors[unit.unit_id] = det
+        return det
+
+    def _level(self, z: float) -> int:
+        return 2 if z >= self.crit_z else (1 if z >= self.warn_z else 0)
+
+    def _prob(self, z: float) -> float:
+        return round(z * z / (z * z + self.warn_z * self.warn_z), 3)
+
+    def analyze_unit(self, unit, sensors: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """Rules of the unit's analyzer first, then the unit's model escalates on top."""
+        if not (self.enabled and self.ready):
+            raise RuntimeError('PySADAdapter not ready or not enabled')
+        analyzed = unit.analyzer.analyze_frame(sensors)
+        zs, mv = self.detector(unit).update((s.get('id'), s.get('value')) for s in analyzed)
+        return self._escalate(analyzed, zs, mv)
+
+    def _escalate(self, analyzed: List[Dict[str, Any]], zs: Dict[str, float], mv: float) -> List[Dict[str, Any]]:
+        if not zs:
+            return analyzed
+        frame_anomaly = mv >= self.mv_p
+        for s in analyzed:
+            z = zs.get(s.get('id'))
+            if z is None:
+                continue
+            level = self._level(z)
+            if level == 0 and frame_anomaly and z >= self.warn_z / 2:
+                level = 1
+            s['anomaly_score'] = round(z, 3)
+            if level > SEVERITY_CODE.get(s.get('severity'), 0):
+                s['severity'] = SEVERITIES[level]
+            if level:
+                s['risk_probability'] = max(s.get('risk_probability', 0.0), self._prob(z))
+        return analyzed
+
+    def score(self, sensor: Dict[str, Any], unit=None) -> Dict[str, Any]:
+        """One sensor against the unit's model without learning from it; rules only while cold."""
         if not (self.enabled and self.ready):
             raise RuntimeError('PySADAdapter not ready or not enabled')
-        # TODO: use real model to compute probability/severity
-        raise NotImplementedError('Integrate with PySAD/Sintel here')
+        rules = unit.analyzer if unit is not None else self._rules
+        res = rules.score(sensor)
+        det = getattr(unit, 'detector', None) if unit is not None else None
+        z = det.score(res['id'], sensor.get('value')) if det is not None else None
+        return self._escalate_one(res, z)
+
+    def _escalate_one(self, res: Dict[str, Any], z: Optional[float]) -> Dict[str, Any]:
+        if z is not None:
+            level = self._level(z)
+            if level > SEVERITY_CODE[res['severity']]:
+                res['severity'] = SEVERITIES[level]
+            if level:
+                res['risk_probability'] = max(res['risk_probability'], self._prob(z))
+        return res
+
+    def analyze_many(self, jobs: List[Tuple[Any, List[Dict[str, Any]]]]) -> List[Any]:
+        """
+        Batched analyze_unit over (unit, sensors) jobs, for ScoreDispatcher: the rules
+        run per job (they carry each unit's previous frame), then all models of the
+        batch learn in one detector.update_many. A failed job yields its exception in
+        place of the result.
+        """
+        if not (self.enabled and self.ready):
+            raise RuntimeError('PySADAdapter not ready or not enabled')
+        out: List[Any] = []
+        ok: List[int] = []
+        for unit, sensors in jobs:
+            try:
+                out.append(unit.analyzer.analyze_frame(sensors))
+                ok.append(len(out) - 1)
+            except Exception as e:
+                out.append(e)
+        dets = [self.detector(jobs[i][0]) for i in ok]
+        scored = update_many(dets, [[(s.get('id'), s.get('value')) for s in out[i]] for i in ok])
+        for i, (zs, mv) in zip(ok, scored):
+            out[i] = self._escalate(out[i], zs, mv)
+        return out
+
+    def score_many(self, jobs: List[Tuple[Dict[str, Any], Any]]) -> List[Any]:
+        """Batched score over (sensor, unit) jobs, for ScoreDispatcher; the z-scores in one array op."""
+        if not (self.enabled and self.ready):
+            raise RuntimeError('PySADAdapter not ready or not enabled')
+        out: List[Any] = []
+        ok: List[int] = []
+        for sensor, unit in jobs:
+            try:
+                out.append((unit.analyzer if unit is not None else self._rules).score(sensor))
+                ok.append(len(out) - 1)
+            except Exception as e:
+                out.append(e)
+        zs = score_many([(getattr(jobs[i][1], 'detector', None), out[i]['id'], jobs[i][0].get('value')) for i in ok])
+        for i, z in zip(ok, zs):
+            out[i] = self._escalate_one(out[i], z)
+        return out
+
+    # -- checkpointing ------------------------------------------------------
+
+    @staticmethod
+    def load_checkpoint(path: str) -> Dict[str, Dict[str, List[float]]]:
+        try:
+            with open(path, encoding='utf-8') as f:
+                data = json.load(f)
+        except FileNotFoundError:
+            return {}
+        except (OSError, ValueError):
+            log.warning('[PY-PYSAD] checkpoint %s unreadable, starting cold', path)
+            return {}
+        if not isinstance(data, dict) or data.get('version') != CHECKPOINT_VERSION:
+            return {}
+        units = data.get('units')
+        return units if isinstance(units, dict) else {}
+
+    def save(self, path: Optional[str] = None) -> int:
+        """Write the state of all live detectors (plus not yet claimed restored ones); returns unit count."""
+        path = path or self.checkpoint_path
+        if not path:
+            return 0
+        with self._save_lock:
+            units = dict(self._restored)
+            for unit_id, det in list(self.detectors.items()):
+                units[unit_id] = det.state()
+            payload = { 'version': CHECKPOINT_VERSION, 'saved_at': time.time(), 'alpha': self.alpha, 'units': units }
+            tmp = f'{path}.tmp'
+            with open(tmp, 'w', encoding='utf-8') as f:
+                json.dump(payload, f, separators=(',', ':'))
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp, path)
+            return len(units)
 
+    def _save_quietly(self):
+        try:
+            self.save()
+        except OSError as e:
+            log.warning('[PY-PYSAD] checkpoint failed: %s', e)
 
+    def _save_loop(self):
+        while True:
+            time.sleep(self.checkpoint_every)
+            self._save_quietly()
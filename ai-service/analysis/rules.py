@@ -0,0 +1,349 @@
+from bisect import bisect_left
+from typing import Dict, Any, Optional, Tuple
+
+try:
+    import numpy as np
+except Exception:  # vectorized lookups need numpy, per-value scoring does not
+    np = None
+
+from simulation.simulator import RANGES
+
+
+Result = Tuple[str, float]
+
+_NUM = (int, float)
+
+# Severity codes used by the columnar (batch) API
+SEVERITIES = ('normal', 'warning', 'critical')
+SEVERITY_CODE = { s: i for i, s in enumerate(SEVERITIES) }
+
+# Declarative band table for RiskAnalyzer.score.
+# Each band is (lo, hi, bounds, severity, probability); lo/hi=None means unbounded,
+# bounds is one of '[]', '[)', '(]', '()'. Bands are matched in order, first hit wins,
+# otherwise 'default' is used (None = fall through to the next stage / generic fallback).
+# Thresholds that coincide with the simulator norms are taken from RANGES.
+_rpm = RANGES['rpm']
+_ect = RANGES['engine_temp_coolant']
+_ot = RANGES['oil_temp']
+_op = RANGES['oil_pressure']
+_fp = RANGES['fuel_pressure']
+_fl = RANGES['fuel_level']
+_fc = RANGES['fuel_consumption']
+_v = RANGES['voltage']
+_cur = RANGES['current']
+_cp = RANGES['coolant_pressure']
+_vib = RANGES['vibration']
+
+BANDS: Dict[str, Dict[str, Any]] = {
+    'rpm': {
+        # Assume genset nominal 1500 rpm (50 Hz). Idle band: 600–800.
+        'bands': [(*_rpm['normal'], '[]', 'normal', 0.05)],
+        'default': None,
+        'deviation': {
+            'nominal': float(_rpm['nominal']),
+            'bands': [
+                (None, _rpm['warningPct'], '(]', 'normal', 0.1),
+                (None, _rpm['criticalPct'], '(]', 'warning', 0.5),
+            ],
+            'default': ('critical', 0.9),
+        },
+    },
+    'engine_temp_coolant': {
+        'bands': [
+            (*_ect['normal'], '[]', 'normal', 0.05),
+            (*_ect['warning'], '[]', 'warning', 0.5),
+            (110, None, '[)', 'critical', 0.92),
+            (_ect['critical'][0], None, '[)', 'critical', 0.8),
+        ],
+        'default': ('warning', 0.4),
+    },
+    'oil_temp': {
+        'bands': [
+            (*_ot['normal'], '[]', 'normal', 0.05),
+            (*_ot['warning'], '[]', 'warning', 0.6),
+            (130, None, '[)', 'critical', 0.92),
+            (_ot['critical'][0], None, '[)', 'critical', 0.82),
+        ],
+        'default': ('warning', 0.4),
+    },
+    'oil_pressure': {
+        # Норма 2.5–5.0; предупреждение рядом с границами; критика только при явных выходах
+        'bands': [
+            (*_op['normal'], '[]', 'normal', 0.06),
+            (*_op['warning'], '[)', 'warning', 0.5),
+            (_op['normal'][1], 6.0, '(]', 'warning', 0.5),
+            (None, 1.5, '()', 'critical', 0.9),
+            (7.0, None, '()', 'critical', 0.9),
+        ],
+        'default': ('warning', 0.6),
+    },
+    'fuel_pressure': {
+        'bands': [
+            (*_fp['normal'], '[]', 'normal', 0.06),
+            (_fp['warningLow'], _fp['normal'][0], '[)', 'warning', 0.5),
+            (_fp['normal'][1], _fp['warningHigh'], '(]', 'warning', 0.5),
+            (None, 1.8, '()', 'critical', 0.9),
+            (7.0, None, '()', 'critical', 0.9),
+        ],
+        'default': ('warning', 0.6),
+    },
+    'fuel_level': {
+        'bands': [
+            (_fl['normal'][0], None, '[)', 'normal', 0.05),
+            (*_fl['warning'], '[)', 'warning', 0.5),
+        ],
+        'default': ('critical', 0.9),
+    },
+    'fuel_consumption': {
+        # Контекст нагрузки по RPM: до ~1300 считаем низкой/средней, выше — высокой
+        'bands': [
+            (None, 40, '(]', 'normal', 0.08),
+            (None, 60, '(]', 'warning', 0.55),
+        ],
+        'default': ('critical', 0.9),
+        'under_load': {
+            'rpm': 1300,
+            'bands': [
+                (None, _fc['normal'][1], '(]', 'normal', 0.08),
+                (None, 140, '(]', 'warning', 0.55),
+            ],
+            'default': ('critical', 0.9),
+        },
+    },
+    'voltage': {
+        # 24V system typical
+        'bands': [
+            (*_v['rest'], '[]', 'normal', 0.06),
+            (*_v['charge'], '[]', 'normal', 0.06),
+            (_v['warningLow'], _v['rest'][0], '[)', 'warning', 0.55),
+            (28.5, _v['warningHigh'], '[]', 'warning', 0.55),
+        ],
+        'default': ('critical', 0.9),
+    },
+    'current': {
+        'bands': [
+            (*_cur['normal'], '[]', 'normal', 0.08),
+            (*_cur['warning'], '(]', 'warning', 0.55),
+        ],
+        'default': ('critical', 0.9),
+    },
+    'ecu_errors': {
+        # numeric 0/1 or bool
+        'bool': (('critical', 0.92), ('normal', 0.05)),
+        'bands': [
+            (2, None, '[)', 'critical', 0.92),
+            (1, 1, '[]', 'warning', 0.6),
+        ],
+        'default': ('normal', 0.05),
+        'flag': (('normal', 0.05), ('normal', 0.05)),
+    },
+    'fuel_leak': {'flag': (('critical', 0.97), ('normal', 0.03))},
+    'oil_leak': {'flag': (('critical', 0.97), ('normal', 0.03))},
+    'coolant_pressure': {
+        'bands': [
+            (*_cp['normal'], '[]', 'normal', 0.06),
+            (_cp['warningLow'], _cp['normal'][0], '[)', 'warning', 0.55),
+            (_cp['normal'][1], _cp['warningHigh'], '(]', 'warning', 0.55),
+        ],
+        'default': ('critical', 0.9),
+    },
+    'overheat': {
+        # bool or temperature-like value
+        'bands': [
+            (None, 110, '(]', 'normal', 0.05),
+            (None, 120, '(]', 'warning', 0.6),
+        ],
+        'default': ('critical', 0.92),
+        'flag': (('critical', 0.95), ('normal', 0.03)),
+    },
+    'vibration': {
+        'bands': [
+            (*_vib['normal'], '[]', 'normal', 0.08),
+            (*_vib['warning'], '(]', 'warning', 0.6),
+        ],
+        'default': ('critical', 0.9),
+    },
+    'emergency_stop': {'flag': (('critical', 0.99), ('normal', 0.02))},
+}
+
+
+def _prob(p: float) -> float:
+    return round(float(max(0.0, min(1.0, p))), 3)
+
+
+def _band_hit(band, v) -> bool:
+    lo, hi, bounds = band[0], band[1], band[2]
+    if lo is not None:
+        if bounds[0] == '[':
+            if not lo <= v:
+                return False
+        elif not lo < v:
+            return False
+    if hi is not None:
+        if bounds[1] == ']':
+            if not v <= hi:
+                return False
+        elif not v < hi:
+            return False
+    return True
+
+
+class IntervalTable:
+    """
+    Band list compiled into a sorted edge array: every edge point and every open
+    gap between edges is resolved to its first matching band once, at build time,
+    so lookup is one bisect plus an equality check.
+    """
+    __slots__ = ('edges', 'at_edge', 'between', 'nan', '_arrays')
+
+    def __init__(self, bands, default: Optional[Result]):
+        def first_hit(v):
+            for b in bands:
+                if _band_hit(b, v):
+                    return (b[3], _prob(b[4]))
+            return (default[0], _prob(default[1])) if default else None
+
+        edges = sorted({float(x) for b in bands for x in (b[0], b[1]) if x is not None})
+        self.edges = edges
+        self.at_edge = [first_hit(x) for x in edges]
+        probes = []
+        if edges:
+            probes.append(edges[0] - 1.0)
+            probes.extend((a + b) / 2.0 for a, b in zip(edges, edges[1:]))
+            probes.append(edges[-1] + 1.0)
+        else:
+            probes.append(0.0)
+        self.between = [first_hit(x) for x in probes]
+        self.nan = first_hit(float('nan'))
+        self._arrays = None
+
+    def lookup(self, v) -> Optional[Result]:
+        if v != v:
+            return self.nan
+        i = bisect_left(self.edges, v)
+        if i < len(self.edges) and self.edges[i] == v:
+            return self.at_edge[i]
+        return self.between[i]
+
+    def lookup_array(self, v):
+        """Vectorized lookup: (severity codes int8, probabilities), -1/nan where no band matched."""
+        if self._arrays is None:
+            def enc(results):
+                codes = np.array([SEVERITY_CODE[r[0]] if r else -1 for r in results], dtype=np.int8)
+                probs = np.array([r[1] if r else np.nan for r in results], dtype=np.float64)
+                return codes, probs
+            edges = np.array(self.edges, dtype=np.float64)
+            self._arrays = (edges, enc(self.at_edge or [None]), enc(self.between), enc([self.nan]))
+        edges, (e_codes, e_probs), (b_codes, b_probs), (n_code, n_prob) = self._arrays
+        idx = np.searchsorted(edges, v, side='left')
+        safe = np.minimum(idx, max(len(edges) - 1, 0))
+        at = (idx < len(edges)) & (edges[safe] == v) if len(edges) else np.zeros(v.shape, dtype=bool)
+        codes = np.where(at, e_codes[safe], b_codes[idx])
+        probs = np.where(at, e_probs[safe], b_probs[idx])
+        nan = np.isnan(v)
+        if nan.any():
+            codes[nan] = n_code[0]
+            probs[nan] = n_prob[0]
+        return codes, probs
+
+
+class CompiledRule:
+    __slots__ = ('table', 'dev_table', 'nominal', 'load_table', 'load_rpm', 'bool_res', 'flag_res')
+
+    def __init__(self, spec: Dict[str, Any]):
+        self.table = IntervalTable(spec['bands'], spec.get('default')) if 'bands' in spec else None
+        dev = spec.get('deviation')
+        self.dev_table = IntervalTable(dev['bands'], dev['default']) if dev else None
+        self.nominal = dev['nominal'] if dev else None
+        load = spec.get('under_load')
+        self.load_table = IntervalTable(load['bands'], load['default']) if load else None
+        self.load_rpm = load['rpm'] if load else None
+        self.bool_res = tuple((s, _prob(p)) for s, p in spec['bool']) if 'bool' in spec else None
+        self.flag_res = tuple((s, _prob(p)) for s, p in spec['flag']) if 'flag' in spec else None
+
+    def classify(self, value, prev_frame: Dict[str, Any]) -> Optional[Result]:
+        if self.bool_res is not None and isinstance(value, bool):
+            return self.bool_res[0] if value else self.bool_res[1]
+        if self.table is not None and isinstance(value, _NUM):
+            if self.load_table is not None:
+                rpm = prev_frame.get('rpm')
+                if isinstance(rpm, _NUM) and rpm >= self.load_rpm:
+                    return self.load_table.lookup(value)
+            res = self.table.lookup(value)
+            if res is None and self.dev_table is not None:
+                res = self.dev_table.lookup(abs(value - self.nominal) / self.nominal)
+            return res
+        if self.flag_res is not None:
+            return self.flag_res[0] if value else self.flag_res[1]
+        return None
+
+    def classify_array(self, values, prev_rpm=None):
+        """
+        Columnar counterpart of classify() for a bool or numeric array.
+        prev_rpm is the load context per row (array, NaN = unknown) or a scalar/None.
+        Returns (codes, probs) or None when the generic fallback applies.
+        """
+        if values.dtype == np.bool_ and self.bool_res is not None:
+            return _pick(values, self.bool_res)
+        if self.table is not None:
+            v = values.astype(np.float64, copy=False)
+            codes, probs = self.table.lookup_array(v)
+            if self.dev_table is not None:
+                miss = codes < 0
+                if miss.any():
+                    d_codes, d_probs = self.dev_table.lookup_array(np.abs(v[miss] - self.nominal) / self.nominal)
+                    codes[miss] = d_codes
+                    probs[miss] = d_probs
+            if self.load_table is not None and prev_rpm is not None:
+                load = np.asarray(prev_rpm, dtype=np.float64) >= self.load_rpm
+                load = np.broadcast_to(load, v.shape)
+                if load.any():
+                    l_codes, l_probs = self.load_table.lookup_array(v[load])
+                    codes[load] = l_codes
+                    probs[load] = l_probs
+            return codes, probs
+        if self.flag_res is not None:
+            return _pick(values != 0, self.flag_res)
+        return None
+
+
+def _pick(mask, pair):
+    (s_on, p_on), (s_off, p_off) = pair
+    codes = np.where(mask, np.int8(SEVERITY_CODE[s_on]), np.int8(SEVERITY_CODE[s_off])).astype(np.int8)
+    probs = np.where(mask, p_on, p_off).astype(np.float64)
+    return codes, probs
+
+
+def compile_rules(bands: Dict[str, Dict[str, Any]] = BANDS) -> Dict[str, CompiledRule]:
+    return {sid: CompiledRule(spec) for sid, spec in bands.items()}
+
+
+RULES = compile_rules()
+
+
+def generic_score(sensor: Dict[str, Any], value) -> Result:
+    # Fallback generic numeric/bool handling
+    if isinstance(value, _NUM):
+        vmin = sensor.get('min', 0) or 0
+        vmax = sensor.get('max', 1) or 1
+        span = max(1e-6, vmax - vmin)
+        dist = min(abs(value - vmin), abs(vmax - value)) / span
+        p = max(0.0, 1.0 - 2.0 * dist)
+        sev = 'critical' if p > 0.85 else 'warning' if p > 0.6 else 'normal'
+        return (sev, _prob(p))
+    return ('normal', _prob(0.1))
+
+
+def generic_score_array(values, vmin=0, vmax=1):
+    """Columnar generic fallback; rounding goes through round() to stay bit-identical."""
+    vmin = vmin or 0
+    vmax = vmax or 1
+    span = max(1e-6, vmax - vmin)
+    v = values.astype(np.float64, copy=False)
+    dist = np.minimum(np.abs(v - vmin), np.abs(vmax - v)) / span
+    p = 1.0 - 2.0 * dist
+    # max(0.0, nan) keeps 0.0 in the scalar path
+    p = np.where(p > 0.0, p, 0.0)
+    probs = np.array([_prob(x) for x in p.tolist()], dtype=np.float64)
+    codes = np.where(p > 0.85, 2, np.where(p > 0.6, 1, 0)).astype(np.int8)
+    return codes, probs
@@ -0,0 +1,45 @@
+from typing import Any, Dict, List
+
+# Flat telemetry key (Webots supervisor / field gateways) -> sensor metadata.
+# The key order is also the fixed sensor index of the binary wire format (transport/wire.py).
+SENSOR_MAPPING = {
+    'rpm':            { 'id': 'rpm', 'type': 'RPM', 'min': 0,  'max': 3000, 'unit': 'об/мин' },
+    'coolant_temp':   { 'id': 'engine_temp_coolant', 'type': 'temperature_coolant', 'min': 20, 'max': 120, 'unit': '°C' },
+    'oil_temp':       { 'id': 'oil_temp', 'type': 'temperature_oil', 'min': 20, 'max': 150, 'unit': '°C' },
+    'oil_pressure':   { 'id': 'oil_pressure', 'type': 'pressure_oil', 'min': 1,  'max': 10,  'unit': 'bar' },
+    'fuel_pressure':  { 'id': 'fuel_pressure', 'type': 'pressure_fuel', 'min': 1,  'max': 8,   'unit': 'bar' },
+    'fuel_level':     { 'id': 'fuel_level', 'type': 'level_fuel', 'min': 0,  'max': 100, 'unit': '%' },
+    'fuel_consumption': { 'id': 'fuel_consumption', 'type': 'consumption_fuel', 'min': 0, 'max': 60, 'unit': 'l/h' },
+    'voltage':        { 'id': 'voltage', 'type': 'voltage', 'min': 10, 'max': 32, 'unit': 'V' },
+    'current':        { 'id': 'current', 'type': 'current', 'min': 0,  'max': 500, 'unit': 'A' },
+    'ecu_errors':     { 'id': 'ecu_errors', 'type': 'ecu_errors' },
+    'fuel_leak':      { 'id': 'fuel_leak', 'type': 'fuel_leak' },
+    'coolant_pressure': { 'id': 'coolant_pressure', 'type': 'pressure_coolant', 'min': 0.5, 'max': 3, 'unit': 'bar' },
+    'overheat':       { 'id': 'overheat', 'type': 'overheat' },
+    'vibration':      { 'id': 'vibration', 'type': 'vibration', 'min': 0, 'max': 10, 'unit': 'm/s²' },
+    'emergency_stop': { 'id': 'emergency_stop', 'type': 'emergency_stop' },
+}
+
+# Sensor ids in SENSOR_MAPPING order: the fixed column layout of stored history.
+SENSOR_IDS = tuple(meta['id'] for meta in SENSOR_MAPPING.values())
+SENSOR_META = { meta['id']: meta for meta in SENSOR_MAPPING.values() }
+
+
+def to_sensors(body: Any) -> List[Dict[str, Any]]:
+    """
+    Normalize an ingest body into a sensors list.
+    Accepts { sensors: [...] } or a flat telemetry dict mapped through SENSOR_MAPPING.
+    """
+    if not isinstance(body, dict):
+        return []
+    sensors = body.get('sensors')
+    if isinstance(sensors, list):
+        return sensors
+    # Map flat telemetry dict into sensors array
+    sensors = []
+    for k, v in body.items():
+        meta = SENSOR_MAPPING.get(k)
+        if not meta:
+            continue
+        sensors.append({ **meta, 'value': v })
+    return sensors
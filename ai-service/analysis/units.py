@@ -0,0 +1,104 @@
+import threading
+import time
+import zlib
+from typing import Any, Callable, Dict, Iterator, Optional
+
+from analysis.analyzer import RiskAnalyzer
+
+DEFAULT_UNIT = 'default'
+
+
+def unit_key(value: Any) -> str:
+    """Normalize a unit_id from a payload or query string; empty means the default unit."""
+    if value is None:
+        return DEFAULT_UNIT
+    key = str(value).strip()
+    return key[:64] if key else DEFAULT_UNIT
+
+
+def partition(unit_id: str, workers: int) -> int:
+    """Worker index owning a (normalized) unit; stable across processes and runs, unlike hash()."""
+    return zlib.crc32(unit_id.encode('utf-8')) % workers
+
+
+class UnitState:
+    """
+    Per-genset state: its own analyzer (prev_frame, emergency latch), an optional
+    simulator, streaming detector and history ring, what was last forwarded to Nest
+    in delta mode, its admission inbox, and a lock that keeps frames of one unit in order.
+    """
+    __slots__ = ('unit_id', 'analyzer', 'simulator', 'detector', 'history', 'forwarded', 'inbox', 'lock',
+                 'last_seen')
+
+    def __init__(self, unit_id: str, analyzer: Any):
+        self.unit_id = unit_id
+        self.analyzer = analyzer
+        self.simulator = None
+        self.detector = None
+        self.history = None
+        self.forwarded = None
+        self.inbox = None
+        self.lock = threading.Lock()
+        self.last_seen = time.monotonic()
+
+
+class UnitRegistry:
+    """
+    unit_id -> UnitState map. Lookups and inserts rely on atomic dict get/setdefault,
+    so request threads working on different units never share a lock. Units idle
+    for longer than idle_ttl seconds are evicted by an opportunistic sweep.
+    """
+
+    def __init__(self, factory: Callable[[], Any] = RiskAnalyzer, idle_ttl: float = 900.0,
+                 sweep_interval: float = 30.0):
+        self._factory = factory
+        self._units: Dict[str, UnitState] = {}
+        self.idle_ttl = idle_ttl
+        self.sweep_interval = sweep_interval
+        self._next_sweep = time.monotonic() + sweep_interval
+        self._sweep_lock = threading.Lock()
+        self.evicted = 0
+
+    def get(self, unit_id: Any = None) -> UnitState:
+        key = unit_key(unit_id)
+        st = self._units.get(key)
+        if st is None:
+            st = self._units.setdefault(key, UnitState(key, self._factory()))
+        now = time.monotonic()
+        st.last_seen = now
+        if now >= self._next_sweep:
+            self.evict_idle(now)
+        return st
+
+    def peek(self, unit_id: Any = None) -> Optional[UnitState]:
+        return self._units.get(unit_key(unit_id))
+
+    def evict_idle(self, now: Optional[float] = None) -> int:
+        if self.idle_ttl <= 0 or not self._sweep_lock.acquire(blocking=False):
+            return 0
+        try:
+            now = time.monotonic() if now is None else now
+            self._next_sweep = now + self.sweep_interval
+            removed = 0
+            for key, st in list(self._units.items()):
+                if now - st.last_seen < self.idle_ttl:
+                    continue
+                # skip units that are mid-frame; re-check idleness under their lock
+                if not st.lock.acquire(blocking=False):
+                    continue
+                try:
+                    if now - st.last_seen >= self.idle_ttl and self._units.get(key) is st:
+                        del self._units[key]
+                        removed += 1
+                finally:
+                    st.lock.release()
+            self.evicted += removed
+            return removed
+        finally:
+            self._sweep_lock.release()
+
+    def __len__(self) -> int:
+        return len(self._units)
+
+    def __iter__(self) -> Iterator[UnitState]:
+        return iter(list(self._units.values()))
@@ -0,0 +1,171 @@
+"""
+Ingest under overload: every frame analyzed in its own request thread (/ingest
+without admission control) vs serving/admission.py, at a fraction and at a
+multiple of the sustainable rate. Arrivals are open loop (a fixed schedule over
+--units units) and each one starts a thread, as a threaded server does per
+request; latency counts from the scheduled arrival, so a backlog shows up in it.
+
+The request's work is the handler's, HTTP left out: RiskAnalyzer.analyze under
+the unit lock, padded to --work-us of CPU per frame to stand in for a heavier
+backend (the rules alone take ~30 us, less than the HTTP layer of a request).
+The padding hashes a buffer, which runs without the GIL like a native model
+would, so the arrival schedule competes for the CPU but not for the GIL. The
+sustainable rate is what one analysis thread gets through per second.
+
+Reports the response time (the inline path answers after the analysis), for
+admission also the time to the analyzed frame, frames analyzed, coalesced and
+refused (429/503), trigger frames (analysis.analyzer.carries_trigger) that were
+accepted but never analyzed (must be 0) and the peak of live request threads.
+
+    python ai-service/bench/bench_admission.py [--work-us 10000] [--seconds 5] [--loads 0.5,10]
+        [--inbox 8] [--pending-max 1000] [--workers 2]
+"""
+import argparse
+import hashlib
+import os
+import sys
+import threading
+import time
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+from analysis.analyzer import RiskAnalyzer, carries_trigger
+from analysis.units import UnitRegistry
+from serving.admission import ACCEPTED, AdmissionControl
+from simulation.simulator import RuleSimulator
+from tools.loadgen import percentile
+
+THREADS_MAX = 4000
+BLOCK = bytes(1 << 16)
+
+
+def block_seconds():
+    t0 = time.perf_counter()
+    for _ in range(200):
+        hashlib.sha256(BLOCK).digest()
+    return (time.perf_counter() - t0) / 200
+
+
+class Service:
+    def __init__(self, work_us, block_s):
+        self.units = UnitRegistry(RiskAnalyzer)
+        self.blocks = max(1, round(work_us / 1e6 / block_s))
+        self.done = {}  # id(sensors) -> analyzed at
+        self.analyzed = 0
+
+    def analyze(self, unit, sensors):
+        with unit.lock:
+            unit.analyzer.analyze(sensors)
+            for _ in range(self.blocks):
+                hashlib.sha256(BLOCK).digest()
+        self.done[id(sensors)] = time.perf_counter()
+        self.analyzed += 1
+
+    def handle(self, unit, items):
+        for sensors, _ in items:
+            self.analyze(unit, sensors)
+
+
+def frames(n_units, n):
+    sims = [RuleSimulator(seed=25 + u) for u in range(n_units)]
+    return [(f'unit-{i % n_units}', sims[i % n_units].step()) for i in range(n)]
+
+
+def sustainable(work_us, block_s):
+    svc = Service(work_us, block_s)
+    unit = svc.units.get('u')
+    pool = [f for _, f in frames(1, 200)]
+    t0 = time.perf_counter()
+    for s in pool:
+        svc.analyze(unit, s)
+    return len(pool) / (time.perf_counter() - t0)
+
+
+def run(mode, rate, seconds, n_units, work_us, block_s, args):
+    svc = Service(work_us, block_s)
+    arrivals = frames(n_units, int(rate * seconds))
+    admission = AdmissionControl(svc.handle, args.inbox, args.pending_max, args.workers).start() if mode == 'admission' else None
+    lat = []
+    accepted_urgent = []
+    refused = { 429: 0, 503: 0 }
+    lock = threading.Lock()
+    live = [0, 0]  # live threads, peak
+    levels = {}
+
+    def request(uid, sensors, scheduled, urgent):
+        unit = svc.units.get(uid)
+        if admission is None:
+            svc.analyze(unit, sensors)
+            status = ACCEPTED
+        else:
+            status, _ = admission.submit(unit, [(sensors, None)])
+        with lock:
+            lat.append(time.perf_counter() - scheduled)
+            if status in refused:
+                refused[status] += 1
+            elif urgent:
+                accepted_urgent.append((id(sensors), scheduled))
+            live[0] -= 1
+
+    t0 = time.perf_counter() + 0.05
+    sent = {}
+    for i, (uid, sensors) in enumerate(arrivals):
+        scheduled = t0 + i / rate
+        delay = scheduled - time.perf_counter()
+        if delay > 0:
+            time.sleep(delay)
+        # urgency as the admission layer sees it: against the unit's previous arrival
+        urgent = carries_trigger(sensors, levels.get(uid))
+        levels[uid] = next((s['value'] for s in sensors if s['id'] == 'fuel_level'), None)
+        sent[id(sensors)] = scheduled
+        with lock:
+            if live[0] >= THREADS_MAX:
+                refused[503] += 1
+                continue
+            live[0] += 1
+            live[1] = max(live[1], live[0])
+        threading.Thread(target=request, args=(uid, sensors, scheduled, urgent), daemon=True).start()
+    offered = time.perf_counter() - t0
+    while live[0] > 0 or (admission is not None and admission.handled + admission.coalesced < admission.admitted):
+        time.sleep(0.01)
+    time.sleep(0.05)
+    lost = sum(1 for key, _ in accepted_urgent if key not in svc.done)
+    e2e = sorted((svc.done[k] - sent[k]) * 1e3 for k in svc.done)
+    stats = admission.stats() if admission is not None else { 'coalesced': 0 }
+    lat = sorted(x * 1e3 for x in lat)
+    return {
+        'offered_hz': len(arrivals) / offered,
+        'analyzed': svc.analyzed,
+        'p50': percentile(lat, 50), 'p99': percentile(lat, 99), 'max': lat[-1] if lat else 0.0,
+        'e2e_p99': percentile(e2e, 99),
+        'coalesced': stats['coalesced'], '429': refused[429], '503': refused[503],
+        'urgent': len(accepted_urgent), 'lost': lost, 'threads': live[1],
+    }
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument('--work-us', type=float, default=10000.0, help='CPU per analyzed frame')
+    ap.add_argument('--seconds', type=float, default=5.0)
+    ap.add_argument('--loads', default='0.5,10', help='offered load as multiples of the sustainable rate')
+    ap.add_argument('--units', type=int, default=32)
+    ap.add_argument('--workers', type=int, default=2, help='admission workers (INGEST_WORKERS)')
+    ap.add_argument('--inbox', type=int, default=8, help='INGEST_INBOX_MAX')
+    ap.add_argument('--pending-max', type=int, default=1000, help='INGEST_PENDING_MAX')
+    args = ap.parse_args()
+
+    block_s = block_seconds()
+    rate = sustainable(args.work_us, block_s)
+    print(f'sustainable: {rate:.0f} frames/s at {args.work_us:g} us/frame; cpu_count={os.cpu_count()}')
+    print(f'{"mode":<11}{"load":>6}{"offered/s":>11}{"analyzed":>10}{"p50 ms":>9}{"p99 ms":>9}{"max ms":>9}'
+          f'{"e2e p99":>9}{"coalesced":>11}{"429":>6}{"503":>7}{"urgent":>8}{"lost":>6}{"threads":>9}')
+    for load in (float(x) for x in args.loads.split(',')):
+        for mode in ('inline', 'admission'):
+            r = run(mode, rate * load, args.seconds, args.units, args.work_us, block_s, args)
+            e2e = f'{r["e2e_p99"]:>9.1f}' if mode == 'admission' else f'{"":>9}'
+            print(f'{mode:<11}{load:>5g}x{r["offered_hz"]:>11.0f}{r["analyzed"]:>10}{r["p50"]:>9.1f}{r["p99"]:>9.1f}'
+                  f'{r["max"]:>9.1f}{e2e}{r["coalesced"]:>11}{r["429"]:>6}{r["503"]:>7}{r["urgent"]:>8}'
+                  f'{r["lost"]:>6}{r["threads"]:>9}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,78 @@
+"""
+/analyze per sensor (what AiService.analyzeSensor does, one HTTP call per sensor)
+vs /analyze/batch with the whole frame, against a spawned ai_analyzer.py.
+Also times the response encoder on its own (orjson when installed, else json).
+
+    python ai-service/bench/bench_analyze_batch.py [frames]
+"""
+import json
+import os
+import sys
+import time
+
+import requests
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+from analysis.analyzer import RiskAnalyzer
+from simulation.simulator import RuleSimulator
+from tools.loadgen import free_port, spawn_service
+from tools.stub_nest import StubNestServer
+from transport import jsonfast
+
+
+def run(name: str, frames, fn, per_call_frames: int = 1):
+    t0 = time.perf_counter()
+    lat = []
+    for i in range(0, len(frames), per_call_frames):
+        t = time.perf_counter()
+        fn(frames[i:i + per_call_frames])
+        lat.append((time.perf_counter() - t) / per_call_frames)
+    elapsed = time.perf_counter() - t0
+    lat.sort()
+    print(f'{name:<40}{len(frames) / elapsed:>10.0f}{lat[len(lat) // 2] * 1000:>12.3f}{lat[int(len(lat) * 0.99)] * 1000:>12.3f}')
+
+
+def main():
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 300
+    sim = RuleSimulator(seed=4)
+    frames = [sim.step() for _ in range(n)]
+    stub = StubNestServer(0).start()
+    port = free_port()
+    proc = spawn_service(stub.url, port, {})
+    base = f'http://127.0.0.1:{port}'
+    try:
+        s = requests.Session()
+
+        def per_sensor(chunk):
+            for s_ in chunk[0]:
+                s.post(f'{base}/analyze', json=s_).json()
+
+        def batch_sensors(chunk):
+            s.post(f'{base}/analyze/batch', json={ 'sensors': chunk[0] }).json()
+
+        def batch_frames(chunk):
+            s.post(f'{base}/analyze/batch', json={ 'frames': chunk }).json()
+
+        print(f'frames={n}, {len(frames[0])} sensors per frame')
+        print(f'{"":<40}{"frames/s":>10}{"p50 ms/fr":>12}{"p99 ms/fr":>12}')
+        run('/analyze, one call per sensor', frames, per_sensor)
+        run('/analyze/batch sensors, one call/frame', frames, batch_sensors)
+        run('/analyze/batch frames, one call/frame', frames, batch_frames)
+        run('/analyze/batch frames, 20 frames/call', frames, batch_frames, 20)
+    finally:
+        proc.terminate()
+        proc.wait(5)
+        stub.stop()
+
+    ra = RiskAnalyzer()
+    payload = { 'ok': True, 'frames': [ra.analyze_frame(f) for f in frames[:100]] }
+    for name, enc in (('json.dumps', lambda o: json.dumps(o, ensure_ascii=False, separators=(',', ':')).encode()),
+                      (f'jsonfast.dumps ({jsonfast.BACKEND})', jsonfast.dumps)):
+        t0 = time.perf_counter()
+        for _ in range(50):
+            enc(payload)
+        print(f'encode 100 analyzed frames, {name:<24}{(time.perf_counter() - t0) / 50 * 1000:8.3f} ms')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,126 @@
+"""
+Throughput of the serving modes under the same closed-loop load (tools/loadgen.py):
+the Flask server (ai_analyzer.py), ai_asgi.py in one process, and ai_asgi.py with
+N worker processes behind the unit-affinity router; a local stub Nest takes the
+forwarded frames. --subscribers keeps that many /stream clients connected during
+each run (Flask parks a thread per connection, the ASGI mode does not).
+
+Multi-worker numbers only mean something with at least as many free cores as
+workers plus the load generator; os.cpu_count() is printed with the results.
+
+    python ai-service/bench/bench_asgi.py --seconds 5 --concurrency 16 --units 16 --workers 2,4
+"""
+import argparse
+import os
+import sys
+import threading
+import time
+
+import requests
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+from tools.loadgen import frame_pool, free_port, run, spawn_service, summarize
+from tools.stub_nest import StubNestServer
+from transport.ndjson import body_unit
+
+
+def listen(base: str, n: int, stop: threading.Event, received: list):
+    def one():
+        try:
+            with requests.get(f'{base}/stream', stream=True, timeout=(2, None)) as resp:
+                for line in resp.iter_lines():
+                    if line.startswith(b'event: frame'):
+                        received[0] += 1
+                    if stop.is_set():
+                        return
+        except requests.RequestException:
+            pass
+    threads = [threading.Thread(target=one, daemon=True) for _ in range(n)]
+    for t in threads:
+        t.start()
+    return threads
+
+
+def check_routing() -> None:
+    """The router keys bodies by their top-level unit_id only, like the workers do."""
+    cases = (
+        (b'{"unit_id": "g-7", "sensors": []}', 'g-7'),
+        (b'{"unit_id": 12, "ts": 1}', 12),
+        (b'{"meta": {"unit_id": "nested"}, "unit_id": "g-2", "sensors": []}', 'g-2'),
+        (b'{"meta": {"unit_id": "nested"}, "sensors": []}', None),
+        (b'{"note": "\\"unit_id\\": \\"in-a-string\\"", "unit_id": "g-3"}', 'g-3'),
+        (b'[{"unit_id": "g-4"}]', None),
+        (b'{"unit_id": "g-5", "oil_pressure": NaN}', 'g-5'),
+        (b'not json "unit_id": "g-6"', None),
+    )
+    for body, want in cases:
+        got = body_unit(body)
+        assert got == want, (body, got, want)
+
+
+def measure(server: str, workers: int, args, endpoints, pool):
+    stub = StubNestServer(0, args.nest_delay_ms).start()
+    port = free_port()
+    proc = spawn_service(stub.url, port, { 'LOG_LEVEL': 'WARNING' }, server, workers)
+    base = f'http://127.0.0.1:{port}'
+    stop = threading.Event()
+    received = [0]
+    try:
+        listen(base, args.subscribers, stop, received)
+        time.sleep(0.5)
+        warm = argparse.Namespace(**{ **vars(args), 'seconds': args.warmup })
+        run(warm, base, endpoints, pool)
+        recorders, elapsed = run(args, base, endpoints, pool)
+        time.sleep(0.2)
+        nest = stub.stats.snapshot()
+        fwd = requests.get(f'{base}/forwarder', timeout=5).json()
+        fwd = fwd.get('total', fwd)  # summed over workers behind the router
+    finally:
+        stop.set()
+        proc.terminate()
+        try:
+            proc.wait(10)
+        except Exception:
+            proc.kill()
+        stub.stop()
+    return { ep: summarize(recorders[ep], elapsed) for ep in endpoints }, nest, fwd, received[0]
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument('--endpoint', default='ingest,analyze,simulate', help='comma list of loadgen endpoints')
+    ap.add_argument('--units', type=int, default=16)
+    ap.add_argument('--concurrency', type=int, default=16)
+    ap.add_argument('--seconds', type=float, default=5.0)
+    ap.add_argument('--warmup', type=float, default=1.0)
+    ap.add_argument('--workers', default='2,4', help='worker counts to try behind the router')
+    ap.add_argument('--subscribers', type=int, default=0, help='/stream clients kept open during each run')
+    ap.add_argument('--nest-delay-ms', type=float, default=0.0)
+    args = ap.parse_args()
+    check_routing()
+    args.rate = 0.0
+    args.timeout = 10.0
+    endpoints = args.endpoint.split(',')
+    pool = frame_pool(args.units, 256, 1)
+
+    configs = [('flask', 1), ('asgi', 1)] + [('asgi', int(w)) for w in args.workers.split(',') if int(w) > 1]
+    print(f'cpu_count={os.cpu_count()} concurrency={args.concurrency} units={args.units} '
+          f'subscribers={args.subscribers} {args.seconds:g}s per run')
+    print(f'{"server":<12}{"endpoint":<10}{"req/s":>9}{"p50 ms":>9}{"p99 ms":>9}{"errors":>8}')
+    base_rps = {}
+    for server, workers in configs:
+        name = f'{server} x{workers}'
+        result, nest, fwd, received = measure(server, workers, args, endpoints, pool)
+        for ep, r in result.items():
+            rps = r['throughput_rps']
+            base_rps.setdefault(ep, rps)
+            rel = f'  x{rps / base_rps[ep]:.2f}' if base_rps[ep] else ''
+            print(f'{name:<12}{ep:<10}{rps:>9.1f}{r["latency_ms"]["p50"]:>9.2f}{r["latency_ms"]["p99"]:>9.2f}'
+                  f'{r["errors"]:>8}{rel}')
+        print(f'{"":<12}nest frames={nest["frames"]} posts={nest["posts"]} '
+              f'forwarder dropped={fwd.get("dropped")} queued={fwd.get("queue_depth")}'
+              + (f' stream frames received={received}' if args.subscribers else ''))
+
+
+if __name__ == '__main__':
+    main()
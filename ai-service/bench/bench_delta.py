@@ -0,0 +1,224 @@
+"""
+Change-only forwarding to Nest (transport/delta.py, FWD_DELTA=1) on a recorded
+run: full frames vs deltas with keyframes at several deadbands. For each mode
+it reports the frames and sensors POSTed, the bytes of the forwarder bodies
+(coalesced like NestForwarder: frames of one tick, up to 20 per POST), and the
+fidelity of what Nest shows after merging: severities that differ from the full
+frame (must be 0) and the largest value error in deadbands (at most 1).
+
+Nest CPU is measured by replaying the bodies through node with the work of
+SensorsController.ingest (JSON.parse, per-unit merge, sensor mapping, one log
+line per received sensor, JSON.stringify of the emitted list as Socket.IO does),
+without the HTTP stack; skipped when node is not installed.
+
+By default the run is recorded first: --units simulated units at 1 Hz for
+--seconds, analyzed and written to a telemetry log, then replayed from it.
+--tlog DIR replays an existing telemetry log instead (TLOG_DIR of a real run).
+
+    python ai-service/bench/bench_delta.py [--units 8] [--seconds 1800] [--tlog DIR]
+"""
+import argparse
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+from analysis.analyzer import RiskAnalyzer
+from analysis.units import UnitState
+from simulation.simulator import RuleSimulator
+from storage.telemetry_log import LogReader, TelemetryLog
+from transport.delta import DeltaEncoder, deadbands
+
+BATCH_MAX = 20
+
+NEST_MODEL = r'''
+const fs = require('fs');
+const bodies = fs.readFileSync(process.argv[2], 'utf8').split('\n').filter(Boolean);
+const units = new Map();
+const sink = [];
+function merge(unitId, sensors, body) {
+  const delta = body.delta === true;
+  if (!delta && body.keyframe !== true) return sensors;
+  let state = units.get(unitId);
+  if (state && state.epoch !== body.epoch) state = undefined;
+  const seq = typeof body.seq === 'number' ? body.seq : state ? state.seq + 1 : 0;
+  if (!state || (!delta && seq > state.seq)) {
+    state = { epoch: body.epoch, seq, sensors: new Map() }; units.delete(unitId); units.set(unitId, state);
+  }
+  for (const s of sensors) {
+    const cur = state.sensors.get(s.id);
+    if (!cur || cur.seq <= seq) state.sensors.set(s.id, { sensor: s, seq });
+  }
+  state.seq = Math.max(state.seq, seq);
+  return Array.from(state.sensors.values(), (e) => e.sensor);
+}
+function ingestFrame(body) {
+  const sensors = Array.isArray(body.sensors) ? body.sensors : [];
+  const merged = merge(String(body.unit_id ?? 'default'), sensors, body);
+  const state = merged.map((s) => ({ id: s.id, type: s.type, value: s.value, min: s.min, max: s.max,
+                                     unit: s.unit, critical: s.severity === 'critical' }));
+  for (const s of sensors) {
+    const status = s.severity === 'critical' ? 'NOT OK' : 'OK';
+    const probStr = typeof s.risk_probability === 'number' ? ` p=${s.risk_probability}` : '';
+    sink.push(`[NEST-INGEST] ${s.id}=${s.value} status=${status}${probStr}`);
+  }
+  sink.push(`[NEST-EMIT] sensors:update count=${merged.length}`);
+  sink.push(JSON.stringify(['sensors:update', merged]));
+  if (sink.length > 4096) sink.length = 0;
+  return state.length;
+}
+let best = Infinity;
+for (let rep = 0; rep < 5; rep++) {
+  const t0 = process.cpuUsage();
+  for (const raw of bodies) {
+    const body = JSON.parse(raw);
+    const frames = Array.isArray(body.frames) ? body.frames : [body];
+    for (const f of frames) ingestFrame(f);
+  }
+  const d = process.cpuUsage(t0);
+  best = Math.min(best, (d.user + d.system) / 1000);
+}
+console.log(best.toFixed(1));
+'''
+
+
+def record(directory, n_units, seconds):
+    """Simulated units at 1 Hz, analyzed like /ingest and written to a telemetry log."""
+    log = TelemetryLog(directory).start()
+    sims = [RuleSimulator(seed=22 + u) for u in range(n_units)]
+    analyzers = [RiskAnalyzer() for _ in range(n_units)]
+    t0 = 1_700_000_000.0
+    for t in range(seconds):
+        for u in range(n_units):
+            log.append(f'unit-{u}', t0 + t, analyzers[u].analyze_frame(sims[u].step()))
+    log.close()
+
+
+class NestView:
+    """What Nest shows per unit after merging, checked against the full frame of every tick."""
+
+    def __init__(self, bands):
+        self.bands = bands
+        self.shown = {}
+        self.mismatched = 0
+        self.worst = 0.0
+
+    def apply(self, frame):
+        state = self.shown.setdefault(frame['unit_id'], {})
+        if not frame.get('delta'):
+            state.clear()
+        for s in frame['sensors']:
+            state[s['id']] = s
+
+    def check(self, uid, analyzed):
+        state = self.shown.get(uid, {})
+        for s in analyzed:
+            got = state.get(s['id'])
+            if got is None or got['severity'] != s['severity']:
+                self.mismatched += 1
+                continue
+            v, g, band = s['value'], got['value'], self.bands.get(s['id'])
+            if band and isinstance(v, (int, float)) and not isinstance(v, bool):
+                self.worst = max(self.worst, abs(v - g) / band)
+            elif v != g:
+                self.mismatched += 1
+
+
+def bodies(frames, encoder, view):
+    """Forwarder POST bodies in order; frames of one tick coalesce up to BATCH_MAX."""
+    units = {}
+    out, batch, tick = [], [], None
+    for uid, ts, analyzed in frames:
+        if batch and (ts != tick or len(batch) >= BATCH_MAX):
+            out.append(batch[0] if len(batch) == 1 else { 'frames': batch })
+            batch = []
+        tick = ts
+        if encoder is None:
+            frame = { 'unit_id': uid, 'sensors': analyzed }
+        else:
+            unit = units.get(uid)
+            if unit is None:
+                unit = units[uid] = UnitState(uid, None)
+            sensors, marks = encoder.encode(unit, analyzed, ts)
+            frame = None
+            if sensors is not None:
+                frame = { 'unit_id': uid, 'sensors': sensors, **marks }
+        if frame is not None:
+            batch.append(frame)
+            view.apply(frame)
+        view.check(uid, analyzed)
+    if batch:
+        out.append(batch[0] if len(batch) == 1 else { 'frames': batch })
+    return out
+
+
+def encode_cost(frames, bands, keyframe):
+    """us per frame of DeltaEncoder.encode on the request path."""
+    encoder = DeltaEncoder(bands, keyframe)
+    units = { uid: UnitState(uid, None) for uid, _, _ in frames }
+    t0 = time.perf_counter()
+    for uid, ts, analyzed in frames:
+        encoder.encode(units[uid], analyzed, ts)
+    return (time.perf_counter() - t0) / len(frames) * 1e6
+
+
+def nest_cpu(posted, tmp):
+    path = os.path.join(tmp, 'bodies.ndjson')
+    with open(path, 'w') as f:
+        for body in posted:
+            f.write(json.dumps(body, separators=(',', ':'), ensure_ascii=False) + '\n')
+    script = os.path.join(tmp, 'nest_model.js')
+    with open(script, 'w') as f:
+        f.write(NEST_MODEL)
+    out = subprocess.run(['node', script, path], capture_output=True, text=True, check=True)
+    return float(out.stdout.strip())
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument('--units', type=int, default=8)
+    ap.add_argument('--seconds', type=int, default=1800)
+    ap.add_argument('--tlog', help='replay this telemetry log instead of recording a simulator run')
+    args = ap.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        directory = args.tlog
+        if directory is None:
+            directory = os.path.join(tmp, 'tlog')
+            record(directory, args.units, args.seconds)
+        t0 = time.perf_counter()
+        frames = list(LogReader(directory).replay())
+        print(f'replayed {len(frames)} frames of {len({f[0] for f in frames})} units '
+              f'from {directory if args.tlog else "a recorded simulator run"} in {time.perf_counter() - t0:.1f}s')
+
+        modes = [('full frames', None, None)]
+        for pct, keyframe in ((0.0, 10.0), (1.0, 10.0), (5.0, 10.0), (1.0, 60.0)):
+            modes.append((f'delta {pct:g}% kf {keyframe:g}s', pct, keyframe))
+        node = shutil.which('node')
+        print(f'{"mode":<22}{"posts":>8}{"frames":>9}{"sensors":>10}{"KB":>10}{"bytes %":>9}'
+              f'{"sev diff":>10}{"max err":>9}{"enc us":>8}' + (f'{"Nest ms":>10}{"cpu %":>8}' if node else ''))
+        base_bytes = base_cpu = None
+        for name, pct, keyframe in modes:
+            bands = deadbands(pct) if pct is not None else {}
+            encoder = DeltaEncoder(bands, keyframe) if pct is not None else None
+            view = NestView(bands)
+            posted = bodies(frames, encoder, view)
+            sent = [f for b in posted for f in b.get('frames', [b])]
+            size = sum(len(json.dumps(b)) for b in posted)
+            base_bytes = base_bytes or size
+            row = (f'{name:<22}{len(posted):>8}{len(sent):>9}{sum(len(f["sensors"]) for f in sent):>10}'
+                   f'{size / 1024:>10.0f}{size / base_bytes * 100:>8.1f}%{view.mismatched:>10}{view.worst:>9.2f}'
+                   f'{encode_cost(frames, bands, keyframe) if encoder is not None else 0.0:>8.2f}')
+            if node:
+                cpu = nest_cpu(posted, tmp)
+                base_cpu = base_cpu or cpu
+                row += f'{cpu:>10.1f}{cpu / base_cpu * 100:>7.1f}%'
+            print(row)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,114 @@
+"""
+Rolling-window features (analysis/features.py): checks against NumPy over the
+same windows, equivalence of window=1 with the previous-frame rules, per-frame
+cost as the window grows, and how a single-sample fuel level glitch and a real
+leak are judged with DERIVED_WINDOW 1 vs larger windows.
+
+    python ai-service/bench/bench_features.py [frames]
+"""
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+from analysis.analyzer import RiskAnalyzer
+from analysis.features import DerivedFeatures, RollingMinMax, RollingSlope, RollingStats
+from simulation.simulator import RuleSimulator
+
+
+def check_primitives():
+    rng = np.random.default_rng(18)
+    x = rng.normal(50, 10, 5000).round(1)
+    for w in (2, 7, 64):
+        st, mm, sl = RollingStats(w), RollingMinMax(w), RollingSlope(w)
+        for i, v in enumerate(x):
+            st.update(v)
+            mm.update(v)
+            sl.update(v)
+            win = x[max(0, i - w + 1): i + 1]
+            assert abs(st.mean - win.mean()) < 1e-9 and abs(st.variance() - win.var()) < 1e-6
+            assert mm.min() == win.min() and mm.max() == win.max()
+            if len(win) >= 2:
+                assert abs(sl.slope() - np.polyfit(np.arange(len(win)), win, 1)[0]) < 1e-6
+    print('rolling mean/var, min/max, slope match NumPy for windows 2, 7, 64')
+
+
+def check_window_one(frames):
+    legacy, windowed = RiskAnalyzer(window=1), RiskAnalyzer(window=1)
+    windowed.features = DerivedFeatures(1)  # force the feature path with a one-frame window
+    diff = 0
+    for f in frames:
+        a = legacy.analyze_frame(f)
+        b = windowed.analyze_frame(f)
+        diff += [(s['id'], s['severity'], s['value']) for s in a] != [(s['id'], s['severity'], s['value']) for s in b]
+    print(f'window=1 feature path vs previous-frame rules: {diff} of {len(frames)} frames differ')
+
+
+def cost(frames):
+    n = len(frames)
+    base = RiskAnalyzer(window=1)
+    t0 = time.perf_counter()
+    for f in frames:
+        base.analyze_frame(f)
+    t_base = (time.perf_counter() - t0) / n * 1e6
+    print(f'{"window":>8}{"features.update us":>20}{"analyze_frame us":>18}')
+    print(f'{"legacy":>8}{"-":>20}{t_base:>18.2f}')
+    vals = [(float(i % 1700 + 800), 80.0 - i * 0.001, 12.0) for i in range(n)]
+    for w in (2, 10, 100, 1000, 10000):
+        feats = DerivedFeatures(w)
+        t0 = time.perf_counter()
+        for r, lvl, c in vals:
+            feats.update(r, lvl, c)
+            feats.rpm_jitter()
+            feats.fuel_drop()
+        t_feat = (time.perf_counter() - t0) / n * 1e6
+        a = RiskAnalyzer(window=w)
+        t0 = time.perf_counter()
+        for f in frames:
+            a.analyze_frame(f)
+        t_frame = (time.perf_counter() - t0) / n * 1e6
+        print(f'{w:>8}{t_feat:>20.2f}{t_frame:>18.2f}')
+
+
+def leak_scenarios():
+    def frame(level, rpm=1500.0):
+        return [
+            { 'id': 'rpm', 'value': rpm }, { 'id': 'fuel_level', 'value': level },
+            { 'id': 'fuel_consumption', 'value': 5.0 }, { 'id': 'fuel_pressure', 'value': 3.5 },
+            { 'id': 'oil_pressure', 'value': 4.0 }, { 'id': 'voltage', 'value': 24.0 },
+        ]
+
+    def leaks(levels, w):
+        a = RiskAnalyzer(window=w)
+        out = []
+        for lv in levels:
+            sev = { s['id']: s['severity'] for s in a.analyze_frame(frame(lv)) }
+            out.append(sev['fuel_leak'])
+        return out
+
+    steady = [80.0 - 0.05 * i for i in range(60)]
+    glitch = list(steady)
+    glitch[30] -= 4.0                                   # one bad reading, level recovers next frame
+    leak = steady[:30] + [steady[29] - 3.5 * (i + 1) for i in range(10)]  # real loss of 3.5 %/frame
+    print(f'{"window":>8}{"glitch alarms":>15}{"leak: first alarm after":>26}')
+    for w in (1, 3, 5, 10):
+        g = sum(s != 'normal' for s in leaks(glitch, w))
+        lk = leaks(leak, w)
+        first = next((i - 30 + 1 for i, s in enumerate(lk) if i >= 30 and s == 'critical'), None)
+        print(f'{w:>8}{g:>15}{(str(first) + " frames") if first else "never":>26}')
+
+
+def main():
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 20000
+    sim = RuleSimulator(seed=18)
+    frames = [sim.step() for _ in range(n)]
+    check_primitives()
+    check_window_one(frames)
+    cost(frames)
+    leak_scenarios()
+
+
+if __name__ == '__main__':
+    main()
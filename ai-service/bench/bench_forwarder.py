@@ -0,0 +1,99 @@
+"""
+Load test of the /ingest -> Nest forward path against the local stub Nest:
+legacy thread + requests.post per frame vs the pooled, batching NestForwarder.
+Frames are offered at a fixed rate; the stub adds --delay-ms per POST.
+
+    python ai-service/bench/bench_forwarder.py --rate 50 --seconds 5 --delay-ms 20
+"""
+import argparse
+import os
+import sys
+import threading
+import time
+
+import requests
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+from simulation.simulator import RuleSimulator
+from tools.stub_nest import StubNestServer
+from transport.forwarder import NestForwarder
+
+
+def offer(rate: float, seconds: float, send) -> float:
+    sim = RuleSimulator()
+    frames = [sim.step() for _ in range(64)]
+    interval = 1.0 / rate
+    n = int(rate * seconds)
+    t0 = time.perf_counter()
+    for i in range(n):
+        target = t0 + i * interval
+        delay = target - time.perf_counter()
+        if delay > 0:
+            time.sleep(delay)
+        send(frames[i % len(frames)])
+    return time.perf_counter() - t0
+
+
+def legacy(url: str, rate: float, seconds: float):
+    peak = [0]
+
+    def send(frame):
+        def _forward():
+            try:
+                requests.post(url, json={ 'sensors': frame }, timeout=1.5)
+            except Exception:
+                pass
+        threading.Thread(target=_forward, daemon=True).start()
+        peak[0] = max(peak[0], threading.active_count())
+
+    offer(rate, seconds, send)
+    deadline = time.time() + 10
+    while threading.active_count() > 2 and time.time() < deadline:
+        time.sleep(0.05)
+    return { 'peak_threads': peak[0] }
+
+
+def pooled(url: str, rate: float, seconds: float, batch_max: int, window_ms: float, queue_max: int):
+    fwd = NestForwarder(url, max_queue=queue_max, batch_max=batch_max, batch_window=window_ms / 1000.0)
+    fwd.start()
+    peak = [0]
+
+    def send(frame):
+        fwd.submit('bench', frame)
+        peak[0] = max(peak[0], threading.active_count())
+
+    offer(rate, seconds, send)
+    deadline = time.time() + 10
+    while fwd.depth() and time.time() < deadline:
+        time.sleep(0.05)
+    fwd.stop()
+    return { 'peak_threads': peak[0], **{ k: v for k, v in fwd.stats().items() if k in ('dropped', 'coalesced', 'failed') } }
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument('--rate', type=float, default=50.0, help='frames per second offered')
+    ap.add_argument('--seconds', type=float, default=5.0)
+    ap.add_argument('--delay-ms', type=float, default=20.0, help='stub Nest time per POST')
+    ap.add_argument('--batch-max', type=int, default=20)
+    ap.add_argument('--window-ms', type=float, default=20.0)
+    ap.add_argument('--queue-max', type=int, default=1000)
+    args = ap.parse_args()
+
+    print(f'rate={args.rate}/s seconds={args.seconds} nest delay={args.delay_ms}ms')
+    for name in ('legacy', 'pooled'):
+        srv = StubNestServer(0, args.delay_ms).start()
+        t0 = time.perf_counter()
+        if name == 'legacy':
+            extra = legacy(srv.url, args.rate, args.seconds)
+        else:
+            extra = pooled(srv.url, args.rate, args.seconds, args.batch_max, args.window_ms, args.queue_max)
+        elapsed = time.perf_counter() - t0
+        st = srv.stats.snapshot()
+        srv.stop()
+        print(f'{name:<7} frames={st["frames"]:<6} posts={st["posts"]:<6} tcp_connections={st["connections"]:<6} '
+              f'elapsed={elapsed:.2f}s ' + ' '.join(f'{k}={v}' for k, v in extra.items()))
+
+
+if __name__ == '__main__':
+    main()
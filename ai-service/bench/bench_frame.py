@@ -0,0 +1,102 @@
+"""
+RiskAnalyzer.analyze (analysis/frame.py: fixed slots, dicts built only for the
+response) vs analyze_frame (the dict list) for one unit's frames: time per frame
+and tracemalloc allocations, analysis alone and with the record path of
+ai_analyzer.analyze_sensors (history ring append + severity metrics).
+
+Allocations are counted on frames kept alive (blocks and bytes a frame leaves
+behind) and as the peak of one frame whose result is dropped (transient bytes).
+
+    python ai-service/bench/bench_frame.py [frames]
+"""
+import os
+import sys
+import time
+import tracemalloc
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+from analysis.analyzer import RiskAnalyzer
+from analysis.sensors import SENSOR_IDS
+from observability.metrics import ServiceMetrics
+from simulation.simulator import RuleSimulator
+from storage.timeseries import UnitHistory
+
+
+def paths(window):
+    metrics = ServiceMetrics(known_sensors=SENSOR_IDS)
+
+    def dicts(ra, hist):
+        def run(i, sensors):
+            out = ra.analyze_frame(sensors)
+            metrics.observe_frame('u', out)
+            hist.append(float(i), out)
+            return out
+        return run
+
+    def frame(ra, hist):
+        def run(i, sensors):
+            f = ra.analyze(sensors)
+            metrics.observe_frame('u', f)
+            hist.append(float(i), f)
+            return f.to_dicts()
+        return run
+
+    return [
+        ('analyze_frame', lambda ra, hist: lambda i, s: ra.analyze_frame(s)),
+        ('analyze -> Frame', lambda ra, hist: lambda i, s: ra.analyze(s)),
+        ('dicts + record', dicts),
+        ('Frame + record + to_dicts', frame),
+    ]
+
+
+def timed(runs, frames, window, reps=7):
+    """Best us/frame of each path; paths alternate within a repetition so drift hits all alike."""
+    best = [float('inf')] * len(runs)
+    for _ in range(reps):
+        for k, (_, make) in enumerate(runs):
+            run = make(RiskAnalyzer(window=window), UnitHistory(len(frames)))
+            t0 = time.perf_counter()
+            for i, s in enumerate(frames):
+                run(i, s)
+            best[k] = min(best[k], time.perf_counter() - t0)
+    return [b / len(frames) * 1e6 for b in best]
+
+
+def allocations(make, frames, window):
+    run = make(RiskAnalyzer(window=window), UnitHistory(len(frames)))
+    for i, s in enumerate(frames[:50]):
+        run(i, s)
+    kept = []
+    tracemalloc.start()
+    before = tracemalloc.take_snapshot()
+    for i, s in enumerate(frames):
+        kept.append(run(i, s))
+    stats = tracemalloc.take_snapshot().compare_to(before, 'filename')
+    blocks = sum(st.count_diff for st in stats) / len(frames)
+    size = sum(st.size_diff for st in stats) / len(frames)
+    peak = 0
+    for i, s in enumerate(frames[:500]):
+        tracemalloc.reset_peak()
+        base = tracemalloc.get_traced_memory()[0]
+        run(i, s)
+        peak = max(peak, tracemalloc.get_traced_memory()[1] - base)
+    tracemalloc.stop()
+    return blocks, size, peak
+
+
+def main():
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 20000
+    sim = RuleSimulator(seed=21)
+    frames = [sim.step() for _ in range(n)]
+    print(f'{n} frames, {len(frames[0])} sensors per frame')
+    for window in (1, 10):
+        print(f'\nwindow={window}')
+        print(f'{"":<28}{"us/frame":>10}{"blocks kept":>13}{"B kept":>9}{"peak B":>9}')
+        runs = paths(window)
+        for (name, make), us in zip(runs, timed(runs, frames, window)):
+            blocks, size, peak = allocations(make, frames[:5000], window)
+            print(f'{name:<28}{us:>10.2f}{blocks:>13.1f}{size:>9.0f}{peak:>9.0f}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,68 @@
+"""
+Cost of the /metrics instrumentation on the hot path: histogram/counter updates
+and observe_frame() per analyzed frame, sampled logging vs the old print(flush=True)
+per ingest (written to a file, so every print is a write syscall), and scrape time.
+
+    python ai-service/bench/bench_metrics.py [iterations]
+"""
+import logging
+import os
+import sys
+import tempfile
+import time
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+from analysis.analyzer import RiskAnalyzer
+from analysis.sensors import SENSOR_IDS
+from observability import logs
+from observability.metrics import ServiceMetrics
+from simulation.simulator import RuleSimulator
+
+
+def per_call(fn, n):
+    t0 = time.perf_counter()
+    for i in range(n):
+        fn(i)
+    return (time.perf_counter() - t0) / n * 1e9
+
+
+def main():
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 200000
+    m = ServiceMetrics(known_sensors=SENSOR_IDS)
+    sim = RuleSimulator(seed=16)
+    ra = RiskAnalyzer()
+    frames = [ra.analyze_frame(sim.step()) for _ in range(1000)]
+    units = [f'g-{i}' for i in range(32)]
+
+    rows = [
+        ('Histogram.observe', per_call(lambda i: m.requests.observe(0.0012, ('/ingest', 'POST')), n)),
+        ('Counter.inc', per_call(lambda i: m.responses.inc(('/ingest', 'POST', '200')), n)),
+        ('observe_frame (15 sensors)', per_call(lambda i: m.observe_frame(units[i & 31], frames[i % 1000]), n // 4)),
+        ('analyze_frame itself', per_call(lambda i: ra.analyze_frame(sim.step()), n // 20)),
+    ]
+
+    log = logging.getLogger('bench-metrics')
+    log.addHandler(logging.NullHandler())
+    log.setLevel(logging.INFO)
+    log.propagate = False
+    rows.append(('sampled INFO (suppressed)',
+                 per_call(lambda i: logs.sampled(log, logging.INFO, 'k', '[PY-INGEST] unit=%s count=%d', 'g-1', 15), n)))
+    rows.append(('DEBUG when level is INFO', per_call(lambda i: log.debug('[PY-INGEST] %s', frames[0]), n)))
+    with tempfile.TemporaryFile('w') as f:
+        def old_print(i):
+            s = frames[i % 1000]
+            print(f"[PY-INGEST] unit=g-1 count={len(s)} ids={[str(x.get('id')) for x in s]}", file=f, flush=True)
+            print(f"[PY-INGEST-SAMPLE] {s[0]}", file=f, flush=True)
+        rows.append(('old per-frame print x2', per_call(old_print, n // 10)))
+
+    t0 = time.perf_counter()
+    body = m.render()
+    scrape_ms = (time.perf_counter() - t0) * 1000
+
+    for name, ns in rows:
+        print(f'{name:<30}{ns:>10.0f} ns/call')
+    print(f'scrape: {len(body.splitlines())} lines, {len(body)} bytes in {scrape_ms:.2f} ms')
+
+
+if __name__ == '__main__':
+    main()
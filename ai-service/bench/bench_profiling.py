@@ -0,0 +1,73 @@
+"""
+Cost of the profiling hooks (observability/profiling.py): mark() with profiling
+off and on, begin()/end() of a request that is timed but not sampled, and a full
+cProfile (+ tracemalloc) capture written to disk.
+
+    python ai-service/bench/bench_profiling.py [iterations]
+"""
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+from analysis.analyzer import RiskAnalyzer
+from observability import profiling
+from observability.profiling import Profiler
+from simulation.simulator import RuleSimulator
+
+
+def per_call(fn, n):
+    t0 = time.perf_counter()
+    for _ in range(n):
+        fn()
+    return (time.perf_counter() - t0) / n * 1e9
+
+
+def main():
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 200000
+    tmp = tempfile.mkdtemp()
+    try:
+        sim = RuleSimulator(seed=17)
+        ra = RiskAnalyzer()
+        frame = sim.step()
+        off = Profiler(tmp, every=0, routes=['/ingest'])
+        timed = Profiler(tmp, every=10 ** 9, routes=['/ingest'])
+        full = Profiler(tmp, every=1, routes=['/ingest'])
+        mem = Profiler(tmp, every=1, memory=True, routes=['/ingest'])
+
+        def request(p):
+            def run():
+                cap = p.begin('/ingest')
+                profiling.mark('parse')
+                ra.analyze_frame(frame)
+                profiling.mark('analyze')
+                if cap is not None:
+                    p.end(cap)
+            return run
+
+        cap = timed.begin('/ingest')
+        mark_on = per_call(lambda: profiling.mark('x'), n)
+        timed.end(cap)
+        rows = [
+            ('mark(), profiling off', per_call(lambda: profiling.mark('x'), n)),
+            ('mark(), request timed', mark_on),
+            ('begin+end, off', per_call(lambda: off.begin('/ingest'), n)),
+        ]
+        base = per_call(lambda: ra.analyze_frame(frame), n // 50)
+        k = n // 50
+        rows.append(('analyze_frame alone', base))
+        rows.append(('+ hooks, profiling off', per_call(request(off), k)))
+        rows.append(('+ hooks, stage timing only', per_call(request(timed), k)))
+        rows.append(('+ cProfile capture', per_call(request(full), 200)))
+        rows.append(('+ cProfile + tracemalloc', per_call(request(mem), 50)))
+        for name, ns in rows:
+            print(f'{name:<30}{ns / 1000:>10.2f} us')
+        print(f'captures kept: {len([x for x in os.listdir(tmp) if x.endswith(".json")])} (keep={full.keep})')
+    finally:
+        shutil.rmtree(tmp, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    main()
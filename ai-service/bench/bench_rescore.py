@@ -0,0 +1,67 @@
+"""
+Offline re-scoring (tools/rescore.py): frames/s with 1..N worker processes on a
+generated multi-unit NDJSON history, checked against sequential per-unit
+RiskAnalyzer.analyze_frame. Speedup is bounded by the cores available here.
+
+    python ai-service/bench/bench_rescore.py [frames] [units]
+"""
+import json
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+from analysis.analyzer import RiskAnalyzer
+from simulation.simulator import RuleSimulator
+from tools.rescore import rescore
+
+
+def main():
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 60000
+    units = int(sys.argv[2]) if len(sys.argv) > 2 else 64
+    sim = RuleSimulator(seed=15)
+    tmp = tempfile.mkdtemp()
+    try:
+        path = os.path.join(tmp, 'history.ndjson')
+        with open(path, 'w', encoding='utf-8') as f:
+            for i in range(n):
+                f.write(json.dumps({ 'unit_id': f'g-{i % units}', 'ts': float(i), 'sensors': sim.step() }) + '\n')
+
+        # reference: one analyzer per unit, file order
+        analyzers = {}
+        expected = {}
+        t0 = time.perf_counter()
+        with open(path, encoding='utf-8') as f:
+            for line in f:
+                body = json.loads(line)
+                a = analyzers.setdefault(body['unit_id'], RiskAnalyzer())
+                out = a.analyze_frame(body['sensors'])
+                expected[(body['unit_id'], body['ts'])] = { s['id']: s['severity'] for s in out }
+        seq = n / (time.perf_counter() - t0)
+
+        cores = os.cpu_count() or 1
+        print(f'frames={n} units={units} cores={cores}')
+        print(f'{"sequential loop":<18}{seq:>10.0f} frames/s')
+        base = None
+        for w in sorted({ 1, 2, 4, cores }):
+            out_dir = os.path.join(tmp, f'out-{w}')
+            s = rescore([path], workers=w, out_dir=out_dir)
+            got = {}
+            for name in os.listdir(out_dir):
+                if name.startswith('part-'):
+                    with open(os.path.join(out_dir, name), encoding='utf-8') as f:
+                        for line in f:
+                            row = json.loads(line)
+                            got[(row['unit_id'], row['ts'])] = row['severity']
+            assert got == expected, f'workers={w}: output differs from sequential analysis'
+            base = base or s['frames_per_s']
+            print(f'{f"workers={w}":<18}{s["frames_per_s"]:>10.0f} frames/s   speedup x{s["frames_per_s"] / base:.2f}')
+        print('per-frame severities identical to the sequential run for every worker count')
+    finally:
+        shutil.rmtree(tmp, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    main()
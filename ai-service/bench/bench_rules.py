@@ -0,0 +1,231 @@
+"""
+Rule engine microbenchmark: compiled band tables (analysis.rules) vs the former
+if-chain in RiskAnalyzer.score. Also sweeps every band edge, its float neighbours
+and random values to check both produce identical output.
+
+    python ai-service/bench/bench_rules.py
+"""
+import math
+import os
+import random
+import sys
+import timeit
+from typing import Dict, Any
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+from analysis.analyzer import RiskAnalyzer
+from analysis.rules import BANDS
+
+
+# Reference: RiskAnalyzer.score before the band table was introduced.
+def legacy_score(sensor: Dict[str, Any], prev_frame: Dict[str, Any]) -> Dict[str, Any]:
+    s_id = str(sensor.get('id'))
+    value = sensor.get('value')
+
+    def resp(sev: str, p: float) -> Dict[str, Any]:
+        return { 'id': s_id, 'severity': sev, 'risk_probability': round(float(max(0.0, min(1.0, p))), 3) }
+
+    if s_id == 'rpm' and isinstance(value, (int, float)):
+        # Assume genset nominal 1500 rpm (50 Hz). Idle band: 600–800.
+        nominal = 1500.0
+        dev = abs(value - nominal) / nominal
+        if 600 <= value <= 800:
+            return resp('normal', 0.05)
+        if dev <= 0.08:
+            return resp('normal', 0.1)
+        if dev <= 0.12:
+            return resp('warning', 0.5)
+        return resp('critical', 0.9)
+
+    if s_id == 'engine_temp_coolant' and isinstance(value, (int, float)):
+        if 80 <= value <= 95:
+            return resp('normal', 0.05)
+        if 96 <= value <= 104:
+            return resp('warning', 0.5)
+        if value >= 105:
+            return resp('critical', 0.92 if value >= 110 else 0.8)
+        return resp('warning', 0.4)
+
+    if s_id == 'oil_temp' and isinstance(value, (int, float)):
+        if 80 <= value <= 110:
+            return resp('normal', 0.05)
+        if 111 <= value <= 120:
+            return resp('warning', 0.6)
+        if value >= 121:
+            return resp('critical', 0.92 if value >= 130 else 0.82)
+        return resp('warning', 0.4)
+
+    if s_id == 'oil_pressure' and isinstance(value, (int, float)):
+        # Норма 2.5–5.0; предупреждение рядом с границами; критика только при явных выходах
+        if 2.5 <= value <= 5.0:
+            return resp('normal', 0.06)
+        if (2.0 <= value < 2.5) or (5.0 < value <= 6.0):
+            return resp('warning', 0.5)
+        if value < 1.5 or value > 7.0:
+            return resp('critical', 0.9)
+        return resp('warning', 0.6)
+
+    if s_id == 'fuel_pressure' and isinstance(value, (int, float)):
+        if 2.5 <= value <= 5.0:
+            return resp('normal', 0.06)
+        if (2.0 <= value < 2.5) or (5.0 < value <= 6.0):
+            return resp('warning', 0.5)
+        if value < 1.8 or value > 7.0:
+            return resp('critical', 0.9)
+        return resp('warning', 0.6)
+
+    if s_id == 'fuel_level' and isinstance(value, (int, float)):
+        if value >= 30:
+            return resp('normal', 0.05)
+        if 15 <= value < 30:
+            return resp('warning', 0.5)
+        return resp('critical', 0.9)
+
+    if s_id == 'fuel_consumption' and isinstance(value, (int, float)):
+        # Контекст нагрузки по RPM: до ~1300 считаем низкой/средней, выше — высокой
+        rpm = prev_frame.get('rpm')
+        if isinstance(rpm, (int, float)) and rpm >= 1300:
+            if value <= 120:
+                return resp('normal', 0.08)
+            if value <= 140:
+                return resp('warning', 0.55)
+            return resp('critical', 0.9)
+        else:
+            if value <= 40:
+                return resp('normal', 0.08)
+            if value <= 60:
+                return resp('warning', 0.55)
+            return resp('critical', 0.9)
+
+    if s_id == 'voltage' and isinstance(value, (int, float)):
+        # 24V system typical
+        if (24.0 <= value <= 25.5) or (27.2 <= value <= 28.4):
+            return resp('normal', 0.06)
+        if (22.5 <= value < 24.0) or (28.5 <= value <= 29.5):
+            return resp('warning', 0.55)
+        return resp('critical', 0.9)
+
+    if s_id == 'current' and isinstance(value, (int, float)):
+        if 10 <= value <= 150:
+            return resp('normal', 0.08)
+        if 150 < value <= 220:
+            return resp('warning', 0.55)
+        return resp('critical', 0.9)
+
+    if s_id == 'ecu_errors':
+        # numeric 0/1 or bool
+        is_crit = (value is True) or (isinstance(value, (int, float)) and value >= 2)
+        if is_crit:
+            return resp('critical', 0.92)
+        has_warn = (isinstance(value, (int, float)) and value == 1)
+        if has_warn:
+            return resp('warning', 0.6)
+        return resp('normal', 0.05)
+
+    if s_id in ('fuel_leak', 'oil_leak'):
+        if bool(value):
+            return resp('critical', 0.97)
+        return resp('normal', 0.03)
+
+    if s_id == 'coolant_pressure' and isinstance(value, (int, float)):
+        if 0.8 <= value <= 1.5:
+            return resp('normal', 0.06)
+        if (0.6 <= value < 0.8) or (1.5 < value <= 1.8):
+            return resp('warning', 0.55)
+        return resp('critical', 0.9)
+
+    if s_id == 'overheat':
+        # bool or temperature-like value
+        if isinstance(value, (int, float)):
+            if value <= 110:
+                return resp('normal', 0.05)
+            if value <= 120:
+                return resp('warning', 0.6)
+            return resp('critical', 0.92)
+        else:
+            if bool(value):
+                return resp('critical', 0.95)
+            return resp('normal', 0.03)
+
+    if s_id == 'vibration' and isinstance(value, (int, float)):
+        if 0.1 <= value <= 3.0:
+            return resp('normal', 0.08)
+        if 3.0 < value <= 5.0:
+            return resp('warning', 0.6)
+        return resp('critical', 0.9)
+
+    if s_id == 'emergency_stop':
+        if bool(value):
+            return resp('critical', 0.99)
+        return resp('normal', 0.02)
+
+    # Fallback generic numeric/bool handling
+    if isinstance(value, (int, float)):
+        vmin = sensor.get('min', 0) or 0
+        vmax = sensor.get('max', 1) or 1
+        span = max(1e-6, vmax - vmin)
+        dist = min(abs(value - vmin), abs(vmax - value)) / span
+        p = max(0.0, 1.0 - 2.0 * dist)
+        sev = 'critical' if p > 0.85 else 'warning' if p > 0.6 else 'normal'
+        return resp(sev, p)
+    if isinstance(value, bool):
+        return resp('critical' if value else 'normal', 0.95 if value else 0.05)
+    return resp('normal', 0.1)
+
+
+
+def _probe_values(sid: str):
+    spec = BANDS.get(sid, {})
+    edges = set()
+    for key in ('bands', 'deviation', 'under_load'):
+        part = spec if key == 'bands' else spec.get(key)
+        for b in (part or {}).get('bands', []):
+            edges.update(x for x in b[:2] if x is not None)
+    if 'deviation' in spec:
+        nominal = spec['deviation']['nominal']
+        edges.update(nominal * (1 + s * e) for e in list(edges) if e < 1 for s in (-1, 1))
+    out = [True, False, None, 'x', '', 0, 1, 2, 3, -1, float('nan'), float('inf'), -float('inf')]
+    for e in edges:
+        out += [e, int(e), math.nextafter(e, -math.inf), math.nextafter(e, math.inf), e - 0.5, e + 0.5]
+    rnd = random.Random(sid)
+    out += [rnd.uniform(-50, 3200) for _ in range(2000)]
+    out += [rnd.uniform(-2, 12) for _ in range(2000)]
+    return out
+
+
+def check_equivalence() -> int:
+    analyzer = RiskAnalyzer()
+    ids = list(BANDS) + ['unknown_sensor']
+    checked = 0
+    for prev in ({}, {'rpm': 0.0}, {'rpm': 1300}, {'rpm': 1299.9}, {'rpm': 1500.0}):
+        analyzer.prev_frame = prev
+        for sid in ids:
+            for v in _probe_values(sid):
+                sensor = {'id': sid, 'value': v, 'min': 0, 'max': 100}
+                got, want = analyzer.score(sensor), legacy_score(sensor, prev)
+                if got != want:
+                    raise AssertionError(f'{sid}={v!r} prev={prev}: {got} != {want}')
+                checked += 1
+    return checked
+
+
+def main():
+    checked = check_equivalence()
+    print(f'equivalence: {checked} cases identical')
+
+    analyzer = RiskAnalyzer()
+    analyzer.prev_frame = {'rpm': 1500.0}
+    rnd = random.Random(1)
+    number = 20000
+    print(f'{"sensor":<22}{"if-chain ns":>14}{"table ns":>12}{"speedup":>10}')
+    for sid in BANDS:
+        values = [rnd.uniform(0, 150) for _ in range(64)]
+        sensors = [{'id': sid, 'value': v} for v in values]
+        t_old = min(timeit.repeat(lambda: [legacy_score(s, analyzer.prev_frame) for s in sensors], number=number // 64, repeat=3))
+        t_new = min(timeit.repeat(lambda: [analyzer.score(s) for s in sensors], number=number // 64, repeat=3))
+        per = (number // 64) * 64
+        print(f'{sid:<22}{t_old / per * 1e9:>14.0f}{t_new / per * 1e9:>12.0f}{t_old / t_new:>9.2f}x')
+
+
+if __name__ == '__main__':
+    main()
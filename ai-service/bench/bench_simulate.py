@@ -0,0 +1,101 @@
+"""
+/simulate with N concurrent pollers: stepping and analyzing the simulator on
+every request (the handler before serving/simulate.py), single flight alone
+(SIM_TICK_HZ=0: concurrent callers share one in-flight frame) and the 1 Hz
+producer with a cached, pre-encoded body. Reports requests/s, process CPU per
+request and how fast the simulation advances (steps per wall-clock second).
+
+Pollers are threads calling the handler's work directly, so HTTP is left out;
+with the producer the request cost is a dict lookup and a bytes reference.
+
+    python ai-service/bench/bench_simulate.py [seconds] [pollers,pollers,...]
+"""
+import os
+import sys
+import threading
+import time
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+from analysis.analyzer import RiskAnalyzer
+from serving.simulate import SimulateProducer
+from simulation.simulator import RuleSimulator
+from transport import jsonfast
+
+
+class Unit:
+    def __init__(self):
+        self.simulator = RuleSimulator(seed=23)
+        self.analyzer = RiskAnalyzer()
+        self.lock = threading.Lock()
+        self.steps = 0
+
+    def step(self):
+        # simulate_frame: step + analyze under the unit lock
+        with self.lock:
+            self.steps += 1
+            return self.analyzer.analyze_frame(self.simulator.step())
+
+
+def per_request(unit):
+    return lambda: jsonfast.dumps({ 'unit_id': 'default', 'sensors': unit.step() })
+
+
+def producer(unit, rate_hz):
+    p = SimulateProducer(lambda key: (key, unit.step()), rate_hz)
+    return lambda: p.get('default').body, p
+
+
+def run(call, pollers, seconds, unit, tick=None):
+    stop = threading.Event()
+    counts = [0] * pollers
+
+    def poll(i):
+        n = 0
+        while not stop.is_set():
+            call()
+            n += 1
+        counts[i] = n
+
+    def ticker():
+        period = 1.0 / tick[1]
+        deadline = time.monotonic()
+        while not stop.is_set():
+            deadline += period
+            time.sleep(max(0.0, deadline - time.monotonic()))
+            tick[0].tick()
+
+    threads = [threading.Thread(target=poll, args=(i,)) for i in range(pollers)]
+    if tick is not None:
+        threads.append(threading.Thread(target=ticker))
+    steps0 = unit.steps
+    cpu0, t0 = time.process_time(), time.perf_counter()
+    for t in threads:
+        t.start()
+    time.sleep(seconds)
+    stop.set()
+    for t in threads:
+        t.join()
+    elapsed = time.perf_counter() - t0
+    total = sum(counts)
+    return total / elapsed, (time.process_time() - cpu0) / max(1, total) * 1e6, (unit.steps - steps0) / elapsed
+
+
+def main():
+    seconds = float(sys.argv[1]) if len(sys.argv) > 1 else 3.0
+    pollers = [int(x) for x in sys.argv[2].split(',')] if len(sys.argv) > 2 else [1, 4, 16, 64]
+    print(f'{"mode":<22}{"pollers":>8}{"req/s":>11}{"cpu us/req":>12}{"steps/s":>10}')
+    for n in pollers:
+        unit = Unit()
+        rows = [('per request', *run(per_request(unit), n, seconds, unit))]
+        unit = Unit()
+        call, _ = producer(unit, 0.0)
+        rows.append(('single flight', *run(call, n, seconds, unit)))
+        unit = Unit()
+        call, p = producer(unit, 1.0)
+        rows.append(('producer 1 Hz', *run(call, n, seconds, unit, (p, 1.0))))
+        for name, rps, cpu, steps in rows:
+            print(f'{name:<22}{n:>8}{rps:>11.0f}{cpu:>12.2f}{steps:>10.1f}')
+
+
+if __name__ == '__main__':
+    main()
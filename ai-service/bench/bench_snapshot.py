@@ -0,0 +1,129 @@
+"""
+Unit state snapshots (storage/snapshot.py): a restart from a snapshot continues
+exactly like an uninterrupted run (analyzer with window 1 and 10, streaming
+detector), what a cold restart gets wrong instead, and the cost of one snapshot
+at fleet scale: capture (per-unit lock held), encode, atomic write, restore,
+bytes per unit, against the JSON encoding used by the PySAD checkpoint.
+
+    python ai-service/bench/bench_snapshot.py [units,units,...]
+"""
+import json
+import os
+import sys
+import tempfile
+import time
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+from analysis.analyzer import RiskAnalyzer
+from analysis.detector import OnlineDetector
+from analysis.units import UnitRegistry
+from simulation.simulator import RuleSimulator
+from storage.snapshot import capture, decode, encode, write_atomic
+
+
+def _sev(frame):
+    return [(s['id'], s['severity'], s['value']) for s in frame]
+
+
+def continuation(frames, window):
+    """Frames after the restart point: uninterrupted vs snapshot restore vs cold restart."""
+    half = len(frames) // 2
+    ref, det_ref = RiskAnalyzer(window=window), OnlineDetector(warmup=20)
+    for f in frames[:half]:
+        det_ref.update((s['id'], s['value']) for s in ref.analyze_frame(f))
+    _, units = decode(encode([('u', ref.state(), det_ref.state())]))
+    warm, det_warm = RiskAnalyzer(window=window), OnlineDetector(warmup=20)
+    warm.load(units[0][1])
+    det_warm.load(units[0][2])
+    cold = RiskAnalyzer(window=window)
+    diff_warm = diff_cold = z_diff = 0
+    for f in frames[half:]:
+        a = ref.analyze_frame(f)
+        za, _ = det_ref.update((s['id'], s['value']) for s in a)
+        b = warm.analyze_frame(f)
+        zb, _ = det_warm.update((s['id'], s['value']) for s in b)
+        diff_warm += _sev(a) != _sev(b)
+        diff_cold += _sev(a) != _sev(cold.analyze_frame(f))
+        z_diff = max([z_diff] + [abs(za[k] - zb.get(k, 0.0)) for k in za])
+    print(f'window={window:<3} frames after restart={len(frames) - half}: differ from uninterrupted run '
+          f'warm={diff_warm} cold={diff_cold}; max detector z difference {z_diff:.2e}')
+
+
+def latch():
+    """A latched emergency across a restart: the snapshot keeps it, a cold start drops it."""
+    a = RiskAnalyzer(window=1)
+    a.analyze_frame([{ 'id': 'oil_pressure', 'value': 0.5 }, { 'id': 'rpm', 'value': 1500 }])
+    # one stable frame: still latched, the streak needs two
+    stable = [{ 'id': 'oil_pressure', 'value': 4.0 }, { 'id': 'rpm', 'value': 1500 }]
+    a.analyze_frame(stable)
+    _, units = decode(encode([('u', a.state(), None)]))
+    warm = RiskAnalyzer(window=1)
+    warm.load(units[0][1])
+    stop = lambda out: next(s['value'] for s in out if s['id'] == 'emergency_stop')
+    print(f'latched emergency after restart: uninterrupted={stop(a.analyze_frame(stable))} '
+          f'warm={stop(warm.analyze_frame(stable))} cold={stop(RiskAnalyzer(window=1).analyze_frame(stable))}')
+
+
+def fleet(n_units, window, frames_per_unit=3):
+    reg = UnitRegistry(lambda: RiskAnalyzer(window=window), idle_ttl=0)
+    sim = RuleSimulator(seed=20)
+    batch = [sim.step() for _ in range(64)]
+    for u in range(n_units):
+        st = reg.get(f'unit-{u}')
+        st.detector = OnlineDetector()
+        for k in range(frames_per_unit):
+            st.detector.update((s['id'], s['value']) for s in st.analyzer.analyze_frame(batch[(u + k) % len(batch)]))
+
+    t0 = time.perf_counter()
+    units = capture(reg)
+    t_capture = time.perf_counter() - t0
+    # the longest a request for one unit can wait on the snapshot
+    hold = 0.0
+    for st in list(reg)[:2000]:
+        t = time.perf_counter()
+        with st.lock:
+            st.analyzer.state()
+            st.detector.state()
+        hold = max(hold, time.perf_counter() - t)
+    t0 = time.perf_counter()
+    data = encode(units)
+    t_encode = time.perf_counter() - t0
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'units.snap')
+        t0 = time.perf_counter()
+        write_atomic(path, data)
+        t_write = time.perf_counter() - t0
+        t0 = time.perf_counter()
+        with open(path, 'rb') as f:
+            _, restored = decode(f.read())
+        fresh = UnitRegistry(lambda: RiskAnalyzer(window=window), idle_ttl=0)
+        for unit_id, state, det in restored:
+            st = fresh.get(unit_id)
+            st.analyzer.load(state)
+            st.detector = OnlineDetector()
+            st.detector.load(det)
+        t_restore = time.perf_counter() - t0
+    t0 = time.perf_counter()
+    js = json.dumps({ u: [s, d] for u, s, d in units }, separators=(',', ':')).encode()
+    t_json = time.perf_counter() - t0
+    print(f'{n_units:>7}{window:>4}{t_capture * 1e3:>11.1f}{hold * 1e6:>10.1f}{t_encode * 1e3:>10.1f}'
+          f'{t_write * 1e3:>9.1f}{t_restore * 1e3:>11.1f}{len(data) / n_units:>9.0f}{len(js) / n_units:>10.0f}'
+          f'{t_json * 1e3:>10.1f}')
+
+
+def main():
+    sizes = [int(x) for x in sys.argv[1].split(',')] if len(sys.argv) > 1 else [1000, 10000, 50000]
+    sim = RuleSimulator(seed=20)
+    frames = [sim.step() for _ in range(4000)]
+    continuation(frames, 1)
+    continuation(frames, 10)
+    latch()
+    print(f'{"units":>7}{"win":>4}{"capture ms":>11}{"hold us":>10}{"encode ms":>10}{"write ms":>9}'
+          f'{"restore ms":>11}{"B/unit":>9}{"JSON B/u":>10}{"JSON ms":>10}')
+    for n in sizes:
+        fleet(n, 1)
+    fleet(sizes[0], 30)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,78 @@
+"""
+History ring (storage/timeseries.py) vs keeping analyzed frames in a deque of dicts:
+append cost and memory per unit, then window query + downsampling to a few hundred
+points on a full ring.
+
+    python ai-service/bench/bench_timeseries.py [capacity]
+"""
+import os
+import sys
+import time
+import tracemalloc
+from collections import deque
+
+import numpy as np
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+from analysis.analyzer import RiskAnalyzer
+from simulation.simulator import RuleSimulator
+from storage.timeseries import UnitHistory, bucket_stats, lttb
+
+
+def main():
+    cap = int(sys.argv[1]) if len(sys.argv) > 1 else 36000
+    sim = RuleSimulator(seed=5)
+    ra = RiskAnalyzer()
+    frames = [ra.analyze_frame(sim.step()) for _ in range(2000)]
+
+    def fill_ring():
+        ring = UnitHistory(cap)
+        for i in range(cap):
+            ring.append(float(i), frames[i % len(frames)])
+        return ring
+
+    def fill_deque():
+        dq = deque(maxlen=cap)
+        for i in range(cap):
+            # what a naive store does: copy the analyzed frame so later mutation can't change it
+            dq.append((float(i), [dict(s) for s in frames[i % len(frames)]]))
+        return dq
+
+    t0 = time.perf_counter()
+    fill_ring()
+    t_ring = (time.perf_counter() - t0) / cap
+    t0 = time.perf_counter()
+    fill_deque()
+    t_dq = (time.perf_counter() - t0) / cap
+
+    tracemalloc.start()
+    base = tracemalloc.get_traced_memory()[0]
+    ring = fill_ring()
+    mem_ring = tracemalloc.get_traced_memory()[0] - base
+    base = tracemalloc.get_traced_memory()[0]
+    dq = fill_deque()
+    mem_dq = tracemalloc.get_traced_memory()[0] - base
+    tracemalloc.stop()
+
+    print(f'capacity={cap} frames, {len(frames[0])} sensors per frame')
+    print(f'{"":<22}{"append us/frame":>16}{"MB per unit":>14}')
+    print(f'{"UnitHistory ring":<22}{t_ring * 1e6:>16.2f}{mem_ring / 1e6:>14.2f}')
+    print(f'{"deque of dicts":<22}{t_dq * 1e6:>16.2f}{mem_dq / 1e6:>14.2f}')
+
+    def timed(fn, reps=20):
+        t = time.perf_counter()
+        for _ in range(reps):
+            out = fn()
+        return (time.perf_counter() - t) / reps * 1000, out
+
+    ms_win, (ts, v, sev) = timed(lambda: ring.window('oil_pressure', 0, cap))
+    ms_dq, _ = timed(lambda: [(t, s['value']) for t, f in dq for s in f if s['id'] == 'oil_pressure'], 3)
+    ms_mm, b = timed(lambda: bucket_stats(ts, v, sev, 300))
+    ms_lt, idx = timed(lambda: lttb(ts, v, 300), 5)
+    assert len(b['t']) == 300 and len(idx) == 300 and np.all(np.diff(idx) > 0)
+    print(f'window of {len(ts)} samples:  ring {ms_win:.2f} ms, deque scan {ms_dq:.2f} ms')
+    print(f'downsample to 300 points: minmax buckets {ms_mm:.2f} ms, lttb {ms_lt:.2f} ms')
+
+
+if __name__ == '__main__':
+    main()
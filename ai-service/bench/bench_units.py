@@ -0,0 +1,69 @@
+"""
+Per-unit state sharding: frames/s for N units driven by N threads through
+UnitRegistry (one lock per unit) vs the same load behind a single global lock,
+plus the memory held per registered unit.
+
+    python ai-service/bench/bench_units.py [frames_per_unit]
+"""
+import os
+import sys
+import threading
+import time
+import tracemalloc
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+from analysis.analyzer import RiskAnalyzer
+from analysis.units import UnitRegistry
+from simulation.simulator import RuleSimulator
+
+
+def run(n_units: int, frames: list, per_unit: int, global_lock: bool) -> float:
+    registry = UnitRegistry(RiskAnalyzer)
+    big = threading.Lock()
+    start = threading.Barrier(n_units + 1)
+
+    def worker(uid):
+        start.wait()
+        for i in range(per_unit):
+            unit = registry.get(uid)
+            lock = big if global_lock else unit.lock
+            with lock:
+                unit.analyzer.analyze_frame(frames[i % len(frames)])
+
+    threads = [threading.Thread(target=worker, args=(f'unit-{u}',)) for u in range(n_units)]
+    for t in threads:
+        t.start()
+    start.wait()
+    t0 = time.perf_counter()
+    for t in threads:
+        t.join()
+    return n_units * per_unit / (time.perf_counter() - t0)
+
+
+def unit_footprint(n: int = 1000) -> float:
+    frame = RuleSimulator().step()
+    tracemalloc.start()
+    registry = UnitRegistry(RiskAnalyzer)
+    base = tracemalloc.get_traced_memory()[0]
+    for u in range(n):
+        st = registry.get(f'unit-{u}')
+        st.analyzer.analyze_frame(frame)
+    used = tracemalloc.get_traced_memory()[0] - base
+    tracemalloc.stop()
+    return used / n
+
+
+def main():
+    per_unit = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+    sim = RuleSimulator()
+    frames = [sim.step() for _ in range(256)]
+    print(f'{"units":>6}{"per-unit locks":>18}{"global lock":>14}')
+    for n in (1, 2, 4, 8, 16, 32, 64):
+        sharded = run(n, frames, per_unit // max(1, n // 8), False)
+        shared = run(n, frames, per_unit // max(1, n // 8), True)
+        print(f'{n:>6}{sharded:>14,.0f} f/s{shared:>10,.0f} f/s')
+    print(f'memory per unit (analyzer state after one frame): {unit_footprint():.0f} B')
+
+
+if __name__ == '__main__':
+    main()
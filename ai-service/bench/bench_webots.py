@@ -0,0 +1,131 @@
+"""
+Webots frames into the analyzer over the local transport (WebotsAdapter: Unix
+socket, shared-memory ring) vs HTTP on localhost (flat JSON to /telemetry, as
+the README supervisor script does, and binary frames to /ingest).
+
+The service runs in this process (ai_analyzer imported, Flask served from a
+thread, a stub Nest as forward target) and the supervisor is a separate
+process, tools/webots_stub.py. Every mode ends in the same analyze + forward +
+publish of ai_analyzer. Two runs per mode:
+
+  throughput  the stub sends --frames as fast as the path takes them (for HTTP
+              one supervisor waiting for each response); frames/s analyzed
+  latency     --rate frames/s for --seconds; for the local transport the time
+              from the supervisor's timestamp to the analyzed frame, for HTTP
+              the round trip the supervisor waits for (a few us more: the
+              response), plus what one send blocks the supervisor in either case
+
+    python ai-service/bench/bench_webots.py [--frames 20000] [--rate 200] [--seconds 5]
+"""
+import argparse
+import json
+import logging
+import os
+import subprocess
+import sys
+import threading
+import time
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+from tools.loadgen import free_port, percentile
+from tools.stub_nest import StubNestServer
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..'))
+STUB = os.path.join(ROOT, 'ai-service', 'tools', 'webots_stub.py')
+
+
+class Received:
+    """Local-transport frames as ingest_local finishes them: count, first/last time, delays."""
+
+    def __init__(self, ingest):
+        self.ingest = ingest
+        self.lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        self.n = 0
+        self.first = self.last = None
+        self.delays = []
+
+    def __call__(self, unit_id, ts, sensors):
+        self.ingest(unit_id, ts, sensors)
+        now = time.time()
+        with self.lock:
+            self.n += 1
+            self.first = self.first or now
+            self.last = now
+            self.delays.append(now - ts)
+
+
+def stub(transport, address, url, *extra):
+    cmd = [sys.executable, STUB, '--transport', transport, '--url', url, '--units', '4', *extra]
+    if address:
+        cmd += ['--address', address]
+    out = subprocess.run(cmd, capture_output=True, text=True, check=True)
+    return json.loads(out.stdout)
+
+
+def settle(recv, expected, timeout=30.0):
+    deadline = time.time() + timeout
+    while recv.n < expected and time.time() < deadline:
+        time.sleep(0.01)
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument('--frames', type=int, default=20000, help='frames of the throughput run')
+    ap.add_argument('--rate', type=float, default=200.0, help='frames/s of the latency run')
+    ap.add_argument('--seconds', type=float, default=5.0, help='length of the latency run')
+    args = ap.parse_args()
+
+    nest = StubNestServer(0).start()
+    os.environ.update({ 'NEST_INGEST_URL': nest.url, 'SIM_TICK_HZ': '0', 'LOG_LEVEL': 'WARNING' })
+    sys.path.insert(0, ROOT)
+    import ai_analyzer as core
+    from simulation.webots_adapter import WebotsAdapter
+    from werkzeug.serving import make_server
+
+    logging.getLogger('werkzeug').setLevel(logging.ERROR)
+    port = free_port()
+    server = make_server('127.0.0.1', port, core.app, threaded=True)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    url = f'http://127.0.0.1:{port}'
+    tag = f'bench-webots-{os.getpid()}'
+    modes = [
+        ('HTTP JSON /telemetry', 'http', None),
+        ('HTTP binary /ingest', 'wire', None),
+        ('Unix socket', 'socket', f'/tmp/{tag}.sock'),
+        ('shared-memory ring', 'shm', tag),
+    ]
+    print(f'cpu_count={os.cpu_count()}; supervisor in its own process, service in this one')
+    print(f'{"path":<22}{"frames/s":>10}{"lat p50 ms":>12}{"lat p99 ms":>12}{"send p50 us":>13}{"send p99 us":>13}')
+    try:
+        for name, transport, address in modes:
+            recv = adapter = None
+            if address is not None:
+                recv = Received(core.ingest_local)
+                adapter = WebotsAdapter(transport, address).start(recv)
+            hot = stub(transport, address, url, '--rate', '0', '--frames', str(args.frames))
+            if recv is not None:
+                settle(recv, hot['frames'])
+                fps = (recv.n - 1) / (recv.last - recv.first) if recv.n > 1 else 0.0
+                recv.reset()
+            else:
+                fps = hot['frames_per_s']
+            paced = stub(transport, address, url, '--rate', str(args.rate), '--seconds', str(args.seconds))
+            if recv is not None:
+                settle(recv, paced['frames'])
+                lat = sorted(d * 1e3 for d in recv.delays)
+                p50, p99 = percentile(lat, 50), percentile(lat, 99)
+                adapter.close()
+            else:
+                p50, p99 = paced['send_us']['p50'] / 1e3, paced['send_us']['p99'] / 1e3
+            print(f'{name:<22}{fps:>10.0f}{p50:>12.3f}{p99:>12.3f}'
+                  f'{paced["send_us"]["p50"]:>13.1f}{paced["send_us"]["p99"]:>13.1f}')
+    finally:
+        server.shutdown()
+        nest.stop()
+
+
+if __name__ == '__main__':
+    main()
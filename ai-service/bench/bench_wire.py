@@ -0,0 +1,91 @@
+"""
+Binary wire format vs JSON: round-trip check against the JSON ingest path (the
+same values and severities as the JSON frames, also at every band edge), then
+bytes on the wire and decode time per frame.
+
+    python ai-service/bench/bench_wire.py [frames]
+"""
+import json
+import os
+import sys
+import time
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+from analysis.analyzer import RiskAnalyzer
+from analysis.rules import BANDS
+from analysis.sensors import SENSOR_MAPPING, to_sensors
+from simulation.simulator import RuleSimulator
+from transport import wire
+
+
+def check_round_trip(flat_frames) -> None:
+    packet = wire.decode(wire.encode(flat_frames, unit_id='g-1', timestamps=list(range(len(flat_frames)))))
+    assert packet.unit_id == 'g-1' and len(packet) == len(flat_frames)
+    a_json, a_wire = RiskAnalyzer(), RiskAnalyzer()
+    for i, (ts, sensors) in enumerate(packet.frames()):
+        assert ts == i
+        want = to_sensors(flat_frames[i])
+        key = lambda s: s['id']
+        assert sorted(want, key=key) == sorted(sensors, key=key), (want, sensors)
+        assert sorted(a_json.analyze_frame(want), key=key) == sorted(a_wire.analyze_frame(sensors), key=key)
+    print(f'round trip: {len(flat_frames)} frames identical to the JSON path')
+
+
+def check_band_edges() -> None:
+    """Every band edge (and +-0.01 around it) scores the same over the wire as over JSON."""
+    to_key = { meta['id']: k for k, meta in SENSOR_MAPPING.items() }
+    n = 0
+    for sid, spec in BANDS.items():
+        key = to_key.get(sid)
+        if key is None or 'flag' in spec:
+            continue
+        edges = { e for lo, hi, *_ in spec.get('bands', ()) for e in (lo, hi) if isinstance(e, (int, float)) }
+        for e in sorted(edges):
+            for v in (e - 0.01, e, e + 0.01):
+                flat = { key: round(v, 2) }
+                (_, sensors), = wire.decode(wire.encode([flat])).frames()
+                want = RiskAnalyzer().analyze_frame(to_sensors(flat))
+                got = RiskAnalyzer().analyze_frame(sensors)
+                assert [s['severity'] for s in want] == [s['severity'] for s in got], (sid, v, want, got)
+                n += 1
+    print(f'band edges: {n} values score the same as over JSON')
+
+
+def per_frame_us(fn, frames: int) -> float:
+    t0 = time.perf_counter()
+    fn()
+    return (time.perf_counter() - t0) / frames * 1e6
+
+
+def main():
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 20000
+    sim = RuleSimulator()
+    full = [sim.step() for _ in range(n)]
+    flat = [wire.flat_values(f) for f in full]
+    check_round_trip(flat[:2000])
+    check_band_edges()
+
+    json_full = [json.dumps({ 'sensors': f }, ensure_ascii=False).encode() for f in full]
+    json_flat = [json.dumps(f).encode() for f in flat]
+    bin_single = [wire.encode([f], unit_id='g-1') for f in flat]
+    bin_batch = wire.encode(flat, unit_id='g-1')
+
+    print(f'{"format":<34}{"bytes/frame":>12}{"decode us/frame":>17}')
+    rows = [
+        ('JSON {sensors:[...]} (Webots)', sum(map(len, json_full)) / n,
+         per_frame_us(lambda: [to_sensors(json.loads(b)) for b in json_full], n)),
+        ('JSON flat dict', sum(map(len, json_flat)) / n,
+         per_frame_us(lambda: [to_sensors(json.loads(b)) for b in json_flat], n)),
+        ('binary, one frame per packet', sum(map(len, bin_single)) / n,
+         per_frame_us(lambda: [list(wire.decode(b).frames()) for b in bin_single], n)),
+        ('binary, batched, to sensors', len(bin_batch) / n,
+         per_frame_us(lambda: list(wire.decode(bin_batch).frames()), n)),
+        ('binary, batched, raw rows', len(bin_batch) / n,
+         per_frame_us(lambda: list(wire.decode(bin_batch).rows()), n)),
+    ]
+    for name, size, us in rows:
+        print(f'{name:<34}{size:>12.1f}{us:>17.2f}')
+
+
+if __name__ == '__main__':
+    main()
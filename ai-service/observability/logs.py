@@ -0,0 +1,65 @@
+"""
+Level-gated, sampled logging for the hot path. Per-frame detail goes to DEBUG;
+at INFO a call site logs at most once per LOG_SAMPLE_SEC seconds per key, with the
+number of suppressed messages appended. Nothing is formatted for a skipped message.
+"""
+import logging
+import os
+import sys
+import threading
+import time
+from typing import Dict
+
+LOGGER = 'datchiki'
+
+
+def setup(level: str = None) -> logging.Logger:
+    """Configure the service logger once (LOG_LEVEL, default INFO) and return it."""
+    log = logging.getLogger(LOGGER)
+    if not log.handlers:
+        handler = logging.StreamHandler(sys.stdout)
+        handler.setFormatter(logging.Formatter('%(message)s'))
+        log.addHandler(handler)
+        log.propagate = False
+    log.setLevel((level or os.getenv('LOG_LEVEL', 'INFO')).upper())
+    return log
+
+
+def get(name: str) -> logging.Logger:
+    return logging.getLogger(f'{LOGGER}.{name}')
+
+
+class Sampler:
+    """Lets one message per key through every `interval` seconds and counts the rest."""
+
+    def __init__(self, interval: float):
+        self.interval = interval
+        self._next: Dict[str, float] = {}
+        self._skipped: Dict[str, int] = {}
+        self._lock = threading.Lock()
+
+    def take(self, key: str) -> int:
+        """Number of messages suppressed since the last one if this one may go out, else -1."""
+        now = time.monotonic()
+        with self._lock:
+            if now < self._next.get(key, 0.0):
+                self._skipped[key] = self._skipped.get(key, 0) + 1
+                return -1
+            self._next[key] = now + self.interval
+            return self._skipped.pop(key, 0)
+
+
+_sampler = Sampler(float(os.getenv('LOG_SAMPLE_SEC', '10')))
+
+
+def sampled(log: logging.Logger, level: int, key: str, msg: str, *args) -> None:
+    """log.log(level, msg, *args), at most once per sampling interval for this key."""
+    if not log.isEnabledFor(level):
+        return
+    skipped = _sampler.take(key)
+    if skipped < 0:
+        return
+    if skipped:
+        msg += ' (+%d similar suppressed)'
+        args += (skipped,)
+    log.log(level, msg, *args)
@@ -0,0 +1,220 @@
+"""
+In-process counters and fixed-bucket histograms rendered in the Prometheus text
+exposition format (0.0.4) without a client library. Recording is a dict update
+under a per-metric lock (a bisect first for histograms); all formatting happens
+at scrape time.
+"""
+import bisect
+import math
+import threading
+from typing import Any, Callable, Dict, Iterable, List, Sequence, Tuple
+
+Labels = Tuple[str, ...]
+
+# seconds; request and analysis latencies here sit between ~50us and a few hundred ms
+LATENCY_BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5)
+OTHER = '_other'
+
+
+def _escape(value: str) -> str:
+    return value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _fmt(value: float) -> str:
+    if value == math.inf:
+        return '+Inf'
+    if isinstance(value, int) or float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+def _series(name: str, names: Sequence[str], values: Labels, extra: str = '') -> str:
+    parts = [f'{k}="{_escape(str(v))}"' for k, v in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return f'{name}{{{",".join(parts)}}}' if parts else name
+
+
+class Counter:
+    """Monotonic counter with optional labels (label values passed as a tuple)."""
+    kind = 'counter'
+
+    def __init__(self, name: str, help: str, labels: Sequence[str] = ()):
+        self.name = name
+        self.help = help
+        self.labels = tuple(labels)
+        self._values: Dict[Labels, float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, labels: Labels = (), n: float = 1) -> None:
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + n
+
+    def inc_all(self, keys: Iterable[Labels]) -> None:
+        """Increment several series by one under a single lock acquisition."""
+        with self._lock:
+            values = self._values
+            for k in keys:
+                values[k] = values.get(k, 0) + 1
+
+    def value(self, labels: Labels = ()) -> float:
+        return self._values.get(labels, 0)
+
+    def render(self) -> List[str]:
+        with self._lock:
+            items = sorted(self._values.items())
+        return [f'{_series(self.name, self.labels, k)} {_fmt(v)}' for k, v in items]
+
+
+class Histogram:
+    """
+    Cumulative-on-render histogram: observe() bumps one bucket (value <= bound),
+    the sum and the count; bucket totals are accumulated only when scraped.
+    """
+    kind = 'histogram'
+
+    def __init__(self, name: str, help: str, labels: Sequence[str] = (), buckets: Sequence[float] = LATENCY_BUCKETS):
+        self.name = name
+        self.help = help
+        self.labels = tuple(labels)
+        self.buckets = tuple(sorted(buckets))
+        self._series: Dict[Labels, List[Any]] = {}  # labels -> [bucket counts (+Inf last), sum]
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, labels: Labels = ()) -> None:
+        i = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            s = self._series.get(labels)
+            if s is None:
+                s = self._series[labels] = [[0] * (len(self.buckets) + 1), 0.0]
+            s[0][i] += 1
+            s[1] += value
+
+    def count(self, labels: Labels = ()) -> int:
+        s = self._series.get(labels)
+        return sum(s[0]) if s else 0
+
+    def render(self) -> List[str]:
+        with self._lock:
+            items = sorted((k, (list(s[0]), s[1])) for k, s in self._series.items())
+        out = []
+        for k, (counts, total) in items:
+            acc = 0
+            for bound, c in zip(self.buckets + (math.inf,), counts):
+                acc += c
+                le = 'le="%s"' % _fmt(bound)
+                out.append(f'{_series(self.name + "_bucket", self.labels, k, le)} {acc}')
+            out.append(f'{_series(self.name + "_sum", self.labels, k)} {_fmt(total)}')
+            out.append(f'{_series(self.name + "_count", self.labels, k)} {acc}')
+        return out
+
+
+class Collected:
+    """
+    Value read at scrape time from existing state (queue depths, counters kept by
+    other components). fn returns a number, or a { label tuple: number } dict.
+    """
+
+    def __init__(self, name: str, help: str, kind: str, fn: Callable[[], Any], labels: Sequence[str] = ()):
+        self.name = name
+        self.help = help
+        self.kind = kind
+        self.labels = tuple(labels)
+        self.fn = fn
+
+    def render(self) -> List[str]:
+        try:
+            value = self.fn()
+        except Exception:
+            return []
+        if value is None:
+            return []
+        if not isinstance(value, dict):
+            value = { (): value }
+        return [f'{_series(self.name, self.labels, k)} {_fmt(v)}' for k, v in sorted(value.items())]
+
+
+class LabelCap:
+    """Bounds the cardinality of a label: the first `limit` values pass, later ones become OTHER."""
+
+    def __init__(self, limit: int):
+        self.limit = max(1, limit)
+        self._seen: Dict[str, bool] = {}
+
+    def __call__(self, value: str) -> str:
+        if value in self._seen:
+            return value
+        if len(self._seen) >= self.limit:
+            return OTHER
+        self._seen[value] = True
+        return value
+
+
+class Registry:
+    def __init__(self, prefix: str = ''):
+        self.prefix = prefix
+        self._metrics: List[Any] = []
+
+    def _add(self, metric):
+        self._metrics.append(metric)
+        return metric
+
+    def counter(self, name: str, help: str, labels: Sequence[str] = ()) -> Counter:
+        return self._add(Counter(self.prefix + name, help, labels))
+
+    def histogram(self, name: str, help: str, labels: Sequence[str] = (),
+                  buckets: Sequence[float] = LATENCY_BUCKETS) -> Histogram:
+        return self._add(Histogram(self.prefix + name, help, labels, buckets))
+
+    def collect(self, name: str, help: str, kind: str, fn: Callable[[], Any], labels: Sequence[str] = ()) -> Collected:
+        return self._add(Collected(self.prefix + name, help, kind, fn, labels))
+
+    def render(self) -> str:
+        lines = []
+        for m in self._metrics:
+            lines.append(f'# HELP {m.name} {m.help}')
+            lines.append(f'# TYPE {m.name} {m.kind}')
+            lines.extend(m.render())
+        return '\n'.join(lines) + '\n'
+
+
+class ServiceMetrics:
+    """The metric set of ai_analyzer.py; component gauges are attached with Registry.collect()."""
+
+    def __init__(self, max_units: int = 1000, known_sensors: Iterable[str] = ()):
+        r = self.registry = Registry('datchiki_')
+        self.requests = r.histogram('http_request_duration_seconds', 'Request latency by route', ('route', 'method'))
+        self.responses = r.counter('http_responses_total', 'Responses by route and status', ('route', 'method', 'status'))
+        self.analyze = r.histogram('analyze_frame_duration_seconds', 'Frame analysis time by backend', ('backend',))
+        self.score = r.histogram('score_duration_seconds', 'Single-sensor scoring time by backend', ('backend',))
+        self.frames = r.counter('frames_total', 'Frames analyzed into unit state (rate() gives frames/s)', ('unit_id',))
+        self.severity = r.counter('sensor_severity_total', 'Analyzed sensor readings by severity', ('sensor', 'severity'))
+        self.fallbacks = r.counter('backend_fallbacks_total',
+                                   'Backend errors answered by the rule analyzer instead', ('path',))
+        for path in ('frame', 'sensor', 'score'):
+            self.fallbacks.inc((path,), 0)
+        self.local_delay = r.histogram('local_ingest_delay_seconds',
+                                       'Supervisor timestamp to analyzed frame on the local Webots transport',
+                                       ('transport',))
+        self.forward = r.histogram('nest_forward_duration_seconds', 'POST latency to Nest', ('result',))
+        self.stages = r.histogram('request_stage_duration_seconds', 'Time per request stage (only while profiling)',
+                                  ('route', 'stage'))
+        self._unit = LabelCap(max_units)
+        # (sensor, severity) label tuples built once, so a frame allocates none
+        sevs = ('normal', 'warning', 'critical')
+        self._keys = { sid: { sev: (sid, sev) for sev in sevs } for sid in tuple(known_sensors) + (OTHER,) }
+
+    def observe_frame(self, unit_id: str, analyzed: Iterable[Dict[str, Any]]) -> None:
+        """analyzed: sensor dicts, or anything with severities() -> (id, severity) pairs (analysis.frame.Frame)."""
+        self.frames.inc((self._unit(unit_id),))
+        keys = self._keys
+        other = keys[OTHER]
+        severities = getattr(analyzed, 'severities', None)
+        pairs = severities() if severities is not None else [(s.get('id'), s.get('severity')) for s in analyzed]
+        self.severity.inc_all([keys.get(sid, other).get(sev) or (OTHER, str(sev)) for sid, sev in pairs])
+
+    def observe_forward(self, seconds: float, frames: int, ok: bool) -> None:
+        self.forward.observe(seconds, ('ok' if ok else 'error',))
+
+    def render(self) -> str:
+        return self.registry.render()
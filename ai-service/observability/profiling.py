@@ -0,0 +1,194 @@
+"""
+Opt-in request profiling: per-stage timings for every request on the profiled
+routes, plus a cProfile (and optionally tracemalloc) capture of every Nth one.
+
+Stages are laps: mark(name) charges the time since the previous mark (or the
+request start) to `name`, so the breakdown of a request always sums to its wall
+time. The active Stages live in a ContextVar; with profiling off mark() is one
+ContextVar lookup.
+
+Captures go to PROFILE_DIR as <seq>-<route>.pstats (open with pstats or snakeviz),
+<seq>-<route>.tracemalloc (tracemalloc.Snapshot.load, only with memory=True) and
+<seq>-<route>.json (route, wall time, stages, traced peak); only the newest `keep`
+captures are kept. One capture runs at a time; a sample that would overlap it is
+skipped. tracemalloc traces every thread while it is on, so a memory capture also
+sees allocations made by concurrent requests.
+"""
+import cProfile
+import json
+import os
+import re
+import threading
+import time
+import tracemalloc
+from contextvars import ContextVar
+from typing import Any, Dict, Iterable, List, Optional
+
+_current: ContextVar[Optional['Stages']] = ContextVar('profiling_stages', default=None)
+
+
+class Stages:
+    __slots__ = ('started', 'last', 'times')
+
+    def __init__(self):
+        self.started = self.last = time.perf_counter()
+        self.times: Dict[str, float] = {}
+
+    def mark(self, name: str) -> None:
+        now = time.perf_counter()
+        self.times[name] = self.times.get(name, 0.0) + (now - self.last)
+        self.last = now
+
+    def total(self) -> float:
+        return self.last - self.started
+
+    def server_timing(self) -> str:
+        """Server-Timing header value (durations in ms)."""
+        return ', '.join(f'{k};dur={v * 1000:.3f}' for k, v in self.times.items())
+
+
+def mark(name: str) -> None:
+    """Charge the time since the last mark to `name` in the current request, if profiled."""
+    st = _current.get()
+    if st is not None:
+        st.mark(name)
+
+
+def current() -> Optional[Stages]:
+    return _current.get()
+
+
+class Capture:
+    __slots__ = ('route', 'profile', 'memory', 'stages', 'token')
+
+    def __init__(self, route: str, profile: Optional[cProfile.Profile], memory: bool, stages: Stages, token):
+        self.route = route
+        self.profile = profile
+        self.memory = memory
+        self.stages = stages
+        self.token = token
+
+
+class Profiler:
+    def __init__(self, out_dir: str = 'profiles', every: int = 0, memory: bool = False, keep: int = 20,
+                 routes: Iterable[str] = ()):
+        self.out_dir = out_dir
+        self.every = max(0, every)
+        self.memory = memory
+        self.keep = max(1, keep)
+        self.routes = frozenset(routes)
+        self.requests = 0
+        self.captures = 0
+        self.skipped = 0
+        self._seq = 0
+        self._busy = threading.Lock()
+
+    @property
+    def enabled(self) -> bool:
+        return self.every > 0
+
+    def configure(self, every: Optional[int] = None, memory: Optional[bool] = None,
+                  routes: Optional[Iterable[str]] = None, keep: Optional[int] = None) -> None:
+        if every is not None:
+            self.every = max(0, int(every))
+        if memory is not None:
+            self.memory = bool(memory)
+        if routes is not None:
+            self.routes = frozenset(routes)
+        if keep is not None:
+            self.keep = max(1, int(keep))
+
+    def begin(self, route: str) -> Optional[Capture]:
+        """Start timing a request on `route`; returns None (and does nothing) when not profiled."""
+        if not self.every or route not in self.routes:
+            return None
+        stages = Stages()
+        token = _current.set(stages)
+        self.requests += 1
+        profile = None
+        memory = False
+        if self.requests % self.every == 0:
+            if self._busy.acquire(blocking=False):
+                memory = self.memory and not tracemalloc.is_tracing()
+                if memory:
+                    tracemalloc.start()
+                profile = cProfile.Profile()
+                profile.enable()
+            else:
+                self.skipped += 1
+        return Capture(route, profile, memory, stages, token)
+
+    def end(self, cap: Capture) -> Stages:
+        """Stop timing; writes the capture files if this request was sampled."""
+        _current.reset(cap.token)
+        if cap.profile is None:
+            return cap.stages
+        cap.profile.disable()
+        try:
+            snapshot = peak = None
+            if cap.memory:
+                snapshot = tracemalloc.take_snapshot()
+                peak = tracemalloc.get_traced_memory()[1]
+                tracemalloc.stop()
+            self._write(cap, snapshot, peak)
+        finally:
+            self._busy.release()
+        return cap.stages
+
+    def _write(self, cap: Capture, snapshot, peak: Optional[int]) -> None:
+        os.makedirs(self.out_dir, exist_ok=True)
+        if not self._seq:
+            # continue numbering after captures left by an earlier run
+            self._seq = max((int(n[:6]) for n in os.listdir(self.out_dir) if n[:6].isdigit()), default=0)
+        self._seq += 1
+        self.captures += 1
+        base = os.path.join(self.out_dir, f'{self._seq:06d}-{re.sub(r"[^A-Za-z0-9]+", "_", cap.route).strip("_")}')
+        cap.profile.dump_stats(base + '.pstats')
+        if snapshot is not None:
+            snapshot.dump(base + '.tracemalloc')
+        meta = {
+            'route': cap.route,
+            'at': time.time(),
+            'wall_ms': round(cap.stages.total() * 1000, 3),
+            'stages_ms': { k: round(v * 1000, 3) for k, v in cap.stages.times.items() },
+            'traced_peak_bytes': peak,
+        }
+        with open(base + '.json', 'w', encoding='utf-8') as f:
+            json.dump(meta, f)
+        self._rotate()
+
+    def _rotate(self) -> None:
+        names = sorted(n for n in os.listdir(self.out_dir) if n.endswith('.json') and n[:6].isdigit())
+        for n in names[:-self.keep]:
+            stem = n[:-len('.json')]
+            for ext in ('.json', '.pstats', '.tracemalloc'):
+                try:
+                    os.remove(os.path.join(self.out_dir, stem + ext))
+                except FileNotFoundError:
+                    pass
+
+    def recent(self, n: int = 10) -> List[Dict[str, Any]]:
+        if not os.path.isdir(self.out_dir):
+            return []
+        names = sorted(x for x in os.listdir(self.out_dir) if x.endswith('.json') and x[:6].isdigit())[-n:]
+        out = []
+        for name in names:
+            try:
+                with open(os.path.join(self.out_dir, name), encoding='utf-8') as f:
+                    out.append({ 'file': name[:-len('.json')], **json.load(f) })
+            except (OSError, ValueError):
+                continue
+        return out
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            'enabled': self.enabled,
+            'every': self.every,
+            'memory': self.memory,
+            'keep': self.keep,
+            'routes': sorted(self.routes),
+            'dir': self.out_dir,
+            'requests': self.requests,
+            'captures': self.captures,
+            'skipped': self.skipped,
+        }
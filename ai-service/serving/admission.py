@@ -0,0 +1,191 @@
+import collections
+import logging
+import math
+import threading
+import time
+from typing import Any, Callable, Deque, Dict, List, Optional, Sequence, Tuple
+
+from analysis.analyzer import carries_trigger
+from observability import logs
+
+log = logs.get('admission')
+
+Item = Tuple[List[Dict[str, Any]], Optional[float]]  # (sensors, ts)
+
+ACCEPTED = 202
+TOO_MANY = 429
+SATURATED = 503
+
+
+def _fuel_level(sensors: List[Dict[str, Any]]) -> Any:
+    for s in sensors:
+        if isinstance(s, dict) and s.get('id') == 'fuel_level':
+            return s.get('value')
+    return None
+
+
+class Inbox:
+    """Frames of one unit waiting for analysis: (sensors, ts, urgent) in arrival order."""
+    __slots__ = ('frames', 'scheduled', 'last_level')
+
+    def __init__(self):
+        self.frames: Deque[Tuple[List[Dict[str, Any]], Optional[float], bool]] = collections.deque()
+        self.scheduled = False  # in the ready queue or with a worker
+        self.last_level = None  # fuel level of the unit's previous frame, for the leak trigger
+
+
+class AdmissionControl:
+    """
+    Bounded per-unit inboxes between /ingest and the analysis of its frames.
+
+    submit() only queues: request threads (or the event loop) return at once, and
+    `workers` threads run handle(unit, items) for one unit at a time, so a unit's
+    frames stay in order and a burst costs queue slots instead of threads. When a
+    unit's inbox holds inbox_max frames its backlog coalesces to the newest frame:
+    queued frames are dropped except those that carry a trigger (analysis.analyzer
+    .carries_trigger: a leak, overheat or emergency reading), which are never
+    dropped. Coalesced frames are not analyzed, so the unit's derived signals
+    compare the newest frame with the last analyzed one.
+
+    A frame is refused instead, with a Retry-After estimate from the recent analysis
+    rate, when
+      429  the unit's inbox is full of trigger frames (nothing left to coalesce);
+      503  pending_max frames wait over all units (saturated); a trigger frame still
+           gets in up to twice that.
+    """
+
+    def __init__(self, handle: Callable[[Any, List[Item]], None], inbox_max: int = 8,
+                 pending_max: int = 1000, workers: int = 2):
+        self.handle = handle
+        self.inbox_max = max(1, inbox_max)
+        self.pending_max = pending_max
+        self.workers = workers
+        self._cond = threading.Condition(threading.Lock())
+        self._ready: Deque[Any] = collections.deque()
+        self._threads: List[threading.Thread] = []
+        self.pending = 0
+        self.admitted = 0
+        self.urgent = 0
+        self.coalesced = 0
+        self.limited = 0
+        self.shed = 0
+        self.handled = 0
+        self.errors = 0
+        self.rate = 0.0  # frames/s analyzed, EWMA over ~1 s windows
+        self._window_at = time.monotonic()
+        self._window_n = 0
+
+    def start(self) -> 'AdmissionControl':
+        for i in range(self.workers):
+            t = threading.Thread(target=self._run, name=f'admission-{i}', daemon=True)
+            t.start()
+            self._threads.append(t)
+        return self
+
+    def retry_after(self) -> int:
+        """Seconds until the current backlog should be analyzed (1..30)."""
+        return max(1, min(30, math.ceil(self.pending / self.rate))) if self.rate > 0 else 1
+
+    def submit(self, unit, items: Sequence[Item]) -> Tuple[int, Dict[str, Any]]:
+        """
+        Queue a unit's frames in order; returns (status, info). info has accepted
+        (frames queued before any refusal), coalesced and, when refused, retry_after.
+        """
+        inbox = unit.inbox
+        if inbox is None:
+            with self._cond:
+                if unit.inbox is None:
+                    unit.inbox = Inbox()
+            inbox = unit.inbox
+        accepted = coalesced = 0
+        status = ACCEPTED
+        for sensors, ts in items:
+            level = _fuel_level(sensors)
+            urgent = carries_trigger(sensors, inbox.last_level)
+            with self._cond:
+                q = inbox.frames
+                if len(q) >= self.inbox_max:
+                    keep = [f for f in q if f[2]]
+                    if len(keep) == len(q):
+                        self.limited += 1
+                        status = TOO_MANY
+                        break
+                    dropped = len(q) - len(keep)
+                    q.clear()
+                    q.extend(keep)
+                    self.pending -= dropped
+                    self.coalesced += dropped
+                    coalesced += dropped
+                elif self.pending >= self.pending_max and not (urgent and self.pending < 2 * self.pending_max):
+                    self.shed += 1
+                    status = SATURATED
+                    break
+                q.append((sensors, ts, urgent))
+                inbox.last_level = level
+                self.pending += 1
+                self.admitted += 1
+                self.urgent += urgent
+                accepted += 1
+                if not inbox.scheduled:
+                    inbox.scheduled = True
+                    self._ready.append(unit)
+                    self._cond.notify()
+        info: Dict[str, Any] = { 'accepted': accepted, 'coalesced': coalesced }
+        if status != ACCEPTED:
+            info['retry_after'] = self.retry_after()
+        return status, info
+
+    def _run(self) -> None:
+        cond = self._cond
+        while True:
+            with cond:
+                while not self._ready:
+                    cond.wait()
+                unit = self._ready.popleft()
+                inbox = unit.inbox
+                batch = [(s, ts) for s, ts, _ in inbox.frames]
+                inbox.frames.clear()
+                self.pending -= len(batch)
+            failed = False
+            try:
+                self.handle(unit, batch)
+            except Exception as e:
+                # the client already got 202: the log line is all that is left of the rest of the batch
+                failed = True
+                logs.sampled(log, logging.WARNING, 'admission-handle', '[PY-ADMISSION] %s: analysis of %d frames failed: %r',
+                             unit.unit_id, len(batch), e)
+            with cond:
+                self.errors += failed
+                self.handled += len(batch)
+                self._observe(len(batch))
+                if inbox.frames:
+                    self._ready.append(unit)  # to the back: units take turns
+                    cond.notify()
+                else:
+                    inbox.scheduled = False
+
+    def _observe(self, n: int) -> None:
+        # with the lock held
+        self._window_n += n
+        now = time.monotonic()
+        elapsed = now - self._window_at
+        if elapsed >= 1.0:
+            rate = self._window_n / elapsed
+            self.rate = rate if self.rate == 0 else 0.5 * self.rate + 0.5 * rate
+            self._window_at, self._window_n = now, 0
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            'inbox_max': self.inbox_max,
+            'pending_max': self.pending_max,
+            'workers': self.workers,
+            'pending': self.pending,
+            'admitted': self.admitted,
+            'urgent': self.urgent,
+            'coalesced': self.coalesced,
+            'limited_429': self.limited,
+            'shed_503': self.shed,
+            'handled': self.handled,
+            'errors': self.errors,
+            'rate_hz': round(self.rate, 1),
+        }
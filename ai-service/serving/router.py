@@ -0,0 +1,333 @@
+"""
+Multi-process deployment of the ASGI service (ai_asgi.py) with unit affinity.
+
+N worker processes each run the full app on their own port with their own module
+state; this router listens on the public port and sends every request to the
+worker that owns its unit (analysis.units.partition over the normalized unit_id),
+so a unit's analyzer, detector and history only ever live in one process and
+frames of a unit keep their order. The unit comes from ?unit_id=, the "unit_id"
+of a JSON body (first occurrence, no full parse) or the wire header; requests
+without one belong to the default unit.
+
+  /ingest/stream  lines are split per owner and streamed to every worker at once,
+                  the per-worker summaries are merged
+  /stream         ?unit_id= proxies the owner's SSE stream, otherwise the streams
+                  of all workers are merged (event ids are per worker)
+  /metrics        all workers, each series labelled worker="i"
+  /forwarder      per-worker stats and their sums
+
+    python ai_asgi.py --workers 4     # router on AI_PORT, workers on AI_PORT+1..AI_PORT+4
+"""
+import asyncio
+import contextlib
+import os
+import signal
+import subprocess
+import sys
+import time
+from typing import Any, Dict, List, Optional
+
+import httpx
+from starlette.applications import Starlette
+from starlette.requests import Request
+from starlette.responses import Response, StreamingResponse
+from starlette.routing import Route
+
+from analysis.units import partition, unit_key
+from simulation.webots_adapter import DEFAULT_SHM, DEFAULT_SOCKET
+from transport import jsonfast, wire
+from transport.ndjson import LineSplitter, body_unit
+
+# set again by the router's own server
+_HOP = frozenset(('connection', 'keep-alive', 'transfer-encoding', 'content-length', 'content-encoding', 'date', 'server'))
+_SUMMED = ('frames', 'sensors', 'errors', 'units')
+
+
+def request_unit(request: Request, body: bytes) -> str:
+    unit = request.query_params.get('unit_id')
+    if unit is None and body:
+        if request.headers.get('content-type', '').split(';')[0].strip() == wire.CONTENT_TYPE:
+            unit = wire.peek_unit(body)
+        else:
+            unit = body_unit(body)
+    return unit_key(unit)
+
+
+def _label(line: str, worker: int) -> str:
+    brace, space = line.find('{'), line.find(' ')
+    if brace != -1 and (space == -1 or brace < space):
+        return f'{line[:brace + 1]}worker="{worker}",{line[brace + 1:]}'
+    return f'{line[:space]}{{worker="{worker}"}}{line[space:]}'
+
+
+def merge_metrics(texts: List[str]) -> str:
+    """Prometheus text of several workers as one exposition: families kept together, worker label added."""
+    order: List[str] = []
+    heads: Dict[str, List[str]] = {}
+    series: Dict[str, List[str]] = {}
+    for i, text in enumerate(texts):
+        family = None
+        for line in text.splitlines():
+            if not line:
+                continue
+            if line.startswith('# '):
+                parts = line.split(' ', 3)
+                family = parts[2] if len(parts) > 2 else family
+                if family not in heads:
+                    order.append(family)
+                    heads[family] = []
+                    series[family] = []
+                if line not in heads[family]:
+                    heads[family].append(line)
+                continue
+            if family is None:
+                continue
+            series[family].append(_label(line, i))
+    out = []
+    for family in order:
+        out.extend(heads[family])
+        out.extend(series[family])
+    return '\n'.join(out) + '\n'
+
+
+def merge_summaries(parts: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """/ingest/stream summaries of the workers that got lines -> one summary."""
+    out: Dict[str, Any] = { 'ok': all(p.get('ok') for p in parts) }
+    for key in _SUMMED:
+        out[key] = sum(p.get(key) or 0 for p in parts)
+    sev: Dict[str, int] = {}
+    for p in parts:
+        for k, v in (p.get('severities') or {}).items():
+            sev[k] = sev.get(k, 0) + v
+    out['severities'] = sev
+    firsts = [p['first_ts'] for p in parts if p.get('first_ts') is not None]
+    lasts = [p['last_ts'] for p in parts if p.get('last_ts') is not None]
+    out['first_ts'] = min(firsts) if firsts else None
+    out['last_ts'] = max(lasts) if lasts else None
+    return out
+
+
+def _sum_numbers(parts: List[Dict[str, Any]]) -> Dict[str, Any]:
+    out: Dict[str, Any] = {}
+    for p in parts:
+        for k, v in p.items():
+            if isinstance(v, (int, float)) and not isinstance(v, bool) and k not in ('last_status', 'last_latency_ms', 'every_s', 'keyframe_every_s', 'rate_hz', 'inbox_max'):
+                out[k] = out.get(k, 0) + v
+            elif isinstance(v, dict):
+                out[k] = _sum_numbers([out.get(k) or {}, v])
+    return out
+
+
+class AffinityRouter:
+    def __init__(self, workers: List[str], timeout: float = 30.0):
+        self.workers = [w.rstrip('/') for w in workers]
+        limits = httpx.Limits(max_connections=256, max_keepalive_connections=64)
+        self.clients = [httpx.AsyncClient(base_url=w, timeout=timeout, limits=limits) for w in self.workers]
+        # SSE connections stay open, keep them off the request pools
+        self.streams = httpx.AsyncClient(timeout=httpx.Timeout(timeout, read=None))
+        self.routed = [0] * len(self.workers)
+
+    def owner(self, unit: str) -> int:
+        return partition(unit, len(self.workers))
+
+    async def close(self) -> None:
+        for c in self.clients:
+            await c.aclose()
+        await self.streams.aclose()
+
+    async def _send(self, i: int, request: Request, body: bytes) -> Response:
+        headers = { k: v for k, v in request.headers.items() if k.lower() in ('content-type', 'accept') }
+        try:
+            resp = await self.clients[i].request(request.method, request.url.path, params=request.query_params,
+                                                 content=body, headers=headers)
+        except httpx.HTTPError as e:
+            return Response(jsonfast.dumps({ 'ok': False, 'error': f'worker {i}: {type(e).__name__}' }), 502,
+                            media_type='application/json')
+        self.routed[i] += 1
+        return Response(resp.content, resp.status_code,
+                        { k: v for k, v in resp.headers.items() if k.lower() not in _HOP })
+
+    async def proxy(self, request: Request) -> Response:
+        body = await request.body()
+        return await self._send(self.owner(request_unit(request, body)), request, body)
+
+    async def ingest_stream(self, request: Request) -> Response:
+        """Split the NDJSON upload by owner and stream each share to its worker concurrently."""
+        n = len(self.workers)
+        queues: List[asyncio.Queue] = [asyncio.Queue(maxsize=64) for _ in range(n)]
+        used = [False] * n
+
+        async def body(q: asyncio.Queue):
+            while True:
+                chunk = await q.get()
+                if chunk is None:
+                    return
+                yield chunk
+
+        async def post(i: int) -> Dict[str, Any]:
+            resp = await self.clients[i].post('/ingest/stream', params=request.query_params, content=body(queues[i]),
+                                              headers={ 'Content-Type': 'application/x-ndjson' })
+            return resp.json()
+
+        tasks = [asyncio.create_task(post(i)) for i in range(n)]
+
+        async def feed(i: int, data: Optional[bytes]):
+            # a worker that failed stops reading; do not block on its full queue
+            if tasks[i].done():
+                return
+            put = asyncio.ensure_future(queues[i].put(data))
+            await asyncio.wait((put, tasks[i]), return_when=asyncio.FIRST_COMPLETED)
+            put.cancel()
+
+        async def flush(shares: Dict[int, List[bytes]]):
+            for i, lines in shares.items():
+                used[i] = True
+                await feed(i, b'\n'.join(lines) + b'\n')
+
+        splitter = LineSplitter()
+        try:
+            async for chunk in request.stream():
+                shares: Dict[int, List[bytes]] = {}
+                for line in splitter.feed(chunk):
+                    self._share(line, shares)
+                await flush(shares)
+            shares = {}
+            for line in splitter.close():
+                self._share(line, shares)
+            await flush(shares)
+        finally:
+            for i in range(n):
+                await feed(i, None)
+        results = await asyncio.gather(*tasks, return_exceptions=True)
+        failed = [i for i, r in enumerate(results) if isinstance(r, BaseException)]
+        if failed:
+            return Response(jsonfast.dumps({ 'ok': False, 'error': f'workers {failed} failed' }), 502,
+                            media_type='application/json')
+        for i in range(n):
+            self.routed[i] += used[i]
+        return Response(jsonfast.dumps(merge_summaries([r for i, r in enumerate(results) if used[i]] or results[:1])),
+                        media_type='application/json')
+
+    def _share(self, line: Optional[bytes], shares: Dict[int, List[bytes]]) -> None:
+        # over-long lines were dropped by the splitter; send a placeholder so the owner counts the error
+        if line is None:
+            shares.setdefault(0, []).append(b'-')
+            return
+        if not line.strip():
+            return
+        shares.setdefault(self.owner(unit_key(body_unit(line))), []).append(line)
+
+    async def stream(self, request: Request) -> Response:
+        unit = request.query_params.get('unit_id')
+        targets = [self.owner(unit_key(unit))] if unit else list(range(len(self.workers)))
+        out: asyncio.Queue = asyncio.Queue(maxsize=256)
+
+        async def pump(i: int):
+            async with self.streams.stream('GET', self.workers[i] + '/stream', params=request.query_params) as resp:
+                buf = b''
+                async for chunk in resp.aiter_bytes():
+                    buf += chunk
+                    *events, buf = buf.split(b'\n\n')
+                    for ev in events:
+                        if ev and not ev.startswith(b':'):
+                            await out.put(ev + b'\n\n')
+
+        async def events():
+            pumps = [asyncio.create_task(pump(i)) for i in targets]
+            try:
+                yield b': connected\n\n'
+                while not all(p.done() for p in pumps):
+                    try:
+                        yield await asyncio.wait_for(out.get(), 15.0)
+                    except asyncio.TimeoutError:
+                        yield b': keep-alive\n\n'
+            finally:
+                for p in pumps:
+                    p.cancel()
+
+        return StreamingResponse(events(), media_type='text/event-stream',
+                                 headers={ 'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no' })
+
+    async def _gather(self, path: str) -> List[Optional[httpx.Response]]:
+        async def get(c):
+            try:
+                return await c.get(path)
+            except httpx.HTTPError:
+                return None
+        return await asyncio.gather(*(get(c) for c in self.clients))
+
+    async def metrics(self, request: Request) -> Response:
+        texts = [r.text if r is not None else '' for r in await self._gather('/metrics')]
+        return Response(merge_metrics(texts), media_type='text/plain; version=0.0.4; charset=utf-8')
+
+    async def forwarder(self, request: Request) -> Response:
+        parts = [r.json() if r is not None else { 'ok': False } for r in await self._gather('/forwarder')]
+        out = { 'workers': parts, 'total': _sum_numbers([p for p in parts if p.get('ok') is not False]),
+                'routed': self.routed }
+        return Response(jsonfast.dumps(out), media_type='application/json')
+
+
+def build_app(workers: List[str]) -> Starlette:
+    router = AffinityRouter(workers)
+
+    @contextlib.asynccontextmanager
+    async def lifespan(app):
+        yield
+        await router.close()
+
+    return Starlette(routes=[
+        Route('/ingest/stream', router.ingest_stream, methods=['POST']),
+        Route('/stream', router.stream, methods=['GET']),
+        Route('/metrics', router.metrics, methods=['GET']),
+        Route('/forwarder', router.forwarder, methods=['GET']),
+        Route('/{path:path}', router.proxy, methods=['GET', 'POST']),
+    ], lifespan=lifespan)
+
+
+def _wait_ready(urls: List[str], procs: List[subprocess.Popen], timeout: float = 30.0) -> None:
+    deadline = time.time() + timeout
+    pending = list(urls)
+    while pending:
+        if any(p.poll() is not None for p in procs):
+            raise RuntimeError('a worker exited during startup')
+        if time.time() > deadline:
+            raise RuntimeError(f'workers did not come up: {pending}')
+        try:
+            httpx.get(pending[0] + '/forwarder', timeout=0.5)
+            pending.pop(0)
+        except httpx.HTTPError:
+            time.sleep(0.1)
+
+
+def serve(script: str, host: str, port: int, workers: int) -> None:
+    """Start `workers` copies of `script` on port+1.. and the router on `port` (blocks until stopped)."""
+    import uvicorn
+
+    procs: List[subprocess.Popen] = []
+    urls = []
+    for i in range(workers):
+        env = { **os.environ, 'AI_HOST': '127.0.0.1', 'AI_PORT': str(port + 1 + i),
+                'AI_WORKER_INDEX': str(i), 'AI_WORKERS': str(workers) }
+        # state that goes to disk must not be shared between workers
+        if os.getenv('TLOG_DIR'):
+            env['TLOG_DIR'] = os.path.join(os.environ['TLOG_DIR'], f'worker-{i}')
+        if os.getenv('PYSAD_CHECKPOINT'):
+            env['PYSAD_CHECKPOINT'] = f'{os.environ["PYSAD_CHECKPOINT"]}.worker-{i}'
+        if os.getenv('SNAPSHOT_PATH'):
+            env['SNAPSHOT_PATH'] = f'{os.environ["SNAPSHOT_PATH"]}.worker-{i}'
+        # a local Webots endpoint per worker; supervisors pick theirs with partition(unit_id)
+        env['WEBOTS_SOCKET'] = f'{os.getenv("WEBOTS_SOCKET", DEFAULT_SOCKET)}.worker-{i}'
+        env['WEBOTS_SHM'] = f'{os.getenv("WEBOTS_SHM", DEFAULT_SHM)}.worker-{i}'
+        procs.append(subprocess.Popen([sys.executable, script, '--workers', '1'], env=env))
+        urls.append(f'http://127.0.0.1:{port + 1 + i}')
+    try:
+        _wait_ready(urls, procs)
+        uvicorn.run(build_app(urls), host=host, port=port, log_level='warning', access_log=False)
+    finally:
+        for p in procs:
+            p.send_signal(signal.SIGTERM)
+        for p in procs:
+            try:
+                p.wait(10)
+            except subprocess.TimeoutExpired:
+                p.kill()
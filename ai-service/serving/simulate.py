@@ -0,0 +1,123 @@
+import itertools
+import threading
+import time
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+from transport import jsonfast
+
+
+class SimFrame:
+    """One produced simulator frame of a unit and its /simulate response body, encoded once."""
+    __slots__ = ('seq', 'at', 'unit_id', 'sensors', 'body')
+
+    def __init__(self, seq: int, unit_id: str, sensors: List[Dict[str, Any]]):
+        self.seq = seq
+        self.at = time.monotonic()
+        self.unit_id = unit_id
+        self.sensors = sensors
+        self.body = jsonfast.dumps({ 'unit_id': unit_id, 'sensors': sensors })
+
+
+class _Slot:
+    __slots__ = ('lock', 'frame', 'polled')
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.frame: Optional[SimFrame] = None
+        self.polled = 0.0
+
+
+class SimulateProducer:
+    """
+    Simulator frames for /simulate, produced at a fixed rate instead of once per request.
+
+    tick() (every 1/rate_hz seconds, from the service's ticker) advances the
+    simulator of every unit polled within idle_after seconds, plus the units it
+    is given (the stream's default unit while anyone is subscribed). get()
+    returns the unit's latest frame while it is at most two periods old;
+    otherwise (first poll, ticker behind, rate_hz=0) one caller produces a frame
+    while concurrent callers for the unit wait for that same frame instead of
+    stepping the simulator themselves (single flight). So the simulation runs in
+    real time and its cost does not grow with the number of pollers.
+
+    produce(unit_id) -> (unit_id, analyzed sensors) steps and analyzes one frame.
+    """
+
+    def __init__(self, produce: Callable[[Optional[str]], Tuple[str, List[Dict[str, Any]]]],
+                 rate_hz: float = 1.0, idle_after: float = 30.0):
+        self.produce = produce
+        self.period = 1.0 / rate_hz if rate_hz > 0 else 0.0
+        self.idle_after = idle_after
+        self._slots: Dict[str, _Slot] = {}
+        self._seq = itertools.count(1)  # shared by all units' locks; next() is atomic
+        self.produced = 0
+        self.ticked = 0
+        self.hits = 0
+        self.coalesced = 0
+
+    def _slot(self, unit_id: str) -> _Slot:
+        slot = self._slots.get(unit_id)
+        if slot is None:
+            slot = self._slots.setdefault(unit_id, _Slot())
+        return slot
+
+    def _fresh(self, frame: Optional[SimFrame], now: float) -> bool:
+        return frame is not None and self.period > 0 and now - frame.at <= 2 * self.period
+
+    def _run(self, slot: _Slot, unit_id: Optional[str]) -> SimFrame:
+        # with slot.lock held
+        key, sensors = self.produce(unit_id)
+        frame = SimFrame(next(self._seq), key, sensors)
+        slot.frame = frame
+        self.produced += 1
+        return frame
+
+    def get(self, unit_id: str) -> SimFrame:
+        """Latest frame of a (normalized) unit id; the call also keeps the unit ticking."""
+        slot = self._slot(unit_id)
+        now = time.monotonic()
+        slot.polled = now
+        frame = slot.frame
+        if self._fresh(frame, now):
+            self.hits += 1
+            return frame
+        seen = frame.seq if frame is not None else 0
+        with slot.lock:
+            frame = slot.frame
+            if frame is not None and frame.seq != seen:
+                # produced while this caller waited for the lock
+                self.coalesced += 1
+                return frame
+            return self._run(slot, unit_id)
+
+    def tick(self, also: Iterable[str] = ()) -> int:
+        """Advance every unit polled within idle_after (and `also`); returns the frames produced."""
+        now = time.monotonic()
+        keys = set(also)
+        for key, slot in list(self._slots.items()):
+            if now - slot.polled <= self.idle_after:
+                keys.add(key)
+            elif key not in keys and (slot.frame is None or now - slot.frame.at > self.idle_after):
+                # idle: forget it (the unit's own state stays with the registry)
+                self._slots.pop(key, None)
+        n = 0
+        for key in keys:
+            slot = self._slot(key)
+            # a frame a poller produced during this period already counts as this tick's
+            if slot.frame is not None and now - slot.frame.at < 0.5 * self.period:
+                continue
+            with slot.lock:
+                self._run(slot, key)
+            n += 1
+        self.ticked += n
+        return n
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            'rate_hz': 1.0 / self.period if self.period else 0.0,
+            'units': len(self._slots),
+            'produced': self.produced,
+            'ticked': self.ticked,
+            'hits': self.hits,
+            'coalesced': self.coalesced,
+        }
@@ -1,6 +1,11 @@
 import os
 import random
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Iterator, Optional, Sequence, Tuple
+
+try:
+    import numpy as np
+except Exception:  # step_batch needs numpy, step() does not
+    np = None
 
 
 RANGES = {
@@ -18,6 +23,55 @@ RANGES = {
 }
 
 
+# Frame layout of RuleSimulator.step(): id, type and the meta fields it reports
+FRAME_LAYOUT: Tuple[Tuple[str, str, Dict[str, Any]], ...] = (
+    ('rpm', 'RPM', { 'min': RANGES['rpm']['min'], 'max': RANGES['rpm']['max'], 'unit': RANGES['rpm']['unit'] }),
+    ('engine_temp_coolant', 'temperature_coolant', { 'min': 20, 'max': 120, 'unit': '°C' }),
+    ('oil_temp', 'temperature_oil', { 'min': 20, 'max': 150, 'unit': '°C' }),
+    ('oil_pressure', 'pressure_oil', { 'min': RANGES['oil_pressure']['min'], 'max': RANGES['oil_pressure']['max'], 'unit': 'bar' }),
+    ('fuel_pressure', 'pressure_fuel', { 'min': RANGES['fuel_pressure']['min'], 'max': RANGES['fuel_pressure']['max'], 'unit': 'bar' }),
+    ('fuel_consumption', 'consumption_fuel', { k: RANGES['fuel_consumption'][k] for k in ('min', 'max', 'unit') }),
+    ('fuel_level', 'level_fuel', { k: RANGES['fuel_level'][k] for k in ('min', 'max', 'unit') }),
+    ('voltage', 'voltage', { k: RANGES['voltage'][k] for k in ('min', 'max', 'unit') }),
+    ('current', 'current', { k: RANGES['current'][k] for k in ('min', 'max', 'unit') }),
+    ('coolant_pressure', 'pressure_coolant', { 'min': RANGES['coolant_pressure']['min'], 'max': RANGES['coolant_pressure']['max'], 'unit': 'bar' }),
+    ('vibration', 'vibration', { k: RANGES['vibration'][k] for k in ('min', 'max', 'unit') }),
+    ('fuel_leak', 'fuel_leak', {}),
+    ('overheat', 'overheat', {}),
+    ('emergency_stop', 'emergency_stop', {}),
+    ('ecu_errors', 'ecu_errors', {}),
+)
+
+
+class FleetBatch:
+    """
+    Output of RuleSimulator.step_batch: columns[id] has shape (n_steps, n_units).
+    Dicts in the step() schema are only built on demand by frame()/frames().
+    """
+
+    def __init__(self, columns: Dict[str, Any], unit_ids: List[str]):
+        self.columns = columns
+        self.unit_ids = unit_ids
+        self.n_steps, self.n_units = columns['rpm'].shape
+
+    def unit_columns(self, unit: int) -> Dict[str, Any]:
+        """1-D columns of one unit, ready for RiskAnalyzer.analyze_frames."""
+        return { sid: col[:, unit] for sid, col in self.columns.items() }
+
+    def frame(self, step: int, unit: int) -> List[Dict[str, Any]]:
+        out = []
+        for sid, typ, meta in FRAME_LAYOUT:
+            v = self.columns[sid][step, unit].item()
+            out.append({ 'id': sid, 'type': typ, 'value': v, **meta } if meta else { 'id': sid, 'type': typ, 'value': v })
+        return out
+
+    def frames(self) -> Iterator[Tuple[int, str, List[Dict[str, Any]]]]:
+        """(step, unit_id, sensors) in time order, all units of a step before the next step."""
+        for t in range(self.n_steps):
+            for u, uid in enumerate(self.unit_ids):
+                yield t, uid, self.frame(t, u)
+
+
 class RuleSimulator:
     """
     Генератор телеметрии на основе нормативов. Вероятности режимов настраиваются:
@@ -25,9 +79,10 @@ class RuleSimulator:
     - SIM_P_WARNING (default 0.07)
     - SIM_P_CRITICAL (default 0.01)
     Можно быстро инвертировать профиль, установив SIM_PROFILE=stress (0.6/0.3/0.1)
+    Зерно генератора: аргумент seed или SIM_SEED — повторяемые прогоны step() и step_batch().
     """
 
-    def __init__(self):
+    def __init__(self, seed: Optional[int] = None):
         profile = os.getenv('SIM_PROFILE', 'safe').lower()
         if profile == 'stress':
             p_n, p_w, p_c = 0.6, 0.3, 0.1
@@ -38,14 +93,22 @@ class RuleSimulator:
         s = max(1e-6, p_n + p_w + p_c)
         self.p_normal, self.p_warning, self.p_critical = p_n / s, p_w / s, p_c / s
 
+        if seed is None and os.getenv('SIM_SEED'):
+            seed = int(os.getenv('SIM_SEED'))
+        self.seed = seed
+        self.rng = random.Random(seed) if seed is not None else random
+        self._np_rng = None
+
         # внутреннее состояние для зависимостей
         self.state = {
             'rpm': 1500.0,
             'fuel_level': 80.0,
         }
+        # состояние парка для step_batch: уровень топлива на агрегат
+        self.fleet_fuel_level = None
 
     def _pick_mode(self):
-        r = random.random()
+        r = self.rng.random()
         if r < self.p_critical:
             return 'critical'
         if r < self.p_critical + self.p_warning:
@@ -53,8 +116,8 @@ class RuleSimulator:
         return 'normal'
 
     def _sample_range(self, a: float, b: float, jitter: float = 0.02) -> float:
-        base = random.uniform(a, b)
-        return base * (1.0 + random.uniform(-jitter, jitter))
+        base = self.rng.uniform(a, b)
+        return base * (1.0 + self.rng.uniform(-jitter, jitter))
 
     def step(self) -> List[Dict[str, Any]]:
         out: List[Dict[str, Any]] = []
@@ -69,8 +132,8 @@ class RuleSimulator:
             value = self._sample_range(rpm_cfg['nominal'] * (1 - rpm_cfg['criticalPct']), rpm_cfg['nominal'] * (1 + rpm_cfg['criticalPct']), 0.02)
         else:
             # сильное отклонение
-            side = -1 if random.random() < 0.5 else 1
-            value = rpm_cfg['nominal'] * (1 + side * (rpm_cfg['criticalPct'] + random.uniform(0.02, 0.2)))
+            side = -1 if self.rng.random() < 0.5 else 1
+            value = rpm_cfg['nominal'] * (1 + side * (rpm_cfg['criticalPct'] + self.rng.uniform(0.02, 0.2)))
         value = max(rpm_cfg['min'], min(rpm_cfg['max'], value))
         self.state['rpm'] = value
         out.append({ 'id': 'rpm', 'type': 'RPM', 'value': round(value, 0), 'min': rpm_cfg['min'], 'max': rpm_cfg['max'], 'unit': rpm_cfg['unit'] })
@@ -87,7 +150,7 @@ class RuleSimulator:
                 lo, hi = cfg['critical']
             val = self._sample_range(lo, hi, 0.01)
             if prev is not None:
-                val = prev + (val - prev) * random.uniform(0.1, 0.4)
+                val = prev + (val - prev) * self.rng.uniform(0.1, 0.4)
             return max(cfg['min'], min(cfg['max'], val))
 
         ect_prev = None
@@ -118,7 +181,7 @@ class RuleSimulator:
             lo, hi = (fp_cfg['warningLow'], fp_cfg['warningHigh'])
         else:
             # за пределами warning
-            if random.random() < 0.5:
+            if self.rng.random() < 0.5:
                 lo, hi = (0.3, fp_cfg['criticalLow'])
             else:
                 lo, hi = (fp_cfg['criticalHigh'], 8.0)
@@ -136,34 +199,34 @@ class RuleSimulator:
         out.append({ 'id': 'fuel_consumption', 'type': 'consumption_fuel', 'value': round(cons, 1), 'min': cons_cfg['min'], 'max': cons_cfg['max'], 'unit': cons_cfg['unit'] })
         # простая модель расхода %/шаг
         drop_pct = cons * 0.005 / 60.0  # эвристика
-        if random.random() < 0.01:
-            drop_pct *= random.uniform(2, 5)  # редкие скачки/утечки
+        if self.rng.random() < 0.01:
+            drop_pct *= self.rng.uniform(2, 5)  # редкие скачки/утечки
         self.state['fuel_level'] = max(0.0, self.state['fuel_level'] - drop_pct)
         fl_cfg = RANGES['fuel_level']
         out.append({ 'id': 'fuel_level', 'type': 'level_fuel', 'value': round(self.state['fuel_level'], 1), 'min': fl_cfg['min'], 'max': fl_cfg['max'], 'unit': fl_cfg['unit'] })
 
         # Напряжение/ток
         v_cfg = RANGES['voltage']
-        if random.random() < 0.5:
+        if self.rng.random() < 0.5:
             lo, hi = v_cfg['rest']
         else:
             lo, hi = v_cfg['charge']
         volt = self._sample_range(lo, hi, 0.01)
-        if random.random() < self.p_critical * 0.5:
-            volt += random.choice([-1.5, 1.5])  # редкие выбросы
+        if self.rng.random() < self.p_critical * 0.5:
+            volt += self.rng.choice([-1.5, 1.5])  # редкие выбросы
         out.append({ 'id': 'voltage', 'type': 'voltage', 'value': round(volt, 2), 'min': v_cfg['min'], 'max': v_cfg['max'], 'unit': v_cfg['unit'] })
 
         cur_cfg = RANGES['current']
         cur = self._sample_range(cur_cfg['normal'][0], cur_cfg['normal'][1], 0.05)
-        if random.random() < self.p_warning:
+        if self.rng.random() < self.p_warning:
             cur = self._sample_range(cur_cfg['warning'][0], cur_cfg['warning'][1], 0.05)
-        if random.random() < self.p_critical * 0.3:
+        if self.rng.random() < self.p_critical * 0.3:
             cur = self._sample_range(cur_cfg['criticalAbove'], cur_cfg['criticalAbove'] + 80, 0.05)
         out.append({ 'id': 'current', 'type': 'current', 'value': round(cur, 1), 'min': cur_cfg['min'], 'max': cur_cfg['max'], 'unit': cur_cfg['unit'] })
 
         # Давление ОЖ
         cp_cfg = RANGES['coolant_pressure']
-        if ect >= 100 and random.random() < self.p_warning:
+        if ect >= 100 and self.rng.random() < self.p_warning:
             lo, hi = (cp_cfg['warningLow'], cp_cfg['warningHigh'])
         else:
             lo, hi = cp_cfg['normal']
@@ -173,14 +236,14 @@ class RuleSimulator:
         # Вибрация
         vib_cfg = RANGES['vibration']
         vib = self._sample_range(vib_cfg['normal'][0], vib_cfg['normal'][1], 0.1)
-        if random.random() < self.p_warning:
+        if self.rng.random() < self.p_warning:
             vib = self._sample_range(vib_cfg['warning'][0], vib_cfg['warning'][1], 0.1)
-        if random.random() < self.p_critical * 0.2:
+        if self.rng.random() < self.p_critical * 0.2:
             vib = self._sample_range(vib_cfg['criticalAbove'], vib_cfg['criticalAbove'] + 3, 0.2)
         out.append({ 'id': 'vibration', 'type': 'vibration', 'value': round(vib, 2), 'min': vib_cfg['min'], 'max': vib_cfg['max'], 'unit': vib_cfg['unit'] })
 
         # Логические флаги (редкие события)
-        fuel_leak = random.random() < (self.p_critical * 0.1)
+        fuel_leak = self.rng.random() < (self.p_critical * 0.1)
         overheat = (ect >= 111) or (ot >= 121) or (cpress > 1.5 and ect > 100)
         emergency = False  # финально решает анализатор по кадру
 
@@ -191,4 +254,110 @@ class RuleSimulator:
 
         return out
 
+    def step_batch(self, n_units: int, n_steps: int = 1, unit_ids: Optional[Sequence[str]] = None) -> FleetBatch:
+        """
+        Vectorized step() for a fleet: same mode probabilities, RPM-dependent
+        consumption and fuel drain, drawn from a seeded numpy Generator. Fuel level
+        is kept per unit between calls (reset when n_units changes).
+        """
+        if np is None:
+            raise RuntimeError('numpy is required for step_batch')
+        if self._np_rng is None:
+            self._np_rng = np.random.default_rng(self.seed)
+        rng = self._np_rng
+        shape = (n_steps, n_units)
+        pc, pw = self.p_critical, self.p_warning
+
+        def mode():
+            r = rng.random(shape)
+            return np.where(r < pc, 2, np.where(r < pc + pw, 1, 0))
+
+        def sample(lo, hi, jitter):
+            return rng.uniform(lo, hi, shape) * (1.0 + rng.uniform(-jitter, jitter, shape))
+
+        def pick(m, *bounds):
+            return np.choose(m, [b[0] for b in bounds]), np.choose(m, [b[1] for b in bounds])
+
+        cols: Dict[str, Any] = {}
+
+        # RPM
+        rc = RANGES['rpm']
+        nom = rc['nominal']
+        m = mode()
+        lo, hi = pick(m, (nom * (1 - rc['warningPct'] / 2), nom * (1 + rc['warningPct'] / 2)),
+                      (nom * (1 - rc['criticalPct']), nom * (1 + rc['criticalPct'])), (0.0, 0.0))
+        rpm = sample(lo, hi, np.where(m == 0, 0.01, 0.02))
+        side = np.where(rng.random(shape) < 0.5, -1.0, 1.0)
+        crit_rpm = nom * (1 + side * (rc['criticalPct'] + rng.uniform(0.02, 0.2, shape)))
+        rpm = np.clip(np.where(m == 2, crit_rpm, rpm), rc['min'], rc['max'])
+        cols['rpm'] = np.round(rpm, 0)
+
+        # Температуры
+        temps = {}
+        for sid in ('engine_temp_coolant', 'oil_temp'):
+            cfg = RANGES[sid]
+            lo, hi = pick(mode(), cfg['normal'], cfg['warning'], cfg['critical'])
+            temps[sid] = np.clip(sample(lo, hi, 0.01), cfg['min'], cfg['max'])
+            cols[sid] = np.round(temps[sid], 1)
+        ect, ot = temps['engine_temp_coolant'], temps['oil_temp']
+
+        # Давления
+        op = RANGES['oil_pressure']
+        lo, hi = pick(mode(), op['normal'], op['warning'], (op['min'], op['criticalBelowLoad']))
+        cols['oil_pressure'] = np.round(sample(lo, hi, 0.03), 2)
+        fp = RANGES['fuel_pressure']
+        low_side = rng.random(shape) < 0.5
+        crit_lo = np.where(low_side, 0.3, fp['criticalHigh'])
+        crit_hi = np.where(low_side, fp['criticalLow'], 8.0)
+        m = mode()
+        lo, hi = pick(m, fp['normal'], (fp['warningLow'], fp['warningHigh']), (0.0, 0.0))
+        lo, hi = np.where(m == 2, crit_lo, lo), np.where(m == 2, crit_hi, hi)
+        cols['fuel_pressure'] = np.round(sample(lo, hi, 0.03), 2)
+
+        # Уровень/расход топлива: расход зависит от RPM, уровень убывает накопительно
+        low_load = rpm < 1300
+        cons = sample(np.where(low_load, 10, 40), np.where(low_load, 40, 120), 0.08)
+        cols['fuel_consumption'] = np.round(cons, 1)
+        drop = cons * 0.005 / 60.0
+        spike = rng.random(shape) < 0.01
+        drop = np.where(spike, drop * rng.uniform(2, 5, shape), drop)
+        if self.fleet_fuel_level is None or len(self.fleet_fuel_level) != n_units:
+            self.fleet_fuel_level = np.full(n_units, self.state['fuel_level'])
+        level = np.maximum(0.0, self.fleet_fuel_level - np.cumsum(drop, axis=0))
+        self.fleet_fuel_level = level[-1].copy()
+        cols['fuel_level'] = np.round(level, 1)
+
+        # Напряжение/ток
+        vc = RANGES['voltage']
+        rest = rng.random(shape) < 0.5
+        volt = sample(np.where(rest, vc['rest'][0], vc['charge'][0]), np.where(rest, vc['rest'][1], vc['charge'][1]), 0.01)
+        spike = rng.random(shape) < pc * 0.5
+        volt = volt + np.where(spike, rng.choice([-1.5, 1.5], shape), 0.0)
+        cols['voltage'] = np.round(volt, 2)
+        cc = RANGES['current']
+        cur = sample(*cc['normal'], 0.05)
+        cur = np.where(rng.random(shape) < pw, sample(*cc['warning'], 0.05), cur)
+        cur = np.where(rng.random(shape) < pc * 0.3, sample(cc['criticalAbove'], cc['criticalAbove'] + 80, 0.05), cur)
+        cols['current'] = np.round(cur, 1)
+
+        # Давление ОЖ
+        cp = RANGES['coolant_pressure']
+        hot = (ect >= 100) & (rng.random(shape) < pw)
+        cpress = sample(np.where(hot, cp['warningLow'], cp['normal'][0]), np.where(hot, cp['warningHigh'], cp['normal'][1]), 0.03)
+        cols['coolant_pressure'] = np.round(cpress, 2)
+
+        # Вибрация
+        vb = RANGES['vibration']
+        vib = sample(*vb['normal'], 0.1)
+        vib = np.where(rng.random(shape) < pw, sample(*vb['warning'], 0.1), vib)
+        vib = np.where(rng.random(shape) < pc * 0.2, sample(vb['criticalAbove'], vb['criticalAbove'] + 3, 0.2), vib)
+        cols['vibration'] = np.round(vib, 2)
+
+        # Логические флаги (редкие события)
+        cols['fuel_leak'] = rng.random(shape) < pc * 0.1
+        cols['overheat'] = (ect >= 111) | (ot >= 121) | ((cpress > 1.5) & (ect > 100))
+        cols['emergency_stop'] = np.zeros(shape, dtype=bool)
+        cols['ecu_errors'] = np.zeros(shape, dtype=np.int64)
 
+        ids = list(unit_ids) if unit_ids is not None else [f'unit-{u}' for u in range(n_units)]
+        return FleetBatch(cols, ids)
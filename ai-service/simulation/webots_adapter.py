@@ -1,32 +1,96 @@
 import os
-from typing import List, Dict, Any
+import threading
+import time
+from typing import Any, Dict, List, Optional
+
+from transport.local import OnFrame, ShmRing, SocketListener
+
+DEFAULT_SOCKET = '/tmp/datchiki-webots.sock'
+DEFAULT_SHM = 'datchiki-webots'
 
 
 class WebotsAdapter:
     """
-    Webots/ASL simulator adapter (placeholder).
+    Webots/ASL supervisor on a same-host transport instead of HTTP /ingest.
     If WEBOTS_ENABLED!="1", acts as unavailable.
-    Implement connect() and step() to stream from your Webots controller.
+
+    WEBOTS_TRANSPORT=socket (default): supervisors connect to the Unix socket
+    WEBOTS_SOCKET and write fixed-size frames (transport/local.py), one
+    connection each. shm: one supervisor writes the shared-memory ring
+    WEBOTS_SHM (WEBOTS_SHM_SLOTS frames), read every WEBOTS_POLL_US while empty.
+
+    start(on_frame) hands every frame to on_frame(unit_id, ts, sensors) from a
+    reader thread, with no HTTP parsing or TCP round trip in between; step()
+    returns the sensors of the latest frame.
     """
 
-    def __init__(self):
+    def __init__(self, transport: Optional[str] = None, address: Optional[str] = None):
         self.enabled = os.getenv('WEBOTS_ENABLED', '0') == '1'
+        # checked by connect(), so a bad value does not break importing the server with Webots off
+        self.transport = transport or os.getenv('WEBOTS_TRANSPORT', 'socket')
+        if address is None:
+            address = os.getenv('WEBOTS_SHM', DEFAULT_SHM) if self.transport == 'shm' \
+                else os.getenv('WEBOTS_SOCKET', DEFAULT_SOCKET)
+        self.address = address
+        self.slots = int(os.getenv('WEBOTS_SHM_SLOTS', '1024'))
+        self.poll = float(os.getenv('WEBOTS_POLL_US', '200')) / 1e6
         self.connected = False
+        self.latest: Optional[List[Dict[str, Any]]] = None
+        self._source = None
+        self._poller: Optional[threading.Thread] = None
+        self._stop = threading.Event()
 
     def is_available(self) -> bool:
         return self.enabled
 
     def connect(self) -> None:
-        if not self.enabled:
-            return
-        # TODO: connect to Webots/ASL controller or data source
+        """Create the ring (shm); the socket is bound by start(), once frames have somewhere to go."""
+        if self.transport not in ('socket', 'shm'):
+            raise ValueError(f'WEBOTS_TRANSPORT must be socket or shm, not {self.transport!r}')
+        if self.transport == 'shm':
+            self._source = ShmRing(self.address, self.slots, create=True)
         self.connected = True
 
+    def start(self, on_frame: OnFrame) -> 'WebotsAdapter':
+        if not self.connected:
+            self.connect()
+
+        def deliver(unit_id, ts, sensors):
+            self.latest = sensors
+            on_frame(unit_id, ts, sensors)
+
+        if self.transport == 'socket':
+            self._source = SocketListener(self.address, deliver).open()
+        else:
+            self._poller = threading.Thread(target=self._poll, args=(deliver,), name='webots-shm', daemon=True)
+            self._poller.start()
+        return self
+
+    def _poll(self, deliver: OnFrame) -> None:
+        ring, poll = self._source, self.poll
+        while not self._stop.is_set():
+            if not ring.drain(deliver):
+                time.sleep(poll)
+
     def step(self) -> List[Dict[str, Any]]:
         if not (self.enabled and self.connected):
             raise RuntimeError('WebotsAdapter is not connected or not enabled')
-        # TODO: pull a telemetry frame from Webots/ASL
-        # Example schema to match Nest expectations:
-        raise NotImplementedError('Integrate with Webots/ASL controller here')
+        if self.latest is None:
+            raise RuntimeError('no frame from Webots yet')
+        return self.latest
 
+    def close(self) -> None:
+        self._stop.set()
+        if self._poller is not None:
+            self._poller.join(1.0)  # before the segment goes away under it
+            self._poller = None
+        if self._source is not None:
+            self._source.close()
+            self._source = None
+        self.connected = False
 
+    def stats(self) -> Dict[str, Any]:
+        out = { 'transport': self.transport, 'address': self.address }
+        if self._source is not None:
+            out.update(self._source.stats())
+        return out
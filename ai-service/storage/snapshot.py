@@ -0,0 +1,259 @@
+import logging
+import math
+import os
+import struct
+import threading
+import time
+import zlib
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from observability import logs
+
+log = logs.get('snapshot')
+
+# Snapshot of per-unit state for warm restarts (SNAPSHOT_PATH).
+#
+#   header:   b'DSNP' version:u8 saved_at:f64 units:u32 n_ids:u8 ids:utf8 (comma separated, ids of detector models)
+#   unit:     id_len:u8 unit_id:utf8 flags:u8 clear_streak:u16 prev_rpm:f64 prev_fuel_level:f64
+#   features: (flags & F_FEATURES) window:u32 consumption:f64 n:u32 rpm:f64[n] m:u32 fuel_level:f64[m]
+#   detector: (flags & F_DETECTOR) k:u8 then k x (id index:u8 n:u32 mean:f64 mad:f64)
+#   trailer:  crc32 of everything before it:u32
+#
+# NaN stands for a missing value. All fields are little-endian. The file is written
+# to <path>.tmp, fsynced and renamed, so a crash leaves the previous snapshot intact.
+MAGIC = b'DSNP'
+VERSION = 1
+F_EMERGENCY = 0x01
+F_PREV = 0x02
+F_LEAK = 0x04
+F_FEATURES = 0x08
+F_DETECTOR = 0x10
+
+_HEAD = struct.Struct('<4sBdIB')
+_UNIT = struct.Struct('<BHdd')
+_FEAT = struct.Struct('<Id')
+_COUNT = struct.Struct('<I')
+_MODEL = struct.Struct('<BIdd')
+_CRC = struct.Struct('<I')
+
+# (unit_id, analyzer state, detector state or None)
+UnitSnapshot = Tuple[str, Dict[str, Any], Optional[Dict[str, List[float]]]]
+
+
+class SnapshotError(ValueError):
+    pass
+
+
+def _f(v: Any) -> float:
+    return float(v) if isinstance(v, (int, float)) and not isinstance(v, bool) else math.nan
+
+
+def _v(x: float) -> Optional[float]:
+    return None if x != x else x
+
+
+def _floats(values: List[float]) -> bytes:
+    return _COUNT.pack(len(values)) + struct.pack(f'<{len(values)}d', *values)
+
+
+def encode(units: List[UnitSnapshot], saved_at: Optional[float] = None) -> bytes:
+    ids: Dict[str, int] = {}
+    body = bytearray()
+    for unit_id, state, det in units:
+        prev = state.get('prev_frame') or {}
+        feats = state.get('features')
+        flags = ((F_EMERGENCY if state.get('emergency_active') else 0) | (F_PREV if prev else 0)
+                 | (F_LEAK if prev.get('fuel_leak') else 0) | (F_FEATURES if feats else 0) | (F_DETECTOR if det else 0))
+        raw_id = unit_id.encode('utf-8')[:255]
+        body += bytes((len(raw_id),)) + raw_id
+        body += _UNIT.pack(flags, min(int(state.get('emergency_clear_streak') or 0), 0xFFFF),
+                           _f(prev.get('rpm')), _f(prev.get('fuel_level')))
+        if feats:
+            body += _FEAT.pack(feats['window'], _f(feats.get('consumption')))
+            body += _floats(feats['rpm'])
+            body += _floats(feats['fuel_level'])
+        if det:
+            models = list(det.items())[:255]
+            body += bytes((len(models),))
+            for sid, (n, mean, mad) in models:
+                j = ids.setdefault(sid, len(ids))
+                body += _MODEL.pack(j, int(n), mean, mad)
+    if len(ids) > 255:
+        raise SnapshotError('too many detector sensor ids')
+    names = ','.join(ids).encode('utf-8')
+    out = bytearray(_HEAD.pack(MAGIC, VERSION, time.time() if saved_at is None else saved_at, len(units), len(ids)))
+    out += _COUNT.pack(len(names)) + names
+    out += body
+    out += _CRC.pack(zlib.crc32(out))
+    return bytes(out)
+
+
+def decode(data: bytes) -> Tuple[float, List[UnitSnapshot]]:
+    """(saved_at, units) of a snapshot; raises SnapshotError for a foreign, truncated or corrupt file."""
+    view = memoryview(data)
+    if len(view) < _HEAD.size + _COUNT.size + _CRC.size:
+        raise SnapshotError('snapshot shorter than header')
+    magic, version, saved_at, n_units, n_ids = _HEAD.unpack_from(view)
+    if magic != MAGIC or version != VERSION:
+        raise SnapshotError('not a v%d snapshot' % VERSION)
+    (crc,) = _CRC.unpack_from(view, len(view) - _CRC.size)
+    if zlib.crc32(view[:-_CRC.size]) != crc:
+        raise SnapshotError('checksum mismatch (truncated or corrupt snapshot)')
+    pos = _HEAD.size
+    (name_len,) = _COUNT.unpack_from(view, pos)
+    pos += _COUNT.size
+    ids = bytes(view[pos:pos + name_len]).decode('utf-8').split(',') if name_len else []
+    pos += name_len
+    if len(ids) != n_ids:
+        raise SnapshotError('corrupt id table')
+
+    def floats(pos: int) -> Tuple[List[float], int]:
+        (n,) = _COUNT.unpack_from(view, pos)
+        pos += _COUNT.size
+        return list(struct.unpack_from(f'<{n}d', view, pos)), pos + 8 * n
+
+    units: List[UnitSnapshot] = []
+    try:
+        for _ in range(n_units):
+            id_len = view[pos]
+            unit_id = bytes(view[pos + 1:pos + 1 + id_len]).decode('utf-8', 'replace')
+            pos += 1 + id_len
+            flags, streak, rpm, level = _UNIT.unpack_from(view, pos)
+            pos += _UNIT.size
+            prev = { 'rpm': _v(rpm), 'fuel_level': _v(level), 'fuel_leak': bool(flags & F_LEAK) } if flags & F_PREV else {}
+            feats = None
+            if flags & F_FEATURES:
+                window, cons = _FEAT.unpack_from(view, pos)
+                rpm_buf, pos = floats(pos + _FEAT.size)
+                level_buf, pos = floats(pos)
+                feats = { 'window': window, 'rpm': rpm_buf, 'fuel_level': level_buf, 'consumption': _v(cons) }
+            det = None
+            if flags & F_DETECTOR:
+                k = view[pos]
+                pos += 1
+                det = {}
+                for _ in range(k):
+                    j, n, mean, mad = _MODEL.unpack_from(view, pos)
+                    pos += _MODEL.size
+                    det[ids[j]] = [n, mean, mad]
+            units.append((unit_id, {
+                'prev_frame': prev,
+                'emergency_active': bool(flags & F_EMERGENCY),
+                'emergency_clear_streak': streak,
+                'features': feats,
+            }, det))
+    except (struct.error, IndexError) as e:
+        raise SnapshotError(f'corrupt unit record: {e}') from None
+    return saved_at, units
+
+
+def write_atomic(path: str, data: bytes) -> None:
+    tmp = f'{path}.tmp'
+    with open(tmp, 'wb') as f:
+        f.write(data)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, path)
+
+
+def capture(registry) -> List[UnitSnapshot]:
+    """State of every live unit; each unit's lock is held only while its state is copied."""
+    out: List[UnitSnapshot] = []
+    for st in registry:
+        with st.lock:
+            det = st.detector
+            out.append((st.unit_id, st.analyzer.state(), det.state() if det is not None else None))
+    return out
+
+
+class Snapshotter:
+    """
+    Writes the per-unit analyzer (and streaming detector) state of a UnitRegistry to
+    `path` every `every` seconds from a background thread and once more at close();
+    restore() loads the last snapshot into the registry at startup.
+    """
+
+    def __init__(self, path: str, registry, every: float = 30.0):
+        self.path = path
+        self.registry = registry
+        self.every = every
+        self.saves = 0
+        self.failures = 0
+        self.restored = 0
+        self.last_units = 0
+        self.last_bytes = 0
+        self.last_ms: Optional[float] = None
+        self.last_saved_at: Optional[float] = None
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def restore(self, on_detector: Optional[Callable[[Any, Dict[str, List[float]]], None]] = None) -> int:
+        """Recreate the units of the last snapshot; on_detector(unit, state) rebuilds a streaming model."""
+        try:
+            with open(self.path, 'rb') as f:
+                saved_at, units = decode(f.read())
+        except FileNotFoundError:
+            return 0
+        except (OSError, SnapshotError) as e:
+            log.warning('[PY-SNAPSHOT] %s unreadable, starting cold: %s', self.path, e)
+            return 0
+        for unit_id, state, det in units:
+            st = self.registry.get(unit_id)
+            with st.lock:
+                st.analyzer.load(state)
+                if det and on_detector is not None:
+                    on_detector(st, det)
+        self.restored = len(units)
+        log.info('[PY-SNAPSHOT] restored %d units saved %.0fs ago', len(units), time.time() - saved_at)
+        return len(units)
+
+    def save(self) -> int:
+        with self._lock:
+            t0 = time.perf_counter()
+            units = capture(self.registry)
+            data = encode(units)
+            write_atomic(self.path, data)
+            self.last_ms = round((time.perf_counter() - t0) * 1000.0, 3)
+            self.last_units = len(units)
+            self.last_bytes = len(data)
+            self.last_saved_at = time.time()
+            self.saves += 1
+            return len(units)
+
+    def _save_quietly(self) -> None:
+        try:
+            self.save()
+        except (OSError, SnapshotError) as e:
+            self.failures += 1
+            logs.sampled(log, logging.WARNING, 'snapshot', '[PY-SNAPSHOT] save failed: %s', e)
+
+    def start(self) -> 'Snapshotter':
+        if self._thread is None and self.every > 0:
+            self._thread = threading.Thread(target=self._run, name='unit-snapshot', daemon=True)
+            self._thread.start()
+        return self
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.every):
+            self._save_quietly()
+
+    def close(self) -> None:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(5.0)
+            self._thread = None
+        self._save_quietly()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            'path': self.path,
+            'every_s': self.every,
+            'saves': self.saves,
+            'failures': self.failures,
+            'restored': self.restored,
+            'last_units': self.last_units,
+            'last_bytes': self.last_bytes,
+            'last_ms': self.last_ms,
+            'last_saved_at': self.last_saved_at,
+        }
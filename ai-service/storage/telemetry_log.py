@@ -0,0 +1,359 @@
+import logging
+import os
+import struct
+import threading
+import time
+from collections import deque
+from typing import Any, Dict, Iterator, List, Optional, Tuple, Union
+
+import numpy as np
+
+from analysis.analyzer import RiskAnalyzer
+from analysis.frame import Frame
+from analysis.rules import SEVERITY_CODE
+from analysis.sensors import SENSOR_IDS, SENSOR_META
+from observability import logs
+
+log = logs.get('tlog')
+
+# Segmented append-only log of analyzed frames.
+#
+#   segment file: seg-<seq:08d>.dtl = header (HEADER_SIZE bytes) + fixed-size records
+#   header:       b'DTKLOG' version:u16 record_size:u32 n_cols:u16 ids:utf8 (comma separated, NUL padded)
+#   record:       RECORD_DTYPE below; value NaN = sensor not in the frame, flags stored as 0/1
+#
+# Records are fixed size so a reader can np.memmap a segment and slice it without copying.
+MAGIC = b'DTKLOG'
+VERSION = 1
+HEADER_SIZE = 512
+SUFFIX = '.dtl'
+N_COLS = len(SENSOR_IDS)
+RECORD_DTYPE = np.dtype([
+    ('ts', '<f8'),
+    ('unit', 'S64'),
+    ('values', '<f8', (N_COLS,)),
+    ('severity', 'i1', (N_COLS,)),
+    ('reserved', 'u1'),
+])
+_HEAD = struct.Struct('<6sHIH')
+_COL = { sid: j for j, sid in enumerate(SENSOR_IDS) }
+_FLAG_IDS = frozenset(('fuel_leak', 'overheat', 'emergency_stop'))
+
+
+def _header(ids=SENSOR_IDS) -> bytes:
+    head = _HEAD.pack(MAGIC, VERSION, RECORD_DTYPE.itemsize, len(ids)) + ','.join(ids).encode('utf-8')
+    if len(head) > HEADER_SIZE:
+        raise ValueError('sensor layout does not fit the segment header')
+    return head.ljust(HEADER_SIZE, b'\0')
+
+
+def read_header(path: str) -> Optional[List[str]]:
+    """
+    Column ids of a segment; None while the header is incomplete (a segment
+    just created, or left empty by a crash). Raises ValueError for foreign or
+    incompatible files.
+    """
+    with open(path, 'rb') as f:
+        raw = f.read(HEADER_SIZE)
+    if len(raw) < HEADER_SIZE:
+        return None
+    magic, version, rec_size, n = _HEAD.unpack_from(raw)
+    if magic != MAGIC or version != VERSION or rec_size != RECORD_DTYPE.itemsize:
+        raise ValueError(f'{path}: not a v{VERSION} telemetry segment')
+    ids = raw[_HEAD.size:].rstrip(b'\0').decode('utf-8').split(',')
+    if len(ids) != n:
+        raise ValueError(f'{path}: corrupt column list')
+    return ids
+
+
+def unit_bytes(unit_id: str) -> bytes:
+    """unit_id as stored in a record: at most 64 bytes of UTF-8, cut on a character boundary."""
+    return unit_id.encode('utf-8')[:64].decode('utf-8', 'ignore').encode('utf-8')
+
+
+def unit_name(raw: bytes) -> str:
+    # 'ignore': segments written before unit_bytes() may end mid-character
+    return raw.decode('utf-8', 'ignore')
+
+
+def pack_records(items: List[Tuple[str, float, Union[Frame, List[Dict[str, Any]]]]]) -> np.ndarray:
+    """(unit_id, ts, analyzed sensors or Frame) -> structured records."""
+    rec = np.zeros(len(items), dtype=RECORD_DTYPE)
+    values = np.full((len(items), N_COLS), np.nan)
+    severity = np.zeros((len(items), N_COLS), dtype=np.int8)
+    for i, (unit_id, ts, sensors) in enumerate(items):
+        if isinstance(sensors, Frame):
+            values[i], severity[i] = sensors.columns()
+            continue
+        row = values[i]
+        sev = severity[i]
+        for s in sensors:
+            j = _COL.get(s.get('id'))
+            if j is None:
+                continue
+            v = s.get('value')
+            if isinstance(v, (int, float)):
+                row[j] = v
+            sev[j] = SEVERITY_CODE.get(s.get('severity'), 0)
+    rec['ts'] = [it[1] for it in items]
+    rec['unit'] = [unit_bytes(it[0]) for it in items]
+    rec['values'] = values
+    rec['severity'] = severity
+    return rec
+
+
+def record_sensors(values: np.ndarray) -> List[Dict[str, Any]]:
+    """One record's values -> sensors list as ingest would receive it (no analysis fields)."""
+    out = []
+    for sid, v in zip(SENSOR_IDS, values.tolist()):
+        if v != v:
+            continue
+        if sid in _FLAG_IDS:
+            v = bool(v)
+        elif sid == 'ecu_errors':
+            v = int(v)
+        out.append({ **SENSOR_META[sid], 'value': v })
+    return out
+
+
+class TelemetryLog:
+    """
+    Background writer of the segmented log. append() only queues the frame (bounded,
+    oldest dropped when full); a writer thread packs queued frames into records,
+    writes them in one call, fsyncs at most every fsync_interval seconds, rotates at
+    segment_bytes and deletes the oldest segments beyond retention_bytes.
+    """
+
+    def __init__(self, directory: str, segment_bytes: int = 64 << 20, retention_bytes: int = 1 << 30,
+                 fsync_interval: float = 1.0, max_queue: int = 10000):
+        self.directory = directory
+        self.segment_bytes = max(HEADER_SIZE + RECORD_DTYPE.itemsize, segment_bytes)
+        self.retention_bytes = retention_bytes
+        self.fsync_interval = fsync_interval
+        self._queue: deque = deque(maxlen=max(1, max_queue))
+        self._cond = threading.Condition()
+        self._io_lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+        self._stop = False
+        self._file = None
+        self._size = 0
+        self._last_sync = 0.0
+        self._dirty = False
+        self.enqueued = 0
+        self.written = 0
+        self.dropped = 0
+        self.fsyncs = 0
+        self.segments_rotated = 0
+        self.segments_deleted = 0
+        self.errors = 0
+
+    # -- request side ---------------------------------------------------------
+
+    def append(self, unit_id: str, ts: float, sensors: Union[Frame, List[Dict[str, Any]]]) -> None:
+        with self._cond:
+            if len(self._queue) == self._queue.maxlen:
+                self.dropped += 1
+            self._queue.append((unit_id, ts, sensors))
+            self.enqueued += 1
+            self._cond.notify()
+
+    def depth(self) -> int:
+        return len(self._queue)
+
+    # -- lifecycle ------------------------------------------------------------
+
+    def start(self) -> 'TelemetryLog':
+        if self._thread is None:
+            os.makedirs(self.directory, exist_ok=True)
+            self._stop = False
+            self._thread = threading.Thread(target=self._run, name='telemetry-log', daemon=True)
+            self._thread.start()
+        return self
+
+    def close(self) -> None:
+        """Drain the queue, fsync and close the current segment."""
+        with self._cond:
+            self._stop = True
+            self._cond.notify_all()
+        if self._thread is not None:
+            self._thread.join(timeout=10)
+            self._thread = None
+
+    def flush(self, timeout: float = 5.0) -> bool:
+        """Wait until everything queued so far is written and synced."""
+        target = self.enqueued
+        deadline = time.monotonic() + timeout
+        while self.written + self.dropped < target and time.monotonic() < deadline:
+            time.sleep(0.005)
+        with self._io_lock:
+            self._sync(force=True)
+        return self.written + self.dropped >= target
+
+    # -- writer thread --------------------------------------------------------
+
+    def _segments(self) -> List[str]:
+        return sorted(n for n in os.listdir(self.directory) if n.startswith('seg-') and n.endswith(SUFFIX))
+
+    def _open_next(self) -> None:
+        names = self._segments()
+        seq = int(names[-1][4:-len(SUFFIX)]) + 1 if names else 0
+        path = os.path.join(self.directory, f'seg-{seq:08d}{SUFFIX}')
+        self._file = open(path, 'ab')
+        self._file.write(_header())
+        self._file.flush()  # readers see a whole header, not an empty file, until the next fsync
+        self._size = HEADER_SIZE
+        self._dirty = True
+
+    def _sync(self, force: bool = False) -> None:
+        if self._file is None or not self._dirty:
+            return
+        now = time.monotonic()
+        if force or now - self._last_sync >= self.fsync_interval:
+            self._file.flush()
+            os.fsync(self._file.fileno())
+            self._last_sync = now
+            self._dirty = False
+            self.fsyncs += 1
+
+    def _rotate(self) -> None:
+        self._sync(force=True)
+        self._file.close()
+        self._file = None
+        self.segments_rotated += 1
+        self._enforce_retention()
+
+    def _enforce_retention(self) -> None:
+        if self.retention_bytes <= 0:
+            return
+        paths = [os.path.join(self.directory, n) for n in self._segments()]
+        sizes = [os.path.getsize(p) for p in paths]
+        total = sum(sizes)
+        # never delete the newest segment
+        for p, size in zip(paths[:-1], sizes[:-1]):
+            if total <= self.retention_bytes:
+                break
+            os.remove(p)
+            total -= size
+            self.segments_deleted += 1
+
+    def _write(self, batch: List[Tuple[str, float, List[Dict[str, Any]]]]) -> None:
+        rec = pack_records(batch)
+        i = 0
+        while i < len(rec):
+            if self._file is None:
+                self._open_next()
+            room = max(1, (self.segment_bytes - self._size) // RECORD_DTYPE.itemsize)
+            chunk = rec[i:i + room]
+            self._file.write(chunk.tobytes())
+            self._size += chunk.nbytes
+            self._dirty = True
+            i += len(chunk)
+            if self._size >= self.segment_bytes:
+                self._rotate()
+        self.written += len(rec)
+
+    def _run(self) -> None:
+        cond = self._cond
+        while True:
+            with cond:
+                if not self._queue and not self._stop:
+                    # wake up in time for a pending fsync even when no new frames arrive
+                    cond.wait(self.fsync_interval if self._dirty else None)
+                batch = list(self._queue)
+                self._queue.clear()
+                stop = self._stop
+            # disk work happens outside the queue lock so append() never waits on I/O
+            with self._io_lock:
+                try:
+                    if batch:
+                        self._write(batch)
+                    self._sync(force=stop)
+                except OSError as e:
+                    self.errors += 1
+                    logs.sampled(log, logging.ERROR, 'tlog-write', '[PY-TLOG] write failed: %s', e)
+                if stop and not self._queue:
+                    if self._file is not None:
+                        self._file.close()
+                        self._file = None
+                    return
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            'queued': len(self._queue),
+            'written': self.written,
+            'dropped': self.dropped,
+            'fsyncs': self.fsyncs,
+            'segments_rotated': self.segments_rotated,
+            'segments_deleted': self.segments_deleted,
+            'errors': self.errors,
+        }
+
+
+class LogReader:
+    """
+    Reads segments through np.memmap. scan() yields record arrays per segment; for
+    time-ordered segments a [t0, t1] range is a slice of the map (no copy).
+    """
+
+    def __init__(self, directory: str):
+        self.directory = directory
+
+    def segments(self) -> List[str]:
+        if not os.path.isdir(self.directory):
+            return []
+        names = sorted(n for n in os.listdir(self.directory) if n.startswith('seg-') and n.endswith(SUFFIX))
+        return [os.path.join(self.directory, n) for n in names]
+
+    def open(self, path: str) -> np.ndarray:
+        ids = read_header(path)
+        if ids is None:
+            return np.zeros(0, dtype=RECORD_DTYPE)
+        if tuple(ids) != SENSOR_IDS:
+            raise ValueError(f'{path}: written with a different sensor layout')
+        n = (os.path.getsize(path) - HEADER_SIZE) // RECORD_DTYPE.itemsize
+        if n <= 0:
+            return np.zeros(0, dtype=RECORD_DTYPE)
+        # a torn tail record (crash mid-write) is ignored
+        return np.memmap(path, dtype=RECORD_DTYPE, mode='r', offset=HEADER_SIZE, shape=(n,))
+
+    def scan(self, t0: float = -np.inf, t1: float = np.inf, unit_id: Optional[str] = None) -> Iterator[np.ndarray]:
+        unit = unit_bytes(unit_id) if unit_id is not None else None
+        for path in self.segments():
+            rec = self.open(path)
+            if not len(rec):
+                continue
+            ts = rec['ts']
+            if np.all(ts[1:] >= ts[:-1]):
+                if ts[0] > t1 or ts[-1] < t0:
+                    continue
+                part = rec[np.searchsorted(ts, t0, 'left'):np.searchsorted(ts, t1, 'right')]
+            else:
+                part = rec[(ts >= t0) & (ts <= t1)]
+            if unit is not None and len(part):
+                part = part[part['unit'] == unit]
+            if len(part):
+                yield part
+
+    def frames(self, t0: float = -np.inf, t1: float = np.inf, unit_id: Optional[str] = None
+               ) -> Iterator[Tuple[str, float, List[Dict[str, Any]]]]:
+        """(unit_id, ts, sensors) in log order."""
+        for part in self.scan(t0, t1, unit_id):
+            units = part['unit']
+            tss = part['ts']
+            vals = part['values']
+            for i in range(len(part)):
+                yield unit_name(units[i]), float(tss[i]), record_sensors(vals[i])
+
+    def replay(self, t0: float = -np.inf, t1: float = np.inf, unit_id: Optional[str] = None,
+               factory=None) -> Iterator[Tuple[str, float, List[Dict[str, Any]]]]:
+        """
+        Re-analyze logged frames with a fresh analyzer per unit (RiskAnalyzer by default),
+        in log order; yields (unit_id, ts, analyzed).
+        """
+        factory = factory or RiskAnalyzer
+        analyzers: Dict[str, Any] = {}
+        for uid, ts, sensors in self.frames(t0, t1, unit_id):
+            a = analyzers.get(uid)
+            if a is None:
+                a = analyzers[uid] = factory()
+            yield uid, ts, a.analyze_frame(sensors)
@@ -0,0 +1,149 @@
+import math
+from typing import Any, Dict, Iterable, Optional, Tuple, Union
+
+try:
+    import numpy as np
+except Exception:  # optional: without numpy there is no /history (HISTORY_CAPACITY is ignored)
+    np = None
+
+from analysis.frame import Frame
+from analysis.rules import SEVERITY_CODE
+from analysis.sensors import SENSOR_IDS
+
+_COL = { sid: j for j, sid in enumerate(SENSOR_IDS) }
+_N = len(SENSOR_IDS)
+
+
+class UnitHistory:
+    """
+    Fixed-size ring of the last `capacity` analyzed frames of one unit, one column per
+    sensor id in SENSOR_IDS order. Arrays are preallocated: appending a frame writes
+    one row in place (NaN for sensors the frame did not carry, flags stored as 0/1).
+
+    Rows keep the frame's own (client) timestamp, which /history queries by. Backfill
+    and wire packets can arrive out of order, so the ring holds the last `capacity`
+    frames received, and readers sort by ts: window() and span() never assume the
+    arrival order is the time order.
+    """
+    __slots__ = ('capacity', 'ts', 'values', 'severity', 'head', 'count')
+
+    def __init__(self, capacity: int = 3600):
+        self.capacity = max(1, capacity)
+        self.ts = np.zeros(self.capacity, dtype=np.float64)
+        self.values = np.full((self.capacity, len(SENSOR_IDS)), np.nan, dtype=np.float64)
+        self.severity = np.zeros((self.capacity, len(SENSOR_IDS)), dtype=np.int8)
+        self.head = 0    # next row to write
+        self.count = 0
+
+    @property
+    def nbytes(self) -> int:
+        return self.ts.nbytes + self.values.nbytes + self.severity.nbytes
+
+    def append(self, ts: float, sensors: Union[Frame, Iterable[Dict[str, Any]]]) -> None:
+        if isinstance(sensors, Frame):
+            vals, sev = sensors.columns()
+        else:
+            vals = [math.nan] * _N
+            sev = [0] * _N
+            for s in sensors:
+                j = _COL.get(s.get('id'))
+                if j is None:
+                    continue
+                v = s.get('value')
+                if isinstance(v, (int, float)):
+                    vals[j] = v
+                sev[j] = SEVERITY_CODE.get(s.get('severity'), 0)
+        row = self.head
+        # one slice assignment per array instead of a numpy scalar write per sensor
+        self.values[row] = vals
+        self.severity[row] = sev
+        self.ts[row] = ts
+        self.head = row + 1 if row + 1 < self.capacity else 0
+        if self.count < self.capacity:
+            self.count += 1
+
+    def _order(self) -> 'np.ndarray':
+        """Row indices oldest -> newest."""
+        start = (self.head - self.count) % self.capacity
+        return (np.arange(self.count) + start) % self.capacity
+
+    def window(self, sensor_id: str, t0: float = -math.inf, t1: float = math.inf
+               ) -> Tuple['np.ndarray', 'np.ndarray', 'np.ndarray']:
+        """(ts, values, severity codes) of one sensor with t0 <= ts <= t1, sorted by ts."""
+        j = _COL.get(sensor_id)
+        if j is None or not self.count:
+            empty = np.empty(0)
+            return empty, empty, np.empty(0, dtype=np.int8)
+        rows = self._order()
+        ts = self.ts[rows]
+        v = self.values[rows, j]
+        keep = (ts >= t0) & (ts <= t1) & ~np.isnan(v)
+        rows, ts, v = rows[keep], ts[keep], v[keep]
+        if len(ts) > 1 and (ts[1:] < ts[:-1]).any():
+            # late frames: stable sort, so equal timestamps keep their arrival order
+            by_ts = np.argsort(ts, kind='stable')
+            rows, ts, v = rows[by_ts], ts[by_ts], v[by_ts]
+        return ts, v, self.severity[rows, j]
+
+    def sensors(self) -> Tuple[str, ...]:
+        """Sensor ids with at least one stored sample."""
+        if not self.count:
+            return ()
+        # rows not written yet are still NaN
+        seen = ~np.isnan(self.values).all(axis=0)
+        return tuple(sid for sid, ok in zip(SENSOR_IDS, seen) if ok)
+
+    def span(self) -> Optional[Tuple[float, float]]:
+        if not self.count:
+            return None
+        # rows are filled from 0 and only wrap once the ring is full
+        ts = self.ts[:self.count]
+        return float(ts.min()), float(ts.max())
+
+
+def bucket_stats(ts: 'np.ndarray', v: 'np.ndarray', sev: 'np.ndarray', n_buckets: int,
+                 t0: Optional[float] = None, t1: Optional[float] = None) -> Dict[str, 'np.ndarray']:
+    """
+    Equal-width time buckets over [t0, t1]: first timestamp, min, max, mean, count and
+    worst severity of each non-empty bucket. ts must be sorted.
+    """
+    if not len(ts):
+        return { k: np.empty(0) for k in ('t', 'min', 'max', 'mean', 'count', 'severity') }
+    t0 = ts[0] if t0 is None else t0
+    t1 = ts[-1] if t1 is None else t1
+    width = (t1 - t0) / n_buckets if t1 > t0 else 1.0
+    idx = np.minimum(((ts - t0) / width).astype(np.int64), n_buckets - 1)
+    starts = np.flatnonzero(np.r_[True, idx[1:] != idx[:-1]])
+    counts = np.diff(np.r_[starts, len(ts)])
+    return {
+        't': ts[starts],
+        'min': np.minimum.reduceat(v, starts),
+        'max': np.maximum.reduceat(v, starts),
+        'mean': np.add.reduceat(v, starts) / counts,
+        'count': counts,
+        'severity': np.maximum.reduceat(sev, starts),
+    }
+
+
+def lttb(ts: 'np.ndarray', v: 'np.ndarray', n_out: int) -> 'np.ndarray':
+    """
+    Largest-Triangle-Three-Buckets: indices of n_out samples that keep the visual
+    shape of the series. First and last samples are always kept.
+    """
+    n = len(ts)
+    if n_out >= n or n_out < 3:
+        return np.arange(n)
+    out = np.empty(n_out, dtype=np.int64)
+    out[0], out[-1] = 0, n - 1
+    edges = np.linspace(1, n - 1, n_out - 1).astype(np.int64)
+    a = 0
+    for i in range(n_out - 2):
+        lo, hi = edges[i], max(edges[i + 1], edges[i] + 1)
+        nlo, nhi = hi, edges[i + 2] if i + 2 < len(edges) else n
+        nhi = max(nhi, nlo + 1)
+        cx, cy = ts[nlo:nhi].mean(), v[nlo:nhi].mean()
+        ax, ay = ts[a], v[a]
+        area = np.abs((ax - cx) * (v[lo:hi] - ay) - (ax - ts[lo:hi]) * (cy - ay))
+        a = lo + int(np.argmax(area))
+        out[i + 1] = a
+    return out
@@ -0,0 +1,303 @@
+"""
+Load generator for ai_analyzer.py: drives /ingest, /telemetry, /analyze and
+/simulate with RuleSimulator frames across N virtual units and reports
+throughput and latency percentiles as JSON.
+
+Closed loop by default (each of --concurrency workers sends its next request as
+soon as the previous one returns). With --rate the workers follow a fixed
+schedule instead and latency is measured from the scheduled send time, so a
+stalled server shows up in the percentiles rather than as a lower send rate.
+
+    # spawn the service with a local stub Nest as forward target
+    python ai-service/tools/loadgen.py --spawn --endpoint ingest --units 8 --concurrency 8 --seconds 10
+    # the asyncio serving mode (ai_asgi.py), here as 4 worker processes behind the affinity router
+    python ai-service/tools/loadgen.py --spawn --server asgi --workers 4 --endpoint mix --units 16 --concurrency 16
+    # against an already running service, paced, compared to an earlier run
+    python ai-service/tools/loadgen.py --url http://localhost:5000 --rate 200 --out run.json --baseline prev.json
+"""
+import argparse
+import json
+import math
+import os
+import socket
+import subprocess
+import sys
+import threading
+import time
+from typing import Any, Dict, List, Optional
+
+import requests
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+from simulation.simulator import RuleSimulator
+from tools.stub_nest import StubNestServer
+
+ENDPOINTS = ('ingest', 'telemetry', 'analyze', 'simulate')
+# upper bucket edges, ms; the last bucket is open-ended
+HIST_EDGES_MS = (0.25, 0.5, 1, 2, 5, 10, 20, 50, 100, 200, 500, 1000, 2000)
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..'))
+
+
+class Recorder:
+    """Latencies and status codes of one endpoint; one per worker, merged at the end."""
+
+    def __init__(self):
+        self.latencies: List[float] = []
+        self.status: Dict[str, int] = {}
+        self.errors = 0
+
+    def add(self, latency: float, status: Optional[int]) -> None:
+        self.latencies.append(latency)
+        key = str(status) if status is not None else 'error'
+        self.status[key] = self.status.get(key, 0) + 1
+        if status is None or status >= 400:
+            self.errors += 1
+
+    def merge(self, other: 'Recorder') -> None:
+        self.latencies.extend(other.latencies)
+        for k, v in other.status.items():
+            self.status[k] = self.status.get(k, 0) + v
+        self.errors += other.errors
+
+
+def percentile(sorted_values: List[float], q: float) -> float:
+    if not sorted_values:
+        return 0.0
+    k = max(0, min(len(sorted_values) - 1, math.ceil(q / 100.0 * len(sorted_values)) - 1))
+    return sorted_values[k]
+
+
+def summarize(rec: Recorder, elapsed: float) -> Dict[str, Any]:
+    lat = sorted(x * 1000.0 for x in rec.latencies)
+    hist = [0] * (len(HIST_EDGES_MS) + 1)
+    i = 0
+    for x in lat:
+        while i < len(HIST_EDGES_MS) and x > HIST_EDGES_MS[i]:
+            i += 1
+        hist[i] += 1
+    labels = [f'<={e}' for e in HIST_EDGES_MS] + [f'>{HIST_EDGES_MS[-1]}']
+    return {
+        'requests': len(lat),
+        'errors': rec.errors,
+        'status': rec.status,
+        'throughput_rps': round(len(lat) / elapsed, 1) if elapsed > 0 else 0.0,
+        'latency_ms': {
+            'p50': round(percentile(lat, 50), 3),
+            'p95': round(percentile(lat, 95), 3),
+            'p99': round(percentile(lat, 99), 3),
+            'max': round(lat[-1], 3) if lat else 0.0,
+            'mean': round(sum(lat) / len(lat), 3) if lat else 0.0,
+        },
+        'histogram_ms': { label: n for label, n in zip(labels, hist) if n },
+    }
+
+
+def frame_pool(n_units: int, per_unit: int, seed: int) -> Dict[str, List[List[Dict[str, Any]]]]:
+    """Pre-generated frames per unit so generation cost stays out of the measurement."""
+    pool = {}
+    for u in range(n_units):
+        sim = RuleSimulator(seed=seed + u)
+        pool[f'unit-{u}'] = [sim.step() for _ in range(per_unit)]
+    return pool
+
+
+def make_request(endpoint: str, base: str, unit_id: str, frame: List[Dict[str, Any]], i: int):
+    """(method, url, json body) for one request of the given endpoint."""
+    if endpoint in ('ingest', 'telemetry'):
+        return 'POST', f'{base}/{endpoint}', { 'unit_id': unit_id, 'sensors': frame }
+    if endpoint == 'analyze':
+        s = frame[i % len(frame)]
+        body = { k: s[k] for k in ('id', 'value', 'min', 'max') if k in s }
+        body['unit_id'] = unit_id
+        return 'POST', f'{base}/analyze', body
+    return 'GET', f'{base}/simulate?unit_id={unit_id}', None
+
+
+def worker(wid: int, args, base: str, endpoints: List[str], pool, recorders: Dict[str, Recorder],
+           start: threading.Barrier, t_start: List[float]) -> None:
+    session = requests.Session()
+    units = list(pool)
+    # each worker owns a fixed slice of units so one unit's frames arrive in order
+    mine = units[wid::args.concurrency] or [units[wid % len(units)]]
+    interval = args.concurrency / args.rate if args.rate else 0.0
+    start.wait()
+    t0 = t_start[0]
+    deadline = t0 + args.seconds
+    i = 0
+    while True:
+        scheduled = t0 + i * interval + wid * interval / args.concurrency if interval else time.perf_counter()
+        if scheduled >= deadline:
+            break
+        if interval:
+            delay = scheduled - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+        unit_id = mine[i % len(mine)]
+        frames = pool[unit_id]
+        endpoint = endpoints[i % len(endpoints)]
+        method, url, body = make_request(endpoint, base, unit_id, frames[(i // len(mine)) % len(frames)], i)
+        try:
+            resp = session.request(method, url, json=body, timeout=args.timeout)
+            status: Optional[int] = resp.status_code
+        except requests.RequestException:
+            status = None
+        recorders[endpoint].add(time.perf_counter() - scheduled, status)
+        i += 1
+
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def spawn_service(nest_url: str, port: int, extra_env: Dict[str, str], server: str = 'flask',
+                  workers: int = 1) -> subprocess.Popen:
+    """ai_analyzer.py (Flask) or ai_asgi.py with `workers` processes; returns once /forwarder answers."""
+    env = { **os.environ, 'NEST_INGEST_URL': nest_url, 'AI_PORT': str(port), 'SIM_TICK_HZ': '0', **extra_env }
+    script = 'ai_asgi.py' if server == 'asgi' else 'ai_analyzer.py'
+    cmd = [sys.executable, os.path.join(ROOT, script)] + (['--workers', str(workers)] if server == 'asgi' else [])
+    proc = subprocess.Popen(cmd, cwd=ROOT, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    base = f'http://127.0.0.1:{port}'
+    deadline = time.time() + 30
+    while time.time() < deadline:
+        if proc.poll() is not None:
+            raise RuntimeError(f'{script} exited during startup')
+        try:
+            requests.get(f'{base}/forwarder', timeout=0.5)
+            return proc
+        except requests.RequestException:
+            time.sleep(0.1)
+    proc.kill()
+    raise RuntimeError(f'{script} did not come up')
+
+
+def git_rev() -> Optional[str]:
+    try:
+        out = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=ROOT, capture_output=True, text=True, timeout=5)
+        return out.stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        return None
+
+
+def compare(result: Dict[str, Any], baseline: Dict[str, Any]) -> Dict[str, Any]:
+    """Relative change per endpoint vs an earlier run: throughput and p50/p99 latency."""
+    out = {}
+    for ep, cur in result['endpoints'].items():
+        prev = baseline.get('endpoints', {}).get(ep)
+        if not prev:
+            continue
+        row = {}
+        for path, key in (('throughput_rps', None), ('latency_ms', 'p50'), ('latency_ms', 'p99')):
+            a = prev[path][key] if key else prev[path]
+            b = cur[path][key] if key else cur[path]
+            row[key or path] = round((b - a) / a * 100.0, 1) if a else None
+        out[ep] = row
+    return out
+
+
+def run(args, base: str, endpoints: List[str], pool):
+    recorders_per_worker = [{ ep: Recorder() for ep in endpoints } for _ in range(args.concurrency)]
+    t_start = [0.0]
+    start = threading.Barrier(args.concurrency + 1)
+    threads = [
+        threading.Thread(target=worker, args=(w, args, base, endpoints, pool, recorders_per_worker[w], start, t_start),
+                         daemon=True)
+        for w in range(args.concurrency)
+    ]
+    for t in threads:
+        t.start()
+    t_start[0] = time.perf_counter()
+    start.wait()
+    for t in threads:
+        t.join()
+    elapsed = time.perf_counter() - t_start[0]
+    merged = { ep: Recorder() for ep in endpoints }
+    for recs in recorders_per_worker:
+        for ep, rec in recs.items():
+            merged[ep].merge(rec)
+    return merged, elapsed
+
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument('--url', default='http://localhost:5000', help='service base URL (ignored with --spawn)')
+    ap.add_argument('--spawn', action='store_true', help='start ai_analyzer.py and a stub Nest locally')
+    ap.add_argument('--server', choices=('flask', 'asgi'), default='flask', help='what --spawn starts')
+    ap.add_argument('--workers', type=int, default=1, help='ai_asgi.py worker processes (--spawn --server asgi)')
+    ap.add_argument('--endpoint', default='ingest', help=f'one of {", ".join(ENDPOINTS)}, comma list, or "mix"')
+    ap.add_argument('--units', type=int, default=4, help='virtual gensets (unit_id)')
+    ap.add_argument('--concurrency', type=int, default=4, help='workers, each with a keep-alive session')
+    ap.add_argument('--rate', type=float, default=0.0, help='target requests/s in total; 0 = closed loop')
+    ap.add_argument('--seconds', type=float, default=10.0)
+    ap.add_argument('--warmup', type=float, default=1.0, help='seconds of load before measuring')
+    ap.add_argument('--timeout', type=float, default=5.0)
+    ap.add_argument('--seed', type=int, default=1)
+    ap.add_argument('--nest-delay-ms', type=float, default=0.0, help='stub Nest time per POST (--spawn)')
+    ap.add_argument('--env', action='append', default=[], help='KEY=VALUE for the spawned service (repeatable)')
+    ap.add_argument('--out', help='write the JSON report here as well as to stdout')
+    ap.add_argument('--baseline', help='earlier JSON report to compare against')
+    args = ap.parse_args()
+
+    endpoints = list(ENDPOINTS) if args.endpoint == 'mix' else args.endpoint.split(',')
+    for ep in endpoints:
+        if ep not in ENDPOINTS:
+            ap.error(f'unknown endpoint {ep}')
+    args.concurrency = max(1, args.concurrency)
+    pool = frame_pool(max(1, args.units), 256, args.seed)
+
+    stub = proc = None
+    base = args.url.rstrip('/')
+    if args.spawn:
+        stub = StubNestServer(0, args.nest_delay_ms).start()
+        port = free_port()
+        proc = spawn_service(stub.url, port, dict(kv.split('=', 1) for kv in args.env), args.server, args.workers)
+        base = f'http://127.0.0.1:{port}'
+
+    try:
+        if args.warmup > 0:
+            warm = argparse.Namespace(**{ **vars(args), 'seconds': args.warmup })
+            run(warm, base, endpoints, pool)
+        nest_before = stub.stats.snapshot() if stub else None
+        recorders, elapsed = run(args, base, endpoints, pool)
+        time.sleep(0.2)  # let the forwarder flush its last batch
+        nest_after = stub.stats.snapshot() if stub else None
+    finally:
+        if proc is not None:
+            proc.terminate()
+            try:
+                proc.wait(5)
+            except subprocess.TimeoutExpired:
+                proc.kill()
+        if stub is not None:
+            stub.stop()
+
+    result: Dict[str, Any] = {
+        'rev': git_rev(),
+        'time': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'config': {
+            'endpoints': endpoints, 'units': args.units, 'concurrency': args.concurrency,
+            'rate': args.rate or None, 'mode': 'paced' if args.rate else 'closed-loop',
+            'seconds': args.seconds, 'spawned': args.spawn,
+            'server': f'{args.server} x{args.workers}' if args.spawn else None,
+        },
+        'elapsed_s': round(elapsed, 3),
+        'endpoints': { ep: summarize(recorders[ep], elapsed) for ep in endpoints },
+    }
+    if nest_before is not None:
+        result['nest'] = { k: nest_after[k] - nest_before[k] for k in nest_after }
+    if args.baseline:
+        with open(args.baseline, encoding='utf-8') as f:
+            result['vs_baseline_pct'] = compare(result, json.load(f))
+
+    text = json.dumps(result, indent=2, ensure_ascii=False)
+    if args.out:
+        with open(args.out, 'w', encoding='utf-8') as f:
+            f.write(text + '\n')
+    print(text)
+
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,294 @@
+"""
+Offline re-scoring of recorded telemetry with the current RiskAnalyzer rules.
+
+Input files are streamed in chunks and partitioned by unit_id across a process
+pool: every frame of a unit goes to the same worker, in file order, and each worker
+keeps one RiskAnalyzer per unit, so prev_frame and the emergency latch behave as
+they did live. Workers write their own per-frame output; the parent merges the
+severity statistics into summary.json.
+
+Inputs (by extension, several files are processed in the order given):
+  .ndjson/.jsonl  { unit_id?, ts?, sensors: [...] } or flat telemetry dicts per line
+  .csv            header with unit_id?, ts?, and flat keys or sensor ids as columns
+  .dtl            telemetry log segments (TLOG_DIR); a directory means all its segments
+  .dtk/.bin       one binary wire packet (transport/wire.py) per file
+
+    python ai-service/tools/rescore.py tlog/ history.ndjson --workers 8 --out rescored/
+    python ai-service/tools/rescore.py data.csv --workers 4 --out rescored/ --per-frame full
+"""
+import argparse
+import csv
+import io
+import json
+import multiprocessing as mp
+import os
+import sys
+import time
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+from analysis.analyzer import RiskAnalyzer
+from analysis.sensors import SENSOR_IDS, SENSOR_MAPPING, SENSOR_META, to_sensors
+from analysis.units import partition, unit_key
+from transport.ndjson import body_unit
+
+CHUNK = 2000  # frames per message to a worker
+_FLAG_IDS = frozenset(('fuel_leak', 'overheat', 'emergency_stop'))
+_TRUE = frozenset(('1', 'true', 'True', 'TRUE', 'yes'))
+
+
+# -- readers (parent side): yield (unit_id, raw payload) cheaply ------------------
+
+def read_ndjson(path: str) -> Iterator[Tuple[str, Tuple[str, Any]]]:
+    with open(path, 'rb') as f:
+        for line in f:
+            if not line.strip():
+                continue
+            # only the unit_id is pulled out here; JSON parsing happens in the worker
+            yield unit_key(body_unit(line)), ('json', line)
+
+
+def read_csv(path: str) -> Iterator[Tuple[str, Tuple[str, Any]]]:
+    with open(path, newline='', encoding='utf-8') as f:
+        reader = csv.reader(f)
+        header = next(reader, None)
+        if not header:
+            return
+        header = tuple(h.strip() for h in header)
+        ui = header.index('unit_id') if 'unit_id' in header else None
+        for row in reader:
+            if not row:
+                continue
+            yield unit_key(row[ui] if ui is not None and ui < len(row) else None), ('csv', (header, row))
+
+
+def read_segment(path: str) -> Iterator[Tuple[str, Tuple[str, Any]]]:
+    from storage.telemetry_log import LogReader, unit_name
+    rec = LogReader(os.path.dirname(path)).open(path)
+    for i in range(len(rec)):
+        yield unit_name(rec['unit'][i]), ('rec', (float(rec['ts'][i]), rec['values'][i].tolist()))
+
+
+def read_wire(path: str) -> Iterator[Tuple[str, Tuple[str, Any]]]:
+    from transport import wire
+    with open(path, 'rb') as f:
+        packet = wire.decode(f.read())
+    unit = unit_key(packet.unit_id)
+    for ts, sensors in packet.frames():
+        yield unit, ('sensors', (ts, sensors))
+
+
+def expand(paths: List[str]) -> List[str]:
+    out = []
+    for p in paths:
+        if os.path.isdir(p):
+            out.extend(os.path.join(p, n) for n in sorted(os.listdir(p)) if n.endswith('.dtl'))
+        else:
+            out.append(p)
+    return out
+
+
+def read_any(path: str) -> Iterator[Tuple[str, Tuple[str, Any]]]:
+    ext = os.path.splitext(path)[1].lower()
+    if ext in ('.ndjson', '.jsonl', '.json'):
+        return read_ndjson(path)
+    if ext == '.csv':
+        return read_csv(path)
+    if ext == '.dtl':
+        return read_segment(path)
+    if ext in ('.dtk', '.bin'):
+        return read_wire(path)
+    raise ValueError(f'{path}: unknown input type')
+
+
+# -- decoding + analysis (worker side) ----------------------------------------
+
+def _csv_sensors(header: Tuple[str, ...], row: List[str]) -> Tuple[Optional[float], List[Dict[str, Any]]]:
+    ts = None
+    sensors = []
+    for key, raw in zip(header, row):
+        raw = raw.strip()
+        if key in ('ts', 'timestamp'):
+            ts = float(raw) if raw else None
+            continue
+        meta = SENSOR_MAPPING.get(key) or SENSOR_META.get(key)
+        if meta is None or raw == '':
+            continue
+        if meta['id'] in _FLAG_IDS:
+            value: Any = raw in _TRUE
+        else:
+            value = float(raw)
+        sensors.append({ **meta, 'value': value })
+    return ts, sensors
+
+
+def _rec_sensors(values: List[float]) -> List[Dict[str, Any]]:
+    out = []
+    for sid, v in zip(SENSOR_IDS, values):
+        if v != v:
+            continue
+        out.append({ **SENSOR_META[sid], 'value': bool(v) if sid in _FLAG_IDS else (int(v) if sid == 'ecu_errors' else v) })
+    return out
+
+
+def decode(kind: str, payload: Any) -> Tuple[Any, Optional[List[Dict[str, Any]]]]:
+    """(ts, sensors) of one input item; sensors is None for an unreadable item."""
+    try:
+        if kind == 'json':
+            body = json.loads(payload)
+            if not isinstance(body, dict):
+                return None, None
+            return body.get('ts', body.get('timestamp')), to_sensors(body)
+        if kind == 'csv':
+            return _csv_sensors(*payload)
+        if kind == 'rec':
+            return payload[0], _rec_sensors(payload[1])
+        return payload
+    except ValueError:
+        return None, None
+
+
+class Stats:
+    """Severity counts per sensor and per unit; mergeable across workers."""
+
+    def __init__(self):
+        self.frames = 0
+        self.errors = 0
+        self.sensors: Dict[str, Dict[str, int]] = {}
+        self.units: Dict[str, Dict[str, int]] = {}
+
+    def add(self, unit_id: str, analyzed: List[Dict[str, Any]]) -> None:
+        self.frames += 1
+        u = self.units.get(unit_id)
+        if u is None:
+            u = self.units[unit_id] = { 'frames': 0, 'warning': 0, 'critical': 0, 'emergency_frames': 0 }
+        u['frames'] += 1
+        for s in analyzed:
+            sid, sev = s.get('id'), s.get('severity', 'normal')
+            c = self.sensors.get(sid)
+            if c is None:
+                c = self.sensors[sid] = { 'normal': 0, 'warning': 0, 'critical': 0 }
+            c[sev] = c.get(sev, 0) + 1
+            if sev != 'normal':
+                u[sev] = u.get(sev, 0) + 1
+            if sid == 'emergency_stop' and s.get('value'):
+                u['emergency_frames'] += 1
+
+    def merge(self, other: Dict[str, Any]) -> None:
+        self.frames += other['frames']
+        self.errors += other['errors']
+        for sid, c in other['sensors'].items():
+            mine = self.sensors.setdefault(sid, { 'normal': 0, 'warning': 0, 'critical': 0 })
+            for k, v in c.items():
+                mine[k] = mine.get(k, 0) + v
+        for uid, c in other['units'].items():
+            mine = self.units.setdefault(uid, { 'frames': 0, 'warning': 0, 'critical': 0, 'emergency_frames': 0 })
+            for k, v in c.items():
+                mine[k] = mine.get(k, 0) + v
+
+    def to_dict(self) -> Dict[str, Any]:
+        return { 'frames': self.frames, 'errors': self.errors, 'sensors': self.sensors, 'units': self.units }
+
+
+def worker(wid: int, inbox, results, out_dir: Optional[str], per_frame: str) -> None:
+    analyzers: Dict[str, RiskAnalyzer] = {}
+    stats = Stats()
+    out = None
+    if out_dir and per_frame != 'none':
+        out = io.open(os.path.join(out_dir, f'part-{wid:03d}.ndjson'), 'w', encoding='utf-8')
+    try:
+        while True:
+            chunk = inbox.get()
+            if chunk is None:
+                break
+            for unit_id, kind, payload in chunk:
+                ts, sensors = decode(kind, payload)
+                if sensors is None:
+                    stats.errors += 1
+                    continue
+                a = analyzers.get(unit_id)
+                if a is None:
+                    a = analyzers[unit_id] = RiskAnalyzer()
+                analyzed = a.analyze_frame(sensors)
+                stats.add(unit_id, analyzed)
+                if out is not None:
+                    if per_frame == 'full':
+                        row = { 'unit_id': unit_id, 'ts': ts, 'sensors': analyzed }
+                    else:
+                        row = { 'unit_id': unit_id, 'ts': ts, 'severity': { s['id']: s['severity'] for s in analyzed } }
+                    out.write(json.dumps(row, ensure_ascii=False, separators=(',', ':')) + '\n')
+    finally:
+        if out is not None:
+            out.close()
+    results.put(stats.to_dict())
+
+
+def rescore(paths: List[str], workers: int = 0, out_dir: Optional[str] = None, per_frame: str = 'severity',
+            chunk: int = CHUNK) -> Dict[str, Any]:
+    """Run the pipeline; returns the merged summary (also written to out_dir/summary.json)."""
+    workers = workers or os.cpu_count() or 1
+    if out_dir:
+        os.makedirs(out_dir, exist_ok=True)
+    ctx = mp.get_context('spawn' if sys.platform == 'win32' else 'fork')
+    # bounded inboxes: the reader blocks instead of buffering whole files in memory
+    inboxes = [ctx.Queue(maxsize=8) for _ in range(workers)]
+    results = ctx.Queue()
+    procs = [ctx.Process(target=worker, args=(w, inboxes[w], results, out_dir, per_frame), daemon=True)
+             for w in range(workers)]
+    for p in procs:
+        p.start()
+    t0 = time.perf_counter()
+    pending: List[List[Tuple[str, str, Any]]] = [[] for _ in range(workers)]
+    files = expand(paths)
+    try:
+        for path in files:
+            for unit_id, (kind, payload) in read_any(path):
+                w = partition(unit_id, workers)
+                buf = pending[w]
+                buf.append((unit_id, kind, payload))
+                if len(buf) >= chunk:
+                    inboxes[w].put(buf)
+                    pending[w] = []
+        for w in range(workers):
+            if pending[w]:
+                inboxes[w].put(pending[w])
+            inboxes[w].put(None)
+        stats = Stats()
+        for _ in range(workers):
+            stats.merge(results.get())
+    finally:
+        for p in procs:
+            p.join(timeout=30)
+            if p.is_alive():
+                p.terminate()
+    elapsed = time.perf_counter() - t0
+    summary = {
+        'files': files,
+        'workers': workers,
+        'elapsed_s': round(elapsed, 3),
+        'frames_per_s': round(stats.frames / elapsed) if elapsed > 0 else None,
+        **stats.to_dict(),
+    }
+    if out_dir:
+        with open(os.path.join(out_dir, 'summary.json'), 'w', encoding='utf-8') as f:
+            json.dump(summary, f, ensure_ascii=False, indent=2)
+    return summary
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument('inputs', nargs='+', help='history files or telemetry log directories')
+    ap.add_argument('--workers', type=int, default=0, help='processes (default: CPU count)')
+    ap.add_argument('--out', help='directory for part-NNN.ndjson and summary.json')
+    ap.add_argument('--per-frame', choices=('severity', 'full', 'none'), default='severity',
+                    help='per-frame output: severities only, full analyzed frames, or none')
+    ap.add_argument('--chunk', type=int, default=CHUNK, help='frames per message to a worker')
+    args = ap.parse_args()
+    summary = rescore(args.inputs, args.workers, args.out, args.per_frame, args.chunk)
+    brief = { k: summary[k] for k in ('workers', 'frames', 'errors', 'elapsed_s', 'frames_per_s') }
+    brief['sensors'] = summary['sensors']
+    print(json.dumps(brief, ensure_ascii=False, indent=2))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,113 @@
+"""
+Local stand-in for Nest POST /sensors/ingest, for load tests of the Python side.
+Accepts both the single-frame body and the batched { frames: [...] } body,
+answers over keep-alive connections and counts what it received.
+
+    python ai-service/tools/stub_nest.py --port 3000 --delay-ms 5
+    curl localhost:3000/stats
+"""
+import argparse
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, Optional
+
+
+class StubStats:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.posts = 0
+        self.frames = 0
+        self.bytes = 0
+        self.connections = 0
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self.lock:
+            return { 'posts': self.posts, 'frames': self.frames, 'bytes': self.bytes, 'connections': self.connections }
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    server: 'StubNestServer'
+
+    def setup(self):
+        super().setup()
+        with self.server.stats.lock:
+            self.server.stats.connections += 1
+
+    def log_message(self, format, *args):  # keep load tests quiet
+        pass
+
+    def _reply(self, code: int, payload: Dict[str, Any]) -> None:
+        data = json.dumps(payload).encode()
+        self.send_response(code)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def do_GET(self):
+        if self.path.startswith('/stats'):
+            self._reply(200, self.server.stats.snapshot())
+        else:
+            self._reply(404, { 'ok': False })
+
+    def do_POST(self):
+        length = int(self.headers.get('Content-Length') or 0)
+        raw = self.rfile.read(length)
+        if self.server.delay:
+            time.sleep(self.server.delay)
+        try:
+            body = json.loads(raw or b'{}')
+        except ValueError:
+            self._reply(400, { 'ok': False })
+            return
+        frames = body.get('frames') if isinstance(body.get('frames'), list) else [body]
+        with self.server.stats.lock:
+            self.server.stats.posts += 1
+            self.server.stats.frames += len(frames)
+            self.server.stats.bytes += len(raw)
+        self._reply(201, { 'ok': True, 'count': len(frames) })
+
+
+class StubNestServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, port: int = 0, delay_ms: float = 0.0, host: str = '127.0.0.1'):
+        super().__init__((host, port), _Handler)
+        self.delay = delay_ms / 1000.0
+        self.stats = StubStats()
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def url(self) -> str:
+        host, port = self.server_address[:2]
+        return f'http://{host}:{port}/sensors/ingest'
+
+    def start(self) -> 'StubNestServer':
+        self._thread = threading.Thread(target=self.serve_forever, name='stub-nest', daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self.shutdown()
+        self.server_close()
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument('--port', type=int, default=3000)
+    ap.add_argument('--host', default='127.0.0.1')
+    ap.add_argument('--delay-ms', type=float, default=0.0, help='artificial processing time per POST')
+    args = ap.parse_args()
+    srv = StubNestServer(args.port, args.delay_ms, args.host)
+    print(f'[STUB-NEST] listening on {srv.url} delay={args.delay_ms}ms', flush=True)
+    try:
+        srv.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,82 @@
+"""
+Inspect and replay the telemetry log written with TLOG_DIR.
+
+    python ai-service/tools/tlog.py info   --dir ./tlog
+    python ai-service/tools/tlog.py dump   --dir ./tlog --unit g-1 --from 1760000000 --to 1760003600 > frames.ndjson
+    python ai-service/tools/tlog.py replay --dir ./tlog --unit g-1
+
+dump writes NDJSON lines { unit_id, ts, sensors } (the /ingest/stream format).
+replay re-runs the logged frames through a fresh RiskAnalyzer per unit and
+reports severities and how many sensors differ from what was logged.
+"""
+import argparse
+import json
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+from analysis.rules import SEVERITY_CODE
+from analysis.sensors import SENSOR_IDS
+from storage.telemetry_log import LogReader
+
+
+def fmt_ts(ts: float) -> str:
+    return time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(ts))
+
+
+def cmd_info(reader: LogReader, args) -> None:
+    total = 0
+    for path in reader.segments():
+        rec = reader.open(path)
+        total += len(rec)
+        span = f'{fmt_ts(rec["ts"].min())} .. {fmt_ts(rec["ts"].max())}' if len(rec) else '-'
+        units = len(np.unique(rec['unit'])) if len(rec) else 0
+        print(f'{os.path.basename(path)}  {os.path.getsize(path):>12} B  {len(rec):>9} frames  {units:>4} units  {span}')
+    print(f'total {total} frames')
+
+
+def cmd_dump(reader: LogReader, args) -> None:
+    out = sys.stdout
+    for unit_id, ts, sensors in reader.frames(args.t0, args.t1, args.unit):
+        out.write(json.dumps({ 'unit_id': unit_id, 'ts': ts, 'sensors': sensors }, ensure_ascii=False) + '\n')
+
+
+def cmd_replay(reader: LogReader, args) -> None:
+    col = { sid: j for j, sid in enumerate(SENSOR_IDS) }
+    counts = { 'normal': 0, 'warning': 0, 'critical': 0 }
+    frames = differ = 0
+    logged = (row for part in reader.scan(args.t0, args.t1, args.unit) for row in part['severity'])
+    t0 = time.perf_counter()
+    for (_, _, analyzed), sev in zip(reader.replay(args.t0, args.t1, args.unit), logged):
+        frames += 1
+        for s in analyzed:
+            counts[s['severity']] = counts.get(s['severity'], 0) + 1
+            j = col.get(s['id'])
+            if j is not None and sev[j] != SEVERITY_CODE[s['severity']]:
+                differ += 1
+    elapsed = time.perf_counter() - t0
+    print(json.dumps({
+        'frames': frames,
+        'frames_per_s': round(frames / elapsed) if elapsed else None,
+        'severities': counts,
+        'sensors_differing_from_log': differ,
+    }, indent=2))
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument('command', choices=('info', 'dump', 'replay'))
+    ap.add_argument('--dir', default=os.getenv('TLOG_DIR', 'tlog'))
+    ap.add_argument('--unit', help='only this unit_id')
+    ap.add_argument('--from', dest='t0', type=float, default=-np.inf, help='epoch seconds')
+    ap.add_argument('--to', dest='t1', type=float, default=np.inf, help='epoch seconds')
+    args = ap.parse_args()
+    reader = LogReader(args.dir)
+    { 'info': cmd_info, 'dump': cmd_dump, 'replay': cmd_replay }[args.command](reader, args)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,142 @@
+"""
+Stand-in for a Webots supervisor: steps RuleSimulator units and writes their
+frames to the service's local transport (simulation/webots_adapter.py,
+WEBOTS_ENABLED=1) — the Unix socket or the shared-memory ring — or POSTs them
+over HTTP like the supervisor script in the README, for comparison: flat JSON
+to /telemetry or the binary wire format to /ingest.
+
+Frames go round-robin over --units at --rate frames/s in total (0: as fast as
+the transport takes them), stamped with the send time. Prints a JSON summary:
+frames sent, frames/s and how long each send blocked the supervisor (for HTTP
+that is the whole round trip, analysis included). A full ring is retried
+after --poll-us; the ring has a single producer, so run one stub per ring.
+
+    python ai-service/tools/webots_stub.py --transport socket --units 4 --rate 50 --seconds 60
+    python ai-service/tools/webots_stub.py --transport shm --rate 0 --frames 100000
+    python ai-service/tools/webots_stub.py --transport http --url http://localhost:5000 --rate 10
+    # ai_asgi.py --workers N: one endpoint per worker, each unit's frames go to its owner
+    python ai-service/tools/webots_stub.py --transport socket --workers 4 --units 16
+"""
+import argparse
+import json
+import os
+import sys
+import time
+from typing import Any, Dict, List
+
+import requests
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+from analysis.units import partition, unit_key
+from simulation.webots_adapter import DEFAULT_SHM, DEFAULT_SOCKET
+from tools.loadgen import frame_pool, percentile
+from transport import local, wire
+
+TRANSPORTS = ('socket', 'shm', 'http', 'wire')
+
+
+class HttpSender:
+    """One keep-alive session; send() returns after the service answered."""
+
+    def __init__(self, base: str, binary: bool):
+        self.session = requests.Session()
+        self.binary = binary
+        self.url = f'{base.rstrip("/")}/ingest' if binary else f'{base.rstrip("/")}/telemetry'
+
+    def send(self, unit_id: str, values: Dict[str, Any], ts: float) -> bool:
+        if self.binary:
+            resp = self.session.post(self.url, data=wire.encode([values], unit_id, timestamps=[ts]),
+                                     headers={ 'Content-Type': wire.CONTENT_TYPE })
+        else:
+            resp = self.session.post(self.url, json={ 'unit_id': unit_id, **values })
+        return resp.ok  # 202 with INGEST_ADMISSION=1
+
+    def close(self) -> None:
+        self.session.close()
+
+
+def senders(args) -> List[Any]:
+    """One sender per service process (--workers), indexed like analysis.units.partition."""
+    if args.transport in ('http', 'wire'):
+        return [HttpSender(args.url, args.transport == 'wire')]
+    default = DEFAULT_SOCKET if args.transport == 'socket' else DEFAULT_SHM
+    address = args.address or default
+    names = [address] if args.workers <= 1 else [f'{address}.worker-{i}' for i in range(args.workers)]
+    if args.transport == 'socket':
+        return [local.SocketSender(n) for n in names]
+    return [local.ShmRing(n) for n in names]
+
+
+def run(args) -> Dict[str, Any]:
+    pool = { uid: [wire.flat_values(f) for f in frames]
+             for uid, frames in frame_pool(max(1, args.units), 256, args.seed).items() }
+    units = list(pool)
+    out = senders(args)
+    owner = { uid: out[partition(unit_key(uid), len(out))] for uid in units }
+    http = args.transport in ('http', 'wire')
+    interval = 1.0 / args.rate if args.rate > 0 else 0.0
+    poll = args.poll_us / 1e6
+    blocked: List[float] = []
+    full = errors = 0
+    t0 = time.perf_counter()
+    deadline = t0 + args.seconds
+    i = 0
+    while i < args.frames or not args.frames:
+        if interval:
+            delay = t0 + i * interval - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+        now = time.perf_counter()
+        if now >= deadline:
+            break
+        uid = units[i % len(units)]
+        values = pool[uid][(i // len(units)) % 256]
+        sender = owner[uid]
+        try:
+            if http:
+                ok = sender.send(uid, values, time.time())
+            else:
+                frame = local.pack(uid, values, time.time())
+                while not sender.send(frame):
+                    full += 1
+                    time.sleep(poll)
+                ok = True
+        except (OSError, requests.RequestException):
+            ok = False
+        blocked.append(time.perf_counter() - now)
+        errors += not ok
+        i += 1
+    elapsed = time.perf_counter() - t0
+    for s in out:
+        s.close()
+    lat = sorted(x * 1e6 for x in blocked)
+    return {
+        'transport': args.transport,
+        'frames': i,
+        'seconds': round(elapsed, 3),
+        'frames_per_s': round(i / elapsed, 1) if elapsed else 0.0,
+        'send_us': { 'p50': round(percentile(lat, 50), 1), 'p99': round(percentile(lat, 99), 1),
+                     'max': round(lat[-1], 1) if lat else 0.0 },
+        'ring_full': full,
+        'errors': errors,
+    }
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument('--transport', choices=TRANSPORTS, default='socket')
+    ap.add_argument('--address', help=f'socket path or ring name (default {DEFAULT_SOCKET} / {DEFAULT_SHM})')
+    ap.add_argument('--url', default='http://localhost:5000', help='service base URL (http, wire)')
+    ap.add_argument('--workers', type=int, default=1, help='service processes, one local endpoint each')
+    ap.add_argument('--units', type=int, default=4)
+    ap.add_argument('--rate', type=float, default=10.0, help='frames/s over all units; 0 = as fast as possible')
+    ap.add_argument('--seconds', type=float, default=10.0)
+    ap.add_argument('--frames', type=int, default=0, help='stop after this many frames (0: run --seconds)')
+    ap.add_argument('--poll-us', type=float, default=50.0, help='retry interval while the ring is full')
+    ap.add_argument('--seed', type=int, default=24)
+    args = ap.parse_args()
+    print(json.dumps(run(args)), flush=True)
+
+
+if __name__ == '__main__':
+    main()
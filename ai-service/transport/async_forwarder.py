@@ -0,0 +1,198 @@
+import asyncio
+import logging
+import threading
+import time
+from collections import deque
+from typing import Any, Callable, Dict, List, Optional
+
+try:
+    import httpx  # optional, only the ASGI serving mode (ai_asgi.py) needs it
+except ImportError:
+    httpx = None
+
+from analysis.units import partition
+from observability import logs
+from transport.jsonfast import dumps
+
+log = logs.get('forwarder')
+
+
+class AsyncNestForwarder:
+    """
+    NestForwarder for an asyncio server: same bounded drop-oldest queue, coalescing
+    and stats(), but drained by tasks on the event loop with one keep-alive
+    httpx.AsyncClient instead of worker threads. submit() never blocks and may be
+    called from any thread; frames submitted before start() wait in the queue.
+
+    The queue is sharded by partition(unit_id, workers), one shard per task, so
+    concurrent POSTs never reorder the frames of one unit.
+    """
+
+    def __init__(self, url: str, max_queue: int = 1000, batch_max: int = 20,
+                 batch_window: float = 0.02, workers: int = 1, timeout: float = 1.5,
+                 on_post: Optional[Callable[[float, int, bool], None]] = None):
+        if httpx is None:
+            raise RuntimeError('AsyncNestForwarder needs httpx (pip install httpx)')
+        self.url = url
+        self.on_post = on_post
+        self.batch_max = max(1, batch_max)
+        self.batch_window = max(0.0, batch_window)
+        self.workers = max(1, workers)
+        self.timeout = timeout
+        self._shards: List[deque] = [deque() for _ in range(self.workers)]
+        self._depth = 0
+        self._max_queue = max(1, max_queue)
+        self._lock = threading.Lock()
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._loop_thread: Optional[int] = None
+        self._wakes: List[asyncio.Event] = []
+        self._client = None
+        self._tasks: List[asyncio.Task] = []
+        self._running = False
+        self.enqueued = 0
+        self.dropped = 0
+        self.coalesced = 0
+        self.posts = 0
+        self.sent = 0
+        self.failed = 0
+        self.last_status: Optional[int] = None
+        self.last_latency_ms: Optional[float] = None
+
+    async def start(self) -> None:
+        if self._running:
+            return
+        self._loop = asyncio.get_running_loop()
+        self._loop_thread = threading.get_ident()
+        self._wakes = [asyncio.Event() for _ in range(self.workers)]
+        limits = httpx.Limits(max_connections=self.workers, max_keepalive_connections=self.workers)
+        self._client = httpx.AsyncClient(timeout=self.timeout, limits=limits)
+        self._running = True
+        self._tasks = [asyncio.create_task(self._run(i), name=f'nest-forwarder-{i}') for i in range(self.workers)]
+        for shard, wake in zip(self._shards, self._wakes):
+            if shard:
+                wake.set()
+
+    async def stop(self, timeout: float = 2.0) -> None:
+        """Flush what is queued (up to timeout seconds), then close the client."""
+        if not self._running:
+            return
+        self._running = False
+        for wake in self._wakes:
+            wake.set()
+        _, pending = await asyncio.wait(self._tasks, timeout=timeout)
+        for t in pending:
+            t.cancel()
+        self._tasks = []
+        await self._client.aclose()
+
+    def submit(self, unit_id: str, sensors: List[Dict[str, Any]], extra: Optional[Dict[str, Any]] = None) -> bool:
+        """
+        Queue a frame without blocking; returns False if an older frame had to be dropped.
+        extra adds fields to the frame body (delta/keyframe markers).
+        """
+        i = partition(unit_id, self.workers)
+        shard = self._shards[i]
+        with self._lock:
+            dropped = self._depth >= self._max_queue
+            if dropped:
+                # the oldest frame of this shard, or of the longest one if this shard is empty
+                (shard or max(self._shards, key=len)).popleft()
+                self._depth -= 1
+                self.dropped += 1
+            frame = { 'unit_id': unit_id, 'sensors': sensors }
+            if extra:
+                frame.update(extra)
+            shard.append(frame)
+            self._depth += 1
+            self.enqueued += 1
+        wake = self._wakes[i] if self._wakes else None
+        if wake is not None and not wake.is_set():
+            if threading.get_ident() == self._loop_thread:
+                wake.set()
+            else:
+                self._loop.call_soon_threadsafe(wake.set)
+        return not dropped
+
+    def depth(self) -> int:
+        return self._depth
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            'queue_depth': self._depth,
+            'queue_max': self._max_queue,
+            'enqueued': self.enqueued,
+            'dropped': self.dropped,
+            'coalesced': self.coalesced,
+            'posts': self.posts,
+            'sent': self.sent,
+            'failed': self.failed,
+            'last_status': self.last_status,
+            'last_latency_ms': self.last_latency_ms,
+        }
+
+    def _pop(self, shard: deque) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            if not shard:
+                return None
+            self._depth -= 1
+            return shard.popleft()
+
+    async def _take_batch(self, i: int) -> List[Dict[str, Any]]:
+        shard, wake = self._shards[i], self._wakes[i]
+        first = self._pop(shard)
+        while first is None:
+            if not self._running:
+                return []
+            wake.clear()
+            first = self._pop(shard)
+            if first is None:
+                await wake.wait()
+                first = self._pop(shard)
+        batch = [first]
+        deadline = self._loop.time() + self.batch_window
+        while len(batch) < self.batch_max:
+            item = self._pop(shard)
+            if item is not None:
+                batch.append(item)
+                continue
+            left = deadline - self._loop.time()
+            if left <= 0 or not self._running:
+                break
+            wake.clear()
+            try:
+                await asyncio.wait_for(wake.wait(), left)
+            except asyncio.TimeoutError:
+                pass
+        return batch
+
+    async def _run(self, i: int) -> None:
+        while True:
+            batch = await self._take_batch(i)
+            if not batch:
+                return
+            body = batch[0] if len(batch) == 1 else { 'frames': batch }
+            t0 = time.perf_counter()
+            try:
+                resp = await self._client.post(self.url, content=dumps(body),
+                                               headers={ 'Content-Type': 'application/json' })
+                self.last_status = resp.status_code
+                ok = resp.status_code < 400
+            except Exception:
+                ok = False
+            elapsed = time.perf_counter() - t0
+            self.last_latency_ms = round(elapsed * 1000.0, 3)
+            # counters are only touched on the loop thread here
+            self.posts += 1
+            self.coalesced += len(batch) - 1
+            if ok:
+                self.sent += len(batch)
+            else:
+                self.failed += len(batch)
+            if self.on_post is not None:
+                self.on_post(elapsed, len(batch), ok)
+            if ok:
+                logs.sampled(log, logging.INFO, 'fwd-ok', '[PY-FWD->NEST] status=%s frames=%d',
+                             self.last_status, len(batch))
+            else:
+                logs.sampled(log, logging.WARNING, 'fwd-error', '[PY-FWD->NEST] error forwarding to Nest frames=%d',
+                             len(batch))
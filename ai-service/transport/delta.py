@@ -0,0 +1,144 @@
+import threading
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+from analysis.sensors import SENSOR_META
+
+
+def deadbands(pct: float = 1.0, overrides: str = '') -> Dict[str, float]:
+    """
+    Per-sensor value deadband: pct percent of the sensor's min..max range, then
+    'id=band,id=band' overrides. Sensors without a range (flags, counters) have
+    none: any change of their value is forwarded.
+    """
+    out = {}
+    for sid, meta in SENSOR_META.items():
+        lo, hi = meta.get('min'), meta.get('max')
+        if isinstance(lo, (int, float)) and isinstance(hi, (int, float)):
+            out[sid] = (hi - lo) * pct / 100.0
+    for item in overrides.split(','):
+        sid, sep, band = item.partition('=')
+        if sep and sid.strip():
+            out[sid.strip()] = float(band)
+    return out
+
+
+class UnitDelta:
+    """What Nest last received for one unit: value and severity per sensor id."""
+    __slots__ = ('sent', 'keyframe_at', 'generation')
+
+    def __init__(self, generation: int):
+        self.sent: Dict[Any, Tuple[Any, Any]] = {}
+        self.keyframe_at = 0.0
+        self.generation = generation
+
+
+class DeltaEncoder:
+    """
+    Change-only forwarding. encode() keeps the sensors of an analyzed frame whose
+    severity changed or whose value moved more than its deadband from the value
+    last sent (so a slow drift is still sent once it adds up), and nothing at all
+    when no sensor changed. A full keyframe goes out for a unit's first frame,
+    every keyframe_every seconds, when a sensor disappears from the frame and
+    after resync(); Nest merges deltas into the last keyframe of the unit.
+
+    Every forwarded frame carries epoch (this encoder's start, in ms) and seq (one
+    counter over all units): concurrent POSTs can deliver a unit's frames out of
+    order, and Nest keeps a sensor from the newest frame that set it instead of
+    letting a late keyframe overwrite a newer delta.
+
+    The last-sent state lives on the unit (UnitState.forwarded) and is dropped
+    with it. resync() (a frame lost in the forward queue or a failed POST) makes
+    the next frame of every unit a keyframe.
+    """
+
+    def __init__(self, bands: Dict[str, float], keyframe_every: float = 10.0):
+        self.bands = bands
+        self.keyframe_every = keyframe_every
+        self.generation = 0
+        self.epoch = time.time_ns() // 1_000_000
+        self._seq = 0
+        self._lock = threading.Lock()
+        self.frames = 0
+        self.keyframes = 0
+        self.deltas = 0
+        self.suppressed = 0
+        self.sensors_in = 0
+        self.sensors_out = 0
+        self.resyncs = 0
+
+    def resync(self) -> None:
+        with self._lock:
+            self.generation += 1
+            self.resyncs += 1
+
+    def encode(self, unit, sensors: List[Dict[str, Any]], now: Optional[float] = None
+               ) -> Tuple[Optional[List[Dict[str, Any]]], Optional[Dict[str, Any]]]:
+        """
+        (sensors to forward, marks for the frame body: keyframe or delta, epoch, seq);
+        (None, None) when nothing changed.
+        """
+        now = time.monotonic() if now is None else now
+        with self._lock:
+            self.frames += 1
+            self.sensors_in += len(sensors)
+            st = unit.forwarded
+            if st is None or st.generation != self.generation or now >= st.keyframe_at:
+                return self._keyframe(unit, sensors, now), self._marks('keyframe')
+            sent, bands = st.sent, self.bands
+            out = []
+            known, seen = len(sent), 0
+            for s in sensors:
+                sid = s.get('id')
+                v, sev = s.get('value'), s.get('severity')
+                last = sent.get(sid)
+                if last is None:
+                    changed = True
+                else:
+                    seen += 1
+                    lv, lsev = last
+                    if sev != lsev:
+                        changed = True
+                    elif (isinstance(v, (int, float)) and isinstance(lv, (int, float))
+                          and type(v) is not bool and type(lv) is not bool):
+                        changed = abs(v - lv) > bands.get(sid, 0.0)
+                    else:
+                        changed = v != lv
+                if changed:
+                    sent[sid] = (v, sev)
+                    out.append(s)
+            if seen < known:
+                # a sensor the unit had is gone: only a keyframe can remove it on the Nest side
+                return self._keyframe(unit, sensors, now), self._marks('keyframe')
+            if not out:
+                self.suppressed += 1
+                return None, None
+            self.deltas += 1
+            self.sensors_out += len(out)
+            return out, self._marks('delta')
+
+    def _marks(self, kind: str) -> Dict[str, Any]:
+        # with the lock held
+        self._seq += 1
+        return { kind: True, 'epoch': self.epoch, 'seq': self._seq }
+
+    def _keyframe(self, unit, sensors: List[Dict[str, Any]], now: float) -> List[Dict[str, Any]]:
+        st = UnitDelta(self.generation)
+        st.sent = { s.get('id'): (s.get('value'), s.get('severity')) for s in sensors }
+        st.keyframe_at = now + self.keyframe_every
+        unit.forwarded = st
+        self.keyframes += 1
+        self.sensors_out += len(sensors)
+        return sensors
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            'keyframe_every_s': self.keyframe_every,
+            'frames': self.frames,
+            'keyframes': self.keyframes,
+            'deltas': self.deltas,
+            'suppressed': self.suppressed,
+            'sensors_in': self.sensors_in,
+            'sensors_out': self.sensors_out,
+            'resyncs': self.resyncs,
+        }
@@ -0,0 +1,158 @@
+import logging
+import threading
+import time
+from collections import deque
+from typing import Any, Callable, Dict, List, Optional
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from observability import logs
+
+log = logs.get('forwarder')
+
+
+class NestForwarder:
+    """
+    Long-lived forwarder of analyzed frames to Nest (POST /sensors/ingest).
+    Frames go into a bounded queue (oldest frame is dropped when full); worker
+    threads with keep-alive sessions drain it and coalesce everything that arrives
+    within batch_window seconds (up to batch_max frames) into one POST:
+    a single frame keeps the legacy { unit_id, sensors } body, several become
+    { frames: [ { unit_id, sensors }, ... ] }.
+    on_post(seconds, frames, ok) is called after every POST (metrics).
+    """
+
+    def __init__(self, url: str, max_queue: int = 1000, batch_max: int = 20,
+                 batch_window: float = 0.02, workers: int = 1, timeout: float = 1.5,
+                 on_post: Optional[Callable[[float, int, bool], None]] = None):
+        self.url = url
+        self.on_post = on_post
+        self.batch_max = max(1, batch_max)
+        self.batch_window = max(0.0, batch_window)
+        self.workers = max(1, workers)
+        self.timeout = timeout
+        self._queue: deque = deque()
+        self._max_queue = max(1, max_queue)
+        self._cond = threading.Condition()
+        self._threads: List[threading.Thread] = []
+        self._running = False
+        self.enqueued = 0
+        self.dropped = 0
+        self.coalesced = 0
+        self.posts = 0
+        self.sent = 0
+        self.failed = 0
+        self.last_status: Optional[int] = None
+        self.last_latency_ms: Optional[float] = None
+
+    def start(self) -> None:
+        with self._cond:
+            if self._running:
+                return
+            self._running = True
+            for i in range(self.workers):
+                t = threading.Thread(target=self._run, name=f'nest-forwarder-{i}', daemon=True)
+                self._threads.append(t)
+                t.start()
+
+    def stop(self, timeout: float = 2.0) -> None:
+        with self._cond:
+            self._running = False
+            self._cond.notify_all()
+        for t in self._threads:
+            t.join(timeout)
+        self._threads = []
+
+    def submit(self, unit_id: str, sensors: List[Dict[str, Any]], extra: Optional[Dict[str, Any]] = None) -> bool:
+        """
+        Queue a frame without blocking; returns False if an older frame had to be dropped.
+        extra adds fields to the frame body (delta/keyframe markers).
+        """
+        if not self._running:
+            self.start()
+        with self._cond:
+            dropped = len(self._queue) >= self._max_queue
+            if dropped:
+                self._queue.popleft()
+                self.dropped += 1
+            frame = { 'unit_id': unit_id, 'sensors': sensors }
+            if extra:
+                frame.update(extra)
+            self._queue.append(frame)
+            self.enqueued += 1
+            self._cond.notify()
+        return not dropped
+
+    def depth(self) -> int:
+        return len(self._queue)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            'queue_depth': len(self._queue),
+            'queue_max': self._max_queue,
+            'enqueued': self.enqueued,
+            'dropped': self.dropped,
+            'coalesced': self.coalesced,
+            'posts': self.posts,
+            'sent': self.sent,
+            'failed': self.failed,
+            'last_status': self.last_status,
+            'last_latency_ms': self.last_latency_ms,
+        }
+
+    def _take_batch(self) -> List[Dict[str, Any]]:
+        with self._cond:
+            while self._running and not self._queue:
+                self._cond.wait(0.5)
+            if not self._queue:
+                return []
+            batch = [self._queue.popleft()]
+            deadline = time.monotonic() + self.batch_window
+            while len(batch) < self.batch_max:
+                if self._queue:
+                    batch.append(self._queue.popleft())
+                    continue
+                left = deadline - time.monotonic()
+                if left <= 0 or not self._running:
+                    break
+                self._cond.wait(left)
+            return batch
+
+    def _run(self) -> None:
+        session = requests.Session()
+        session.mount('http://', HTTPAdapter(pool_connections=1, pool_maxsize=1))
+        try:
+            while True:
+                batch = self._take_batch()
+                if not batch:
+                    if not self._running:
+                        return
+                    continue
+                body = batch[0] if len(batch) == 1 else { 'frames': batch }
+                t0 = time.perf_counter()
+                try:
+                    resp = session.post(self.url, json=body, timeout=self.timeout)
+                    self.last_status = resp.status_code
+                    ok = resp.status_code < 400
+                except Exception:
+                    ok = False
+                elapsed = time.perf_counter() - t0
+                self.last_latency_ms = round(elapsed * 1000.0, 3)
+                with self._cond:
+                    self.posts += 1
+                    self.coalesced += len(batch) - 1
+                    if ok:
+                        self.sent += len(batch)
+                    else:
+                        self.failed += len(batch)
+                if self.on_post is not None:
+                    self.on_post(elapsed, len(batch), ok)
+                if ok:
+                    logs.sampled(log, logging.INFO, 'fwd-ok', '[PY-FWD->NEST] status=%s frames=%d',
+                                 self.last_status, len(batch))
+                else:
+                    logs.sampled(log, logging.WARNING, 'fwd-error', '[PY-FWD->NEST] error forwarding to Nest frames=%d',
+                                 len(batch))
+        finally:
+            session.close()
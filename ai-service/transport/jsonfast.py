@@ -0,0 +1,52 @@
+import json
+import math
+from typing import Any
+
+try:
+    import orjson  # optional, several times faster for large responses
+except ImportError:  # fall back to the stdlib encoder
+    orjson = None
+
+BACKEND = 'orjson' if orjson is not None else 'json'
+
+
+def _default(obj: Any) -> Any:
+    # numpy arrays and scalars (history slices) without importing numpy here
+    if hasattr(obj, 'tolist'):
+        return obj.tolist()
+    raise TypeError(f'{type(obj).__name__} is not JSON serializable')
+
+
+def _finite(obj: Any) -> Any:
+    # NaN/inf -> None, as orjson writes them (the stdlib would write bare NaN, not JSON)
+    if isinstance(obj, float):
+        return obj if math.isfinite(obj) else None
+    if isinstance(obj, dict):
+        return { k: _finite(v) for k, v in obj.items() }
+    if isinstance(obj, (list, tuple)):
+        return [_finite(v) for v in obj]
+    if hasattr(obj, 'tolist'):
+        return _finite(obj.tolist())
+    return obj
+
+
+def dumps(obj: Any) -> bytes:
+    """Compact UTF-8 JSON bytes for response bodies; numpy arrays become lists, NaN/inf null."""
+    if orjson is not None:
+        return orjson.dumps(obj, option=orjson.OPT_SERIALIZE_NUMPY)
+    try:
+        out = json.dumps(obj, ensure_ascii=False, separators=(',', ':'), default=_default, allow_nan=False)
+    except ValueError:
+        # rare: walk the object only when it has a non-finite float
+        out = json.dumps(_finite(obj), ensure_ascii=False, separators=(',', ':'), default=_default)
+    return out.encode('utf-8')
+
+
+def loads(data: bytes) -> Any:
+    """Parse JSON bytes like json.loads (ValueError on bad input), with orjson when installed."""
+    if orjson is not None:
+        try:
+            return orjson.loads(data)
+        except ValueError:
+            pass  # e.g. NaN literals, which the stdlib parser (and so the Flask server) accepts
+    return json.loads(data)
@@ -0,0 +1,305 @@
+import logging
+import math
+import os
+import socket
+import stat
+import struct
+import threading
+from multiprocessing import resource_tracker, shared_memory
+from typing import Any, Callable, Dict, List, Mapping, Optional, Tuple
+
+from analysis.sensors import SENSOR_MAPPING
+from observability import logs
+from transport.wire import BOOL_KEYS, SENSOR_KEYS
+
+log = logs.get('webots')
+
+# Fixed-size frames for a supervisor on the same host (Unix socket or shared-memory ring).
+#
+#   frame: ts:f64 unit_len:u8 unit_id:utf8[55] values:f64[len(SENSOR_KEYS)]
+#
+# values are in SENSOR_KEYS order (the SENSOR_MAPPING order, as in transport/wire.py);
+# NaN = not reported, flags are 0/1. ts is epoch seconds (0 = stamp on arrival). All
+# fields are little-endian; on the socket frames simply follow each other.
+UNIT_MAX = 55
+FRAME = struct.Struct(f'<dB{UNIT_MAX}s{len(SENSOR_KEYS)}d')
+FRAME_SIZE = FRAME.size
+
+# (metadata, is flag) per value slot
+_SLOTS = [(SENSOR_MAPPING[k], k in BOOL_KEYS) for k in SENSOR_KEYS]
+_KEY_INDEX = { k: i for i, k in enumerate(SENSOR_KEYS) }
+
+OnFrame = Callable[[str, Optional[float], List[Dict[str, Any]]], None]
+
+
+def _frame_failed(e: Exception) -> None:
+    logs.sampled(log, logging.WARNING, 'local-frame', '[PY-WEBOTS] frame handler failed: %r', e)
+
+
+def pack(unit_id: str, values: Mapping[str, Any], ts: float = 0.0) -> bytes:
+    """One frame from a flat telemetry dict (SENSOR_MAPPING keys; others are ignored)."""
+    unit = unit_id.encode('utf-8')
+    if len(unit) > UNIT_MAX:
+        raise ValueError(f'unit_id longer than {UNIT_MAX} bytes')
+    row = [math.nan] * len(SENSOR_KEYS)
+    for k, v in values.items():
+        i = _KEY_INDEX.get(k)
+        if i is not None and v is not None:
+            row[i] = float(v)
+    return FRAME.pack(ts, len(unit), unit, *row)
+
+
+def unpack(buf, offset: int = 0) -> Tuple[str, Optional[float], List[Dict[str, Any]]]:
+    """(unit_id, ts or None, sensors) of the frame at offset."""
+    row = FRAME.unpack_from(buf, offset)
+    unit = row[2][:row[1]].decode('utf-8', 'replace')
+    sensors = []
+    for (meta, flag), v in zip(_SLOTS, row[3:]):
+        if v != v:
+            continue
+        sensors.append({ **meta, 'value': bool(v) if flag else v })
+    ts = row[0]
+    return unit, ts if ts > 0 else None, sensors
+
+
+class SocketListener:
+    """
+    Unix stream socket that supervisors connect to and write frames into. Each
+    connection gets a reader thread that hands complete frames to on_frame in
+    arrival order; a partial frame waits for the rest of its bytes.
+    """
+
+    def __init__(self, path: str, on_frame: OnFrame, recv_frames: int = 256):
+        self.path = path
+        self.on_frame = on_frame
+        self.recv_frames = recv_frames
+        self._sock: Optional[socket.socket] = None
+        self._conns: List[socket.socket] = []
+        self._lock = threading.Lock()
+        self.connections = 0
+        self.frames = 0
+        self.errors = 0
+
+    def open(self) -> 'SocketListener':
+        try:
+            if stat.S_ISSOCK(os.stat(self.path).st_mode):
+                os.unlink(self.path)  # left over from a previous run
+        except FileNotFoundError:
+            pass
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        sock.bind(self.path)
+        sock.listen(16)
+        self._sock = sock
+        threading.Thread(target=self._accept, name='local-accept', daemon=True).start()
+        return self
+
+    def _accept(self) -> None:
+        while True:
+            try:
+                conn, _ = self._sock.accept()
+            except OSError:
+                return  # closed
+            with self._lock:
+                self._conns.append(conn)
+                self.connections += 1
+            threading.Thread(target=self._read, args=(conn,), name='local-reader', daemon=True).start()
+
+    def _read(self, conn: socket.socket) -> None:
+        size = FRAME_SIZE
+        buf = bytearray(size * self.recv_frames)
+        view = memoryview(buf)
+        have = 0
+        try:
+            while True:
+                n = conn.recv_into(view[have:])
+                if not n:
+                    return
+                have += n
+                end = have - have % size
+                for off in range(0, end, size):
+                    try:
+                        self.on_frame(*unpack(buf, off))
+                    except Exception as e:
+                        with self._lock:
+                            self.errors += 1
+                        _frame_failed(e)
+                self.frames += end // size
+                if end:
+                    buf[:have - end] = buf[end:have]
+                    have -= end
+        except OSError:
+            pass
+        finally:
+            with self._lock:
+                if conn in self._conns:
+                    self._conns.remove(conn)
+            conn.close()
+
+    def close(self) -> None:
+        if self._sock is None:
+            return
+        self._sock.close()
+        self._sock = None
+        with self._lock:
+            conns, self._conns = self._conns, []
+        for c in conns:
+            try:
+                c.shutdown(socket.SHUT_RDWR)
+            except OSError:
+                pass
+        try:
+            os.unlink(self.path)
+        except OSError:
+            pass
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            'connections': self.connections,
+            'open': len(self._conns),
+            'frames': self.frames,
+            'errors': self.errors,
+        }
+
+
+class SocketSender:
+    """Supervisor side of SocketListener: send() blocks only while the socket buffer is full."""
+
+    def __init__(self, path: str):
+        self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self.sock.connect(path)
+
+    def send(self, frame: bytes) -> bool:
+        self.sock.sendall(frame)
+        return True
+
+    def close(self) -> None:
+        self.sock.close()
+
+
+# Ring layout: header, then the write and read counters on cache lines of their own, then slots.
+#   header:  b'DTKR' version:u32 slots:u32 frame_size:u32
+#   @64:     head:u64  frames written (only the producer stores it)
+#   @128:    tail:u64  frames consumed (only the consumer stores it)
+#   @192:    slots * frame_size
+RING_MAGIC = b'DTKR'
+RING_VERSION = 1
+_RING_HEAD = struct.Struct('<4sIII')
+_U64 = struct.Struct('<Q')
+_HEAD_AT, _TAIL_AT, _DATA_AT = 64, 128, 192
+
+
+def _attach(name: str) -> shared_memory.SharedMemory:
+    shm = shared_memory.SharedMemory(name)
+    # attaching registers the segment with this process's resource tracker, which
+    # would unlink it when the process exits; only its creator should do that
+    resource_tracker.unregister(shm._name, 'shared_memory')
+    return shm
+
+
+class ShmRing:
+    """
+    Single-producer, single-consumer ring of fixed frames in shared memory.
+
+    The producer copies a frame into slot head % slots and then stores head + 1;
+    the consumer reads slots up to head and then stores its tail, so a slot is
+    reused only after it was read. Each counter has one writer and is an aligned
+    8-byte store, and x86-64 keeps stores in program order; on weakly ordered
+    CPUs use the socket instead. There is no wake-up: the consumer polls.
+
+    The service creates the ring (create=True) and unlinks it on close; it
+    attaches to a ring that already exists with the same layout, so frames a
+    supervisor wrote across a service restart are still read.
+    """
+
+    def __init__(self, name: str, slots: int = 1024, create: bool = False):
+        self.name = name
+        self.owner = create
+        shm = None
+        if create:
+            try:
+                shm = shared_memory.SharedMemory(name, create=True, size=_DATA_AT + slots * FRAME_SIZE)
+                _RING_HEAD.pack_into(shm.buf, 0, RING_MAGIC, RING_VERSION, slots, FRAME_SIZE)
+            except FileExistsError:
+                shm = _attach(name)
+                if _RING_HEAD.unpack_from(shm.buf, 0) != (RING_MAGIC, RING_VERSION, slots, FRAME_SIZE):
+                    # another layout: start over with a fresh segment
+                    shm.close()
+                    shared_memory.SharedMemory(name).unlink()
+                    shm = shared_memory.SharedMemory(name, create=True, size=_DATA_AT + slots * FRAME_SIZE)
+                    _RING_HEAD.pack_into(shm.buf, 0, RING_MAGIC, RING_VERSION, slots, FRAME_SIZE)
+        else:
+            shm = _attach(name)
+            magic, version, slots, size = _RING_HEAD.unpack_from(shm.buf, 0)
+            if (magic, version, size) != (RING_MAGIC, RING_VERSION, FRAME_SIZE):
+                shm.close()
+                raise ValueError(f'shared memory {name!r} is not a frame ring of this layout')
+        self.shm = shm
+        self.buf = shm.buf
+        self.slots = slots
+        self._head = _U64.unpack_from(self.buf, _HEAD_AT)[0]
+        self._tail = _U64.unpack_from(self.buf, _TAIL_AT)[0]
+        self.full = 0
+        self.frames = 0
+        self.errors = 0
+        self.high_water = 0
+
+    # producer
+
+    def push(self, frame: bytes) -> bool:
+        """Write one frame; False (nothing written) while the ring is full."""
+        head = self._head
+        if head - _U64.unpack_from(self.buf, _TAIL_AT)[0] >= self.slots:
+            self.full += 1
+            return False
+        off = _DATA_AT + head % self.slots * FRAME_SIZE
+        self.buf[off:off + FRAME_SIZE] = frame
+        self._head = head + 1
+        _U64.pack_into(self.buf, _HEAD_AT, head + 1)
+        return True
+
+    send = push
+
+    # consumer
+
+    def depth(self) -> int:
+        return _U64.unpack_from(self.buf, _HEAD_AT)[0] - self._tail
+
+    def drain(self, on_frame: OnFrame, max_frames: int = 256) -> int:
+        """Hand up to max_frames waiting frames to on_frame; returns how many."""
+        tail = self._tail
+        n = min(_U64.unpack_from(self.buf, _HEAD_AT)[0] - tail, max_frames)
+        if n <= 0:
+            return 0
+        self.high_water = max(self.high_water, n)
+        buf, slots = self.buf, self.slots
+        for seq in range(tail, tail + n):
+            try:
+                on_frame(*unpack(buf, _DATA_AT + seq % slots * FRAME_SIZE))
+            except Exception as e:
+                self.errors += 1
+                _frame_failed(e)
+        self._tail = tail + n
+        _U64.pack_into(buf, _TAIL_AT, tail + n)
+        self.frames += n
+        return n
+
+    def close(self) -> None:
+        if self.shm is None:
+            return
+        self.buf = None
+        self.shm.close()
+        if self.owner:
+            try:
+                self.shm.unlink()
+            except FileNotFoundError:
+                pass
+        self.shm = None
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            'slots': self.slots,
+            'depth': self.depth() if self.shm is not None else 0,
+            'high_water': self.high_water,
+            'frames': self.frames,
+            'errors': self.errors,
+        }
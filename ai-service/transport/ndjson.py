@@ -0,0 +1,99 @@
+import json
+from typing import Any, BinaryIO, Dict, Iterator, List, Optional, Tuple
+
+from analysis.sensors import to_sensors
+from transport import jsonfast
+
+# A frame line longer than this is treated as garbage and skipped
+MAX_LINE = 1 << 20
+
+
+def body_unit(body: bytes) -> Any:
+    """
+    The top-level unit_id of a JSON body (a string or a number), None without one. The
+    body is parsed rather than searched, so a unit_id inside a nested object or a
+    string does not count: workers key the frame by the same top-level field.
+    """
+    try:
+        obj = jsonfast.loads(body)
+    except ValueError:
+        return None
+    return obj.get('unit_id') if isinstance(obj, dict) else None
+
+
+class LineSplitter:
+    """
+    Incremental line splitter for chunks pushed from outside (e.g. an async request
+    body): holds at most one partial line; over-long lines come out as None.
+    """
+    __slots__ = ('max_line', 'buf', 'skipping')
+
+    def __init__(self, max_line: int = MAX_LINE):
+        self.max_line = max_line
+        self.buf = b''
+        self.skipping = False
+
+    def feed(self, chunk: bytes) -> List[Optional[bytes]]:
+        buf = self.buf + chunk
+        out: List[Optional[bytes]] = []
+        start = 0
+        while True:
+            nl = buf.find(b'\n', start)
+            if nl < 0:
+                break
+            if self.skipping:
+                self.skipping = False
+            else:
+                out.append(buf[start:nl])
+            start = nl + 1
+        buf = buf[start:]
+        if len(buf) > self.max_line:
+            if not self.skipping:
+                out.append(None)
+            self.skipping = True
+            buf = b''
+        self.buf = buf
+        return out
+
+    def close(self) -> List[Optional[bytes]]:
+        """The unterminated last line, if any."""
+        buf, self.buf = self.buf, b''
+        return [buf] if buf and not self.skipping else []
+
+
+def iter_lines(stream: BinaryIO, chunk_size: int = 64 * 1024, max_line: int = MAX_LINE) -> Iterator[Optional[bytes]]:
+    """
+    Split a (possibly chunked) byte stream into lines while holding at most one
+    partial line in memory. Over-long lines are discarded and reported as None.
+    """
+    splitter = LineSplitter(max_line)
+    while True:
+        chunk = stream.read(chunk_size)
+        if not chunk:
+            break
+        yield from splitter.feed(chunk)
+    yield from splitter.close()
+
+
+def iter_frames(lines: Iterator[Optional[bytes]]) -> Iterator[Tuple[Any, Any, Optional[List[Dict[str, Any]]]]]:
+    """
+    Parse NDJSON frame lines into (unit_id, timestamp, sensors); sensors is None for
+    a line that is not a valid frame. Blank lines are skipped.
+    """
+    for line in lines:
+        if line is None:
+            yield None, None, None
+            continue
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            body = json.loads(line)
+        except ValueError:
+            yield None, None, None
+            continue
+        if not isinstance(body, dict):
+            yield None, None, None
+            continue
+        ts = body.get('ts', body.get('timestamp'))
+        yield body.get('unit_id'), ts, to_sensors(body)
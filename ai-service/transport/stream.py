@@ -0,0 +1,164 @@
+import asyncio
+import threading
+import time
+from collections import deque
+from typing import Any, AsyncIterator, Callable, Dict, Iterator, List, Optional
+
+from transport.jsonfast import dumps
+
+
+def sse_event(event: str, data: Any, event_id: Optional[int] = None) -> bytes:
+    head = f'id: {event_id}\n' if event_id is not None else ''
+    return f'{head}event: {event}\ndata: '.encode('utf-8') + dumps(data) + b'\n\n'
+
+
+class Subscriber:
+    """
+    One stream consumer with a bounded buffer. When the buffer is full the newest
+    frame replaces the oldest queued frame of the same unit (latest-value
+    coalescing); only if there is none is the oldest frame dropped.
+    waker, if set, is called after every offer and on close (async consumers).
+    """
+    __slots__ = ('unit_id', 'source', 'maxlen', 'buffer', 'cond', 'coalesced', 'dropped', 'closed', 'waker')
+
+    def __init__(self, unit_id: Optional[str], source: Optional[str], maxlen: int):
+        self.unit_id = unit_id
+        self.source = source
+        self.maxlen = max(1, maxlen)
+        self.buffer: deque = deque()
+        self.cond = threading.Condition()
+        self.coalesced = 0
+        self.dropped = 0
+        self.closed = False
+        self.waker: Optional[Callable[[], None]] = None
+
+    def offer(self, unit_id: str, payload: bytes) -> None:
+        with self.cond:
+            if len(self.buffer) >= self.maxlen:
+                for i, (uid, _) in enumerate(self.buffer):
+                    if uid == unit_id:
+                        del self.buffer[i]
+                        self.coalesced += 1
+                        break
+                else:
+                    self.buffer.popleft()
+                    self.dropped += 1
+            self.buffer.append((unit_id, payload))
+            self.cond.notify()
+        if self.waker is not None:
+            self.waker()
+
+    def get(self, timeout: float) -> Optional[bytes]:
+        with self.cond:
+            if not self.buffer and not self.closed:
+                self.cond.wait(timeout)
+            if self.buffer:
+                return self.buffer.popleft()[1]
+            return None
+
+    def pop(self) -> Optional[bytes]:
+        """Next queued payload without waiting, or None."""
+        with self.cond:
+            return self.buffer.popleft()[1] if self.buffer else None
+
+    def close(self) -> None:
+        with self.cond:
+            self.closed = True
+            self.cond.notify_all()
+        if self.waker is not None:
+            self.waker()
+
+
+class StreamHub:
+    """
+    Fan-out of analyzed frames to stream subscribers. Each frame is serialized
+    once per publish and the same bytes are queued to every subscriber.
+    """
+
+    def __init__(self, keepalive: float = 15.0):
+        self.keepalive = keepalive
+        self._subs: List[Subscriber] = []
+        self._lock = threading.Lock()
+        self._seq = 0
+        self.published = 0
+
+    def subscribe(self, unit_id: Optional[str] = None, source: Optional[str] = None, maxlen: int = 64) -> Subscriber:
+        sub = Subscriber(unit_id, source, maxlen)
+        with self._lock:
+            self._subs = self._subs + [sub]
+        return sub
+
+    def unsubscribe(self, sub: Subscriber) -> None:
+        sub.close()
+        with self._lock:
+            self._subs = [s for s in self._subs if s is not sub]
+
+    def __len__(self) -> int:
+        return len(self._subs)
+
+    def publish(self, unit_id: str, sensors: List[Dict[str, Any]], source: str = 'ingest') -> None:
+        subs = self._subs
+        if not subs:
+            return
+        with self._lock:
+            self._seq += 1
+            seq = self._seq
+        payload = sse_event('frame', { 'unit_id': unit_id, 'source': source, 'ts': time.time(), 'sensors': sensors }, seq)
+        for sub in subs:
+            if (sub.unit_id is None or sub.unit_id == unit_id) and (sub.source is None or sub.source == source):
+                sub.offer(unit_id, payload)
+        self.published += 1
+
+    def events(self, sub: Subscriber) -> Iterator[bytes]:
+        """SSE body generator for one subscriber; sends a comment line as keep-alive."""
+        try:
+            yield b': connected\n\n'
+            while not sub.closed:
+                payload = sub.get(self.keepalive)
+                yield payload if payload is not None else b': keep-alive\n\n'
+        finally:
+            self.unsubscribe(sub)
+
+    async def aevents(self, sub: Subscriber) -> AsyncIterator[bytes]:
+        """
+        events() for an asyncio server: waits on an asyncio.Event that publishers
+        (any thread) set through the loop, so no thread is parked per connection.
+        """
+        loop = asyncio.get_running_loop()
+        ready = asyncio.Event()
+
+        def wake():
+            # a stale is_set() only skips a wake-up the consumer will not miss: it re-checks after clear()
+            if not ready.is_set():
+                try:
+                    loop.call_soon_threadsafe(ready.set)
+                except RuntimeError:  # loop already closed
+                    pass
+
+        sub.waker = wake
+        try:
+            yield b': connected\n\n'
+            while not sub.closed:
+                payload = sub.pop()
+                if payload is None:
+                    ready.clear()
+                    payload = sub.pop()
+                if payload is not None:
+                    yield payload
+                    continue
+                try:
+                    await asyncio.wait_for(ready.wait(), self.keepalive)
+                except asyncio.TimeoutError:
+                    yield b': keep-alive\n\n'
+        finally:
+            self.unsubscribe(sub)
+
+    def stats(self) -> Dict[str, Any]:
+        subs = self._subs
+        return {
+            'subscribers': len(subs),
+            'published': self.published,
+            'buffered': sum(len(s.buffer) for s in subs),
+            'coalesced': sum(s.coalesced for s in subs),
+            'dropped': sum(s.dropped for s in subs),
+        }
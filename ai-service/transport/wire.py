@@ -0,0 +1,176 @@
+import math
+import struct
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
+
+from analysis.sensors import SENSOR_MAPPING
+
+# Compact binary telemetry, negotiated by Content-Type on /ingest.
+#
+#   header: b'DTK' version:u8 flags:u8 n:u8 unit_len:u8 unit_id:utf8[unit_len] index:u8[n]
+#   frame:  [ts:f64 if flags & FLAG_TS] floats:f32[n_float] flags_mask:u8[ceil(n_bool / 8)]
+#
+# index[] are positions in SENSOR_KEYS (the SENSOR_MAPPING order); numeric sensors
+# come first as float32 (NaN = not reported), boolean flags follow as a bitmask,
+# both in header order. All fields are little-endian; frames repeat to the end.
+# sensors()/frames() round the float32 values to 7 significant digits, so a reading
+# sent as 1.8 is analyzed as 1.8 (not 1.7999999523) and lands in the same band as
+# over JSON.
+CONTENT_TYPE = 'application/x-datchiki-frames'
+MAGIC = b'DTK'
+VERSION = 1
+FLAG_TS = 0x01
+
+SENSOR_KEYS: List[str] = list(SENSOR_MAPPING)
+BOOL_KEYS = frozenset(k for k in ('fuel_leak', 'overheat', 'emergency_stop') if k in SENSOR_MAPPING)
+_KEY_INDEX = { k: i for i, k in enumerate(SENSOR_KEYS) }
+_ID_TO_KEY = { meta['id']: k for k, meta in SENSOR_MAPPING.items() }
+
+_HEAD = struct.Struct('<3sBBBB')
+
+
+class WireError(ValueError):
+    pass
+
+
+class WirePacket:
+    """
+    Decoded view over a binary payload. Frames are unpacked lazily from a memoryview;
+    sensor dicts are only built by frames()/sensors().
+    """
+
+    def __init__(self, unit_id: Optional[str], keys: List[str], n_float: int, has_ts: bool,
+                 frame_struct: struct.Struct, body: memoryview):
+        self.unit_id = unit_id
+        self.keys = keys
+        self.n_float = n_float
+        self.has_ts = has_ts
+        self._struct = frame_struct
+        self._body = body
+
+    def __len__(self) -> int:
+        return len(self._body) // self._struct.size
+
+    def rows(self) -> Iterator[Tuple[Optional[float], Tuple[float, ...], int]]:
+        """(ts, float values, bool bitmask) per frame, straight from struct.iter_unpack."""
+        off = 1 if self.has_ts else 0
+        nf = self.n_float
+        for row in self._struct.iter_unpack(self._body):
+            ts = row[0] if self.has_ts else None
+            mask = 0
+            for i, b in enumerate(row[off + nf:]):
+                mask |= b << (8 * i)
+            yield ts, row[off:off + nf], mask
+
+    def sensors(self, floats: Sequence[float], mask: int) -> List[Dict[str, Any]]:
+        out = []
+        for key, v in zip(self.keys, floats):
+            if v != v:
+                continue
+            out.append({ **SENSOR_MAPPING[key], 'value': _f32_value(v) })
+        for j, key in enumerate(self.keys[self.n_float:]):
+            out.append({ **SENSOR_MAPPING[key], 'value': bool(mask >> j & 1) })
+        return out
+
+    def frames(self) -> Iterator[Tuple[Optional[float], List[Dict[str, Any]]]]:
+        for ts, floats, mask in self.rows():
+            yield ts, self.sensors(floats, mask)
+
+
+def _f32_value(v: float) -> float:
+    # the shortest decimal that float32 holds exactly enough; inf passes through
+    return float(f'{v:.7g}')
+
+
+def _frame_struct(n_float: int, n_bool: int, has_ts: bool) -> struct.Struct:
+    return struct.Struct('<' + ('d' if has_ts else '') + 'f' * n_float + 'B' * ((n_bool + 7) // 8))
+
+
+def layout(keys: Iterable[str]) -> List[str]:
+    """Order flat telemetry keys the way the wire carries them: numeric first, then flags."""
+    keys = [k for k in keys if k in _KEY_INDEX]
+    return [k for k in keys if k not in BOOL_KEYS] + [k for k in keys if k in BOOL_KEYS]
+
+
+def flat_values(sensors: Iterable[Dict[str, Any]]) -> Dict[str, Any]:
+    """{ sensors: [...] } list -> flat telemetry dict keyed by SENSOR_MAPPING keys."""
+    out = {}
+    for s in sensors:
+        key = _ID_TO_KEY.get(s.get('id'))
+        if key is not None:
+            out[key] = s.get('value')
+    return out
+
+
+def encode(frames: Sequence[Dict[str, Any]], unit_id: Optional[str] = None,
+           keys: Optional[Sequence[str]] = None, timestamps: Optional[Sequence[float]] = None) -> bytes:
+    """Encode flat telemetry dicts; keys default to the union of keys seen in frames."""
+    if keys is None:
+        seen = {}
+        for f in frames:
+            for k in f:
+                seen.setdefault(k, None)
+        keys = seen
+    keys = layout(keys)
+    n_bool = sum(1 for k in keys if k in BOOL_KEYS)
+    n_float = len(keys) - n_bool
+    has_ts = timestamps is not None
+    unit = (unit_id or '').encode('utf-8')[:255]
+    st = _frame_struct(n_float, n_bool, has_ts)
+    out = bytearray(_HEAD.pack(MAGIC, VERSION, FLAG_TS if has_ts else 0, len(keys), len(unit)))
+    out += unit
+    out += bytes(_KEY_INDEX[k] for k in keys)
+    nan = math.nan
+    float_keys, bool_keys = keys[:n_float], keys[n_float:]
+    n_mask = (n_bool + 7) // 8
+    for i, f in enumerate(frames):
+        row = [timestamps[i]] if has_ts else []
+        for k in float_keys:
+            v = f.get(k)
+            row.append(float(v) if isinstance(v, (int, float)) else nan)
+        mask = 0
+        for j, k in enumerate(bool_keys):
+            if f.get(k):
+                mask |= 1 << j
+        row.extend((mask >> (8 * b)) & 0xFF for b in range(n_mask))
+        out += st.pack(*row)
+    return bytes(out)
+
+
+def decode(payload: bytes) -> WirePacket:
+    view = memoryview(payload)
+    if len(view) < _HEAD.size:
+        raise WireError('payload shorter than header')
+    magic, version, flags, n, unit_len = _HEAD.unpack_from(view)
+    if magic != MAGIC or version != VERSION:
+        raise WireError('unsupported wire format')
+    pos = _HEAD.size
+    if len(view) < pos + unit_len + n:
+        raise WireError('truncated header')
+    unit_id = bytes(view[pos:pos + unit_len]).decode('utf-8', 'replace') or None
+    pos += unit_len
+    try:
+        keys = [SENSOR_KEYS[i] for i in view[pos:pos + n]]
+    except IndexError:
+        raise WireError('unknown sensor index') from None
+    if keys != layout(keys):
+        raise WireError('numeric sensors must precede flags')
+    pos += n
+    n_bool = sum(1 for k in keys if k in BOOL_KEYS)
+    has_ts = bool(flags & FLAG_TS)
+    st = _frame_struct(n - n_bool, n_bool, has_ts)
+    body = view[pos:]
+    if st.size == 0:
+        raise WireError('no sensors in header')
+    if len(body) % st.size:
+        raise WireError('payload is not a whole number of frames')
+    return WirePacket(unit_id, keys, n - n_bool, has_ts, st, body)
+
+
+def peek_unit(payload: bytes) -> Optional[str]:
+    """unit_id from the header alone (for routing); None if absent or not a wire payload."""
+    if len(payload) < _HEAD.size:
+        return None
+    magic, version, _, _, unit_len = _HEAD.unpack_from(payload)
+    if magic != MAGIC or version != VERSION:
+        return None
+    return bytes(payload[_HEAD.size:_HEAD.size + unit_len]).decode('utf-8', 'replace') or None
@@ -1,46 +1,91 @@
-from flask import Flask, request, jsonify
-import os, sys
+from flask import Flask, Response, g, request, jsonify
+import atexit, logging, os, sys, threading, time
 # Make 'ai-service' modules importable despite hyphen in directory name
 sys.path.append(os.path.join(os.path.dirname(__file__), 'ai-service'))
 from simulation.simulator import RuleSimulator
 from simulation.webots_adapter import WebotsAdapter
 from analysis.analyzer import RiskAnalyzer
+from analysis.dispatch import ScoreDispatcher
+from analysis.frame import Frame
 from analysis.pysad_adapter import PySADAdapter
-import threading
-import requests
+from analysis.sensors import SENSOR_IDS, to_sensors
+from analysis.units import DEFAULT_UNIT, UnitRegistry, UnitState, unit_key
+from observability import logs, profiling
+from observability.metrics import ServiceMetrics
+from observability.profiling import Profiler
+from serving.admission import ACCEPTED, AdmissionControl
+from serving.simulate import SimulateProducer
+from transport.delta import DeltaEncoder, deadbands
+from transport.forwarder import NestForwarder
+from transport.ndjson import iter_frames, iter_lines
+from storage.snapshot import Snapshotter
+from storage import timeseries
+from storage.timeseries import UnitHistory, bucket_stats, lttb
+from transport import jsonfast, wire
+from transport.stream import StreamHub
 
 app = Flask(__name__)
+log = logs.setup()
+# counters and latency histograms served on /metrics
+metrics = ServiceMetrics(max_units=int(os.getenv('METRICS_MAX_UNITS', '1000')), known_sensors=SENSOR_IDS)
+# opt-in stage timings + cProfile/tracemalloc capture of every Nth request (PROFILE_EVERY=0: off)
+profiler = Profiler(
+    os.getenv('PROFILE_DIR', 'profiles'),
+    every=int(os.getenv('PROFILE_EVERY', '0')),
+    memory=os.getenv('PROFILE_MEMORY', '0') == '1',
+    keep=int(os.getenv('PROFILE_KEEP', '20')),
+    routes=os.getenv('PROFILE_ROUTES', '/ingest,/telemetry,/simulate,/analyze').split(','),
+)
 webots = WebotsAdapter()
 pysad = PySADAdapter()
 sim = RuleSimulator()
 analyzer = RiskAnalyzer()
+# per-genset analyzer/simulator state, keyed by unit_id from the payload
+units = UnitRegistry(RiskAnalyzer, idle_ttl=float(os.getenv('UNIT_IDLE_TTL', '900')))
+# change-only forwarding (FWD_DELTA=1): sensors whose severity changed or value left
+# its deadband, full keyframes every FWD_KEYFRAME_SEC; Nest merges them per unit
+delta = None
+if os.getenv('FWD_DELTA', '0') == '1':
+    delta = DeltaEncoder(
+        deadbands(float(os.getenv('FWD_DEADBAND_PCT', '1')), os.getenv('FWD_DEADBANDS', '')),
+        keyframe_every=float(os.getenv('FWD_KEYFRAME_SEC', '10')),
+    )
+
+def on_forward_post(seconds, frames, ok):
+    metrics.observe_forward(seconds, frames, ok)
+    if not ok and delta is not None:
+        # Nest missed deltas: send every unit a keyframe next
+        delta.resync()
+
+# long-lived batching forwarder to Nest instead of a thread + TCP handshake per frame
+forwarder = NestForwarder(
+    os.getenv('NEST_INGEST_URL', 'http://localhost:3000/sensors/ingest'),
+    max_queue=int(os.getenv('FWD_QUEUE_MAX', '1000')),
+    batch_max=int(os.getenv('FWD_BATCH_MAX', '20')),
+    batch_window=float(os.getenv('FWD_BATCH_WINDOW_MS', '20')) / 1000.0,
+    workers=int(os.getenv('FWD_WORKERS', '1')),
+    on_post=on_forward_post,
+)
+# push stream of analyzed frames (SSE) for Nest and dashboards
+hub = StreamHub()
+SIM_TICK_HZ = float(os.getenv('SIM_TICK_HZ', '1'))
+_ticker = None
+_ticker_lock = threading.Lock()
 latest_ingested = None  # type: ignore
-SENSOR_MAPPING = {
-    'rpm':            { 'id': 'rpm', 'type': 'RPM', 'min': 0,  'max': 3000, 'unit': 'об/мин' },
-    'coolant_temp':   { 'id': 'engine_temp_coolant', 'type': 'temperature_coolant', 'min': 20, 'max': 120, 'unit': '°C' },
-    'oil_temp':       { 'id': 'oil_temp', 'type': 'temperature_oil', 'min': 20, 'max': 150, 'unit': '°C' },
-    'oil_pressure':   { 'id': 'oil_pressure', 'type': 'pressure_oil', 'min': 1,  'max': 10,  'unit': 'bar' },
-    'fuel_pressure':  { 'id': 'fuel_pressure', 'type': 'pressure_fuel', 'min': 1,  'max': 8,   'unit': 'bar' },
-    'fuel_level':     { 'id': 'fuel_level', 'type': 'level_fuel', 'min': 0,  'max': 100, 'unit': '%' },
-    'fuel_consumption': { 'id': 'fuel_consumption', 'type': 'consumption_fuel', 'min': 0, 'max': 60, 'unit': 'l/h' },
-    'voltage':        { 'id': 'voltage', 'type': 'voltage', 'min': 10, 'max': 32, 'unit': 'V' },
-    'current':        { 'id': 'current', 'type': 'current', 'min': 0,  'max': 500, 'unit': 'A' },
-    'ecu_errors':     { 'id': 'ecu_errors', 'type': 'ecu_errors' },
-    'fuel_leak':      { 'id': 'fuel_leak', 'type': 'fuel_leak' },
-    'coolant_pressure': { 'id': 'coolant_pressure', 'type': 'pressure_coolant', 'min': 0.5, 'max': 3, 'unit': 'bar' },
-    'overheat':       { 'id': 'overheat', 'type': 'overheat' },
-    'vibration':      { 'id': 'vibration', 'type': 'vibration', 'min': 0, 'max': 10, 'unit': 'm/s²' },
-    'emergency_stop': { 'id': 'emergency_stop', 'type': 'emergency_stop' },
-}
-
-if webots.is_available():
-    try:
-        webots.connect()
-        sim_backend = webots
-    except Exception:
-        sim_backend = sim
-else:
-    sim_backend = sim
+ANALYZE_BATCH_MAX = int(os.getenv('ANALYZE_BATCH_MAX', '1000'))
+# frames of history kept per unit for /history (0 disables; so does a missing numpy)
+HISTORY_CAPACITY = int(os.getenv('HISTORY_CAPACITY', '3600')) if timeseries.np is not None else 0
+# durable log of analyzed frames, written by a background thread (off unless TLOG_DIR is set)
+tlog = None
+if os.getenv('TLOG_DIR'):
+    from storage.telemetry_log import TelemetryLog  # needs numpy
+    tlog = TelemetryLog(
+        os.getenv('TLOG_DIR'),
+        segment_bytes=int(float(os.getenv('TLOG_SEGMENT_MB', '64')) * (1 << 20)),
+        retention_bytes=int(float(os.getenv('TLOG_RETENTION_MB', '1024')) * (1 << 20)),
+        fsync_interval=float(os.getenv('TLOG_FSYNC_MS', '1000')) / 1000.0,
+    ).start()
+    atexit.register(tlog.close)
 
 if pysad.is_available():
     try:
@@ -51,94 +96,575 @@ if pysad.is_available():
 else:
     analyzer_backend = analyzer
 
-@app.route('/simulate', methods=['GET'])
-def simulate():
-    global latest_ingested
-    # Всегда используем внутренний симулятор (по задаче)
-    sensors = sim.step()
+# per-unit analyzer (and detector) state written in the background and restored here,
+# so a restart keeps prev_frame, rolling windows and latched emergencies (off unless SNAPSHOT_PATH is set)
+snapshots = None
+if os.getenv('SNAPSHOT_PATH'):
+    snapshots = Snapshotter(os.getenv('SNAPSHOT_PATH'), units, every=float(os.getenv('SNAPSHOT_EVERY_SEC', '30')))
+    snapshots.restore(pysad.restore_unit if analyzer_backend is pysad else None)
+    snapshots.start()
+    atexit.register(snapshots.close)
+
+# micro-batching of model calls across request threads (only the model backend batches). Not a
+# speedup for the built-in detector: its batched path still runs the rules per frame under the GIL,
+# so the hand-off to the dispatcher thread costs more than it saves (see bench/bench_dispatch.py);
+# it is there for a model backend with a fixed cost per call.
+frame_dispatch = score_dispatch = None
+if os.getenv('SCORE_BATCHING', '0') == '1' and analyzer_backend is pysad:
+    _batch_max = int(os.getenv('SCORE_BATCH_MAX', '64'))
+    _batch_wait = float(os.getenv('SCORE_BATCH_WAIT_MS', '2')) / 1000.0
+    frame_dispatch = ScoreDispatcher(pysad.analyze_many, _batch_max, _batch_wait, 'frame-dispatch').start()
+    score_dispatch = ScoreDispatcher(pysad.score_many, _batch_max, _batch_wait, 'score-dispatch').start()
+
+BACKEND = 'pysad' if analyzer_backend is pysad else 'rules'
+_reg = metrics.registry
+_reg.collect('forwarder_queue_depth', 'Frames waiting to be forwarded to Nest', 'gauge', lambda: forwarder.depth())
+_reg.collect('forwarder_dropped_total', 'Frames dropped from a full forward queue', 'counter', lambda: forwarder.dropped)
+_reg.collect('forwarder_failed_total', 'Frames whose POST to Nest failed', 'counter', lambda: forwarder.failed)
+_reg.collect('units', 'Units with live state', 'gauge', lambda: len(units))
+_reg.collect('stream_subscribers', 'Open /stream connections', 'gauge', lambda: len(hub))
+if tlog is not None:
+    _reg.collect('telemetry_log_dropped_total', 'Frames dropped by a full telemetry log queue', 'counter',
+                 lambda: tlog.dropped)
+
+@app.before_request
+def _start_timer():
+    g.t0 = time.perf_counter()
+    if profiler.enabled and request.url_rule is not None:
+        g.profile = profiler.begin(request.url_rule.rule)
+
+@app.after_request
+def _observe_request(response):
+    t0 = g.get('t0')
+    if t0 is not None:
+        rule = request.url_rule
+        route = rule.rule if rule is not None else 'unmatched'
+        metrics.requests.observe(time.perf_counter() - t0, (route, request.method))
+        metrics.responses.inc((route, request.method, str(response.status_code)))
+    stages = profiling.current()
+    if stages is not None:
+        stages.mark('respond')
+        response.headers['Server-Timing'] = stages.server_timing()
+    return response
+
+@app.teardown_request
+def _end_profile(exc):
+    # teardown runs even when the view raised, so the capture is always closed
+    cap = g.pop('profile', None)
+    if cap is not None:
+        stages = profiler.end(cap)
+        for name, seconds in stages.times.items():
+            metrics.stages.observe(seconds, (cap.route, name))
+
+def analyze_sensors(unit, sensors, ts=None, record=True):
+    """
+    Analyze one frame with the unit's own state; frames of one unit are serialized.
+    With record the analyzed frame is also kept in the unit's history ring and queued
+    to the telemetry log when enabled (ts defaults to now).
+    """
+    with unit.lock:
+        profiling.mark('lock_wait')
+        t0 = time.perf_counter()
+        analyzed = _analyze_locked(unit, sensors)
+        metrics.analyze.observe(time.perf_counter() - t0, (BACKEND,))
+        profiling.mark('analyze')
+        if record:
+            metrics.observe_frame(unit.unit_id, analyzed)
+            if ts is None:
+                ts = time.time()
+            if HISTORY_CAPACITY > 0:
+                if unit.history is None:
+                    unit.history = UnitHistory(HISTORY_CAPACITY)
+                unit.history.append(ts, analyzed)
+            if tlog is not None:
+                tlog.append(unit.unit_id, ts, analyzed)
+            profiling.mark('record')
+    # the rules backend returns a Frame (history and log read its slots); the
+    # response dicts are built once, outside the unit lock
+    if isinstance(analyzed, Frame):
+        analyzed = analyzed.to_dicts()
+        profiling.mark('analyze')
+    return analyzed
+
+def _analyze_locked(unit, sensors):
+    rules = unit.analyzer
+    backend = rules if analyzer_backend is analyzer else analyzer_backend
     try:
-        if hasattr(analyzer_backend, 'analyze_frame'):
-            analyzed = analyzer_backend.analyze_frame(sensors)
-        else:
-            analyzed = []
-            for s in sensors:
-                try:
-                    res = analyzer_backend.score(s)
-                except Exception:
-                    res = analyzer.score(s)
-                analyzed.append({ **s, **res })
+        if backend is pysad:
+            if frame_dispatch is not None:
+                return frame_dispatch.call((unit, sensors))
+            return pysad.analyze_unit(unit, sensors)
+        if isinstance(backend, RiskAnalyzer):
+            return backend.analyze(sensors)
+        if hasattr(backend, 'analyze_frame'):
+            return backend.analyze_frame(sensors)
+        analyzed = []
+        for s in sensors:
+            try:
+                res = backend.score(s)
+            except Exception:
+                metrics.fallbacks.inc(('sensor',))
+                profiling.mark('analyze')
+                res = rules.score(s)
+                profiling.mark('fallback')
+            analyzed.append({ **s, **res })
+        return analyzed
     except Exception:
+        metrics.fallbacks.inc(('frame',))
+        profiling.mark('analyze')
         analyzed = []
         for s in sensors:
             try:
-                res = analyzer.score(s)
+                res = rules.score(s)
             except Exception:
                 res = { 'id': s.get('id'), 'severity': 'normal', 'risk_probability': 0.1 }
             analyzed.append({ **s, **res })
-    return jsonify({ 'sensors': analyzed })
+        profiling.mark('fallback')
+        return analyzed
+
+def simulate_frame(unit):
+    # Всегда используем внутренний симулятор (по задаче), свой на каждый агрегат
+    if unit.simulator is None:
+        unit.simulator = RuleSimulator()
+    sensors = unit.simulator.step()
+    profiling.mark('simulate')
+    analyzed = analyze_sensors(unit, sensors)
+    hub.publish(unit.unit_id, analyzed, 'simulate')
+    profiling.mark('publish')
+    return analyzed
+
+def _produce_simulated(unit_id):
+    unit = units.get(unit_id)
+    return unit.unit_id, simulate_frame(unit)
+
+# /simulate frames: produced at SIM_TICK_HZ for polled units and shared by all pollers
+simulated = SimulateProducer(_produce_simulated, SIM_TICK_HZ, idle_after=float(os.getenv('SIM_IDLE_SEC', '30')))
+
+def sim_tick(stream_default=True):
+    """One simulator tick: polled units, and the default unit while /stream has subscribers."""
+    return simulated.tick((DEFAULT_UNIT,) if stream_default and len(hub) else ())
+
+def _sim_tick():
+    period = 1.0 / SIM_TICK_HZ
+    deadline = time.monotonic()
+    while True:
+        # scheduled on deadlines so a slow tick does not slow the simulated clock
+        deadline += period
+        time.sleep(max(0.0, deadline - time.monotonic()))
+        try:
+            sim_tick()
+        except Exception:
+            logs.sampled(log, logging.WARNING, 'sim-tick', '[PY-SIM-TICK] simulation step failed')
+        if deadline < time.monotonic() - period:
+            deadline = time.monotonic()
+
+def _start_ticker():
+    global _ticker
+    with _ticker_lock:
+        if _ticker is None and SIM_TICK_HZ > 0:
+            _ticker = threading.Thread(target=_sim_tick, name='sim-ticker', daemon=True)
+            _ticker.start()
+
+@app.route('/simulate', methods=['GET'])
+def simulate():
+    """The unit's latest simulator frame; pollers share it and its encoded body (see SimulateProducer)."""
+    _start_ticker()
+    frame = simulated.get(unit_key(request.args.get('unit_id')))
+    return Response(frame.body, mimetype='application/json')
+
+@app.route('/stream', methods=['GET'])
+def stream():
+    """
+    Server-sent events with every analyzed frame (ingest arrivals and simulator ticks).
+    ?unit_id= limits the stream to one unit, ?source=ingest|simulate to one origin,
+    ?buffer= sets the per-subscriber queue; a slow consumer gets the latest frame
+    per unit instead of an ever-growing backlog.
+    """
+    unit_id = request.args.get('unit_id')
+    sub = hub.subscribe(unit_key(unit_id) if unit_id else None, request.args.get('source'),
+                        request.args.get('buffer', 64, type=int))
+    _start_ticker()
+    return Response(hub.events(sub), mimetype='text/event-stream',
+                    headers={ 'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no' })
 
 @app.route('/analyze', methods=['POST'])
 def analyze():
     data = request.json or {}
+    profiling.mark('parse')
+    res = score_sensor(data, units.peek(data.get('unit_id')))
+    return jsonify({'risk': res.get('severity'), 'probability': res.get('risk_probability')})
+
+def score_sensor(data, unit):
+    """One sensor on its own (no frame state is advanced); unit may be None."""
+    t0 = time.perf_counter()
+    try:
+        return _score_sensor(data, unit)
+    finally:
+        metrics.score.observe(time.perf_counter() - t0, (BACKEND,))
+        profiling.mark('score')
+
+def _score_sensor(data, unit):
+    rules = unit.analyzer if unit is not None else analyzer
+    backend = rules if analyzer_backend is analyzer else analyzer_backend
     try:
-        res = analyzer_backend.score(data)
+        if backend is not pysad:
+            return backend.score(data)
+        if score_dispatch is not None:
+            return score_dispatch.call((data, unit))
+        return pysad.score(data, unit)
     except Exception:
-        res = analyzer.score(data)
-    return jsonify({'risk': res.get('severity'), 'probability': res.get('risk_probability')})
+        metrics.fallbacks.inc(('score',))
+        profiling.mark('score')
+        res = rules.score(data)
+        profiling.mark('fallback')
+        return res
 
-@app.route('/ingest', methods=['POST'])
-def ingest():
+BAD_BATCH = 'expected { sensors: [...] } or { frames: [...] }'
+
+def batch_response(body):
     """
-    Accept telemetry from external Webots supervisor controller.
-    Body: { "sensors": [ {id, type, value, min?, max?, unit?}, ... ] }
+    /analyze/batch for a parsed body; returns (payload, status).
+    { "unit_id"?, "sensors": [ {id, value, ...}, ... ] } scores each sensor like /analyze;
+    { "unit_id"?, "frames": [ [sensors...] | {sensors: [...]} | flat dict, ... ] } runs each
+    frame through analyze_frame, derived signals included. With unit_id the frames advance
+    that unit's state (as /ingest does); without it they run on a throwaway analyzer.
     """
+    if isinstance(body, list):
+        body = { 'frames': body } if body and not isinstance(body[0], dict) else { 'sensors': body }
+    if not isinstance(body, dict):
+        return { 'ok': False, 'error': BAD_BATCH }, 400
+    items = body.get('frames') if 'frames' in body else body.get('sensors')
+    if not isinstance(items, list):
+        return { 'ok': False, 'error': BAD_BATCH }, 400
+    if len(items) > ANALYZE_BATCH_MAX:
+        return { 'ok': False, 'error': f'at most {ANALYZE_BATCH_MAX} items per batch' }, 413
+    unit_id = body.get('unit_id')
+    if 'frames' in body:
+        unit = units.get(unit_id) if unit_id is not None else UnitState(DEFAULT_UNIT, RiskAnalyzer())
+        frames = [analyze_sensors(unit, f if isinstance(f, list) else to_sensors(f), record=unit_id is not None)
+                  for f in items]
+        return { 'ok': True, 'unit_id': unit.unit_id if unit_id is not None else None, 'frames': frames }, 200
+    unit = units.peek(unit_id)
+    results = []
+    for s in items:
+        res = score_sensor(s if isinstance(s, dict) else {}, unit)
+        results.append({ 'id': res.get('id'), 'risk': res.get('severity'), 'probability': res.get('risk_probability') })
+    return { 'ok': True, 'unit_id': unit_id, 'results': results }, 200
+
+@app.route('/analyze/batch', methods=['POST'])
+def analyze_batch():
+    """Many sensors or frames in one round trip; results come back in input order (see batch_response)."""
+    out, status = batch_response(request.get_json(force=True, silent=True))
+    return Response(jsonfast.dumps(out), status=status, mimetype='application/json')
+
+def forward(unit, analyzed):
+    """Queue an analyzed frame for Nest; in delta mode only what changed, or nothing."""
+    if delta is None:
+        forwarder.submit(unit.unit_id, analyzed)
+        return
+    sensors, marks = delta.encode(unit, analyzed)
+    if sensors is None:
+        return
+    if not forwarder.submit(unit.unit_id, sensors, marks):
+        # an older queued frame was dropped, possibly a delta Nest now lacks
+        delta.resync()
+
+def ingest_frames(unit, items):
+    """Analyze a unit's frames [(sensors, ts), ...] in order, forward and publish each."""
     global latest_ingested
-    body = request.get_json(force=True, silent=True) or {}
-    sensors = body.get('sensors')
-    if isinstance(sensors, list):
-        pass
-    elif isinstance(body, dict):
-        # Map flat telemetry dict into sensors array
-        sensors = []
-        for k, v in body.items():
-            meta = SENSOR_MAPPING.get(k)
-            if not meta:
-                continue
-            item = { **meta, 'value': v }
-            sensors.append(item)
-    else:
-        sensors = []
-    # basic logging of incoming Webots payload
-    try:
+    for sensors, ts in items:
+        analyzed = analyze_sensors(unit, sensors, ts)
+        latest_ingested = analyzed
+        forward(unit, analyzed)
+        hub.publish(unit.unit_id, analyzed)
+
+# admission control (INGEST_ADMISSION=1): /ingest frames wait in bounded per-unit inboxes
+# for INGEST_WORKERS threads instead of being analyzed in their request thread; a full
+# inbox coalesces to the newest frame (trigger frames are kept), a saturated service
+# answers 429/503 with Retry-After
+admission = None
+if os.getenv('INGEST_ADMISSION', '0') == '1':
+    admission = AdmissionControl(
+        ingest_frames,
+        inbox_max=int(os.getenv('INGEST_INBOX_MAX', '8')),
+        pending_max=int(os.getenv('INGEST_PENDING_MAX', '1000')),
+        workers=int(os.getenv('INGEST_WORKERS', '2')),
+    ).start()
+    _reg.collect('ingest_pending', 'Frames waiting in admission inboxes', 'gauge', lambda: admission.pending)
+    _reg.collect('ingest_coalesced_total', 'Queued frames dropped for a newer frame of their unit', 'counter',
+                 lambda: admission.coalesced)
+    _reg.collect('ingest_refused_total', 'Frames refused by admission control', 'counter',
+                 lambda: { ('429',): admission.limited, ('503',): admission.shed }, ('status',))
+
+REFUSED = { 429: 'unit inbox full of trigger frames', 503: 'saturated' }
+
+def admit(unit, items, out):
+    """Queue frames with admission control; returns (payload, status) with out extended."""
+    status, info = admission.submit(unit, items)
+    out.update(info)
+    if status != ACCEPTED:
+        out['ok'] = False
+        out['error'] = REFUSED[status]
+    return out, status
+
+def retry_headers(out):
+    return { 'Retry-After': str(out['retry_after']) } if 'retry_after' in out else {}
+
+def ingest_json(body):
+    """One JSON frame from /ingest: analyze with the unit's state, forward and publish; returns (payload, status)."""
+    global latest_ingested
+    unit = units.get(body.get('unit_id') if isinstance(body, dict) else None)
+    sensors = to_sensors(body)
+    profiling.mark('parse')
+    # per-frame detail only at LOG_LEVEL=DEBUG; otherwise a sampled one-liner
+    if log.isEnabledFor(logging.DEBUG):
         ids = [str(s.get('id')) for s in sensors if isinstance(s, dict)]
-        print(f"[PY-INGEST] count={len(sensors)} ids={ids}", flush=True)
+        log.debug('[PY-INGEST] unit=%s count=%d ids=%s', unit.unit_id, len(sensors), ids)
         if sensors:
-            sample = sensors[0].copy()
             # avoid dumping huge payloads
-            print(f"[PY-INGEST-SAMPLE] {sample}", flush=True)
-    except Exception:
-        pass
+            log.debug('[PY-INGEST-SAMPLE] %s', sensors[0])
+    else:
+        logs.sampled(log, logging.INFO, 'ingest', '[PY-INGEST] unit=%s count=%d', unit.unit_id, len(sensors))
+    profiling.mark('log')
+    if admission is not None:
+        return admit(unit, [(sensors, time.time())], { 'ok': True, 'count': len(sensors) })
 
     # score now for instant forwarding
-    analyzed = []
-    for s in sensors:
-        try:
-            res = analyzer_backend.score(s)
-        except Exception:
-            res = analyzer.score(s)
-        analyzed.append({ **s, **res })
+    analyzed = analyze_sensors(unit, sensors)
     latest_ingested = analyzed
 
-    # forward immediately to Nest for instant logging and socket emit
-    def _forward():
+    # forward to Nest for instant logging and socket emit (queued, coalesced by the forwarder)
+    forward(unit, analyzed)
+    profiling.mark('forward')
+    hub.publish(unit.unit_id, analyzed)
+    profiling.mark('publish')
+    return { 'ok': True, 'count': len(sensors) }, 200
+
+def ingest_local(unit_id, ts, sensors):
+    """
+    A frame from the local Webots transport (WebotsAdapter reader thread): analyzed
+    right here, so a busy service slows the reader and the socket pushes back.
+    """
+    ingest_frames(units.get(unit_id), [(sensors, ts)])
+    if ts is not None:
+        metrics.local_delay.observe(time.time() - ts, (webots.transport,))
+
+def start_webots():
+    """
+    Open the local Webots transport (WEBOTS_ENABLED=1) and analyze its frames as they
+    arrive. Called by the serving process (not on import), so the --workers router,
+    which imports this module too, does not take the socket or ring of a worker.
+    """
+    if not webots.is_available() or webots.connected:
+        return
+    try:
+        webots.start(ingest_local)
+    except (OSError, ValueError) as e:
+        log.error('[PY-WEBOTS] %s %s unavailable: %s', webots.transport, webots.address, e)
+        return
+    atexit.register(webots.close)
+    log.info('[PY-WEBOTS] receiving frames on %s %s', webots.transport, webots.address)
+
+def ingest_packet(payload):
+    """A binary wire packet (one unit, one or more frames); returns (payload, status)."""
+    global latest_ingested
+    try:
+        packet = wire.decode(payload)
+    except wire.WireError as e:
+        return { 'ok': False, 'error': str(e) }, 400
+    unit = units.get(packet.unit_id)
+    profiling.mark('parse')
+    if admission is not None:
+        now = time.time()
+        items = [(sensors, ts if ts is not None else now) for ts, sensors in packet.frames()]
+        return admit(unit, items, { 'ok': True, 'count': sum(len(s) for s, _ in items), 'frames': len(items) })
+    count = 0
+    for ts, sensors in packet.frames():
+        profiling.mark('parse')
+        analyzed = analyze_sensors(unit, sensors, ts)
+        latest_ingested = analyzed
+        count += len(sensors)
+        forward(unit, analyzed)
+        profiling.mark('forward')
+        hub.publish(unit.unit_id, analyzed)
+        profiling.mark('publish')
+    return { 'ok': True, 'count': count, 'frames': len(packet) }, 200
+
+@app.route('/ingest', methods=['POST'])
+def ingest():
+    """
+    Accept telemetry from external Webots supervisor controller.
+    Body: { "unit_id"?: str, "sensors": [ {id, type, value, min?, max?, unit?}, ... ] }
+    or the compact binary format (Content-Type: application/x-datchiki-frames).
+    """
+    if request.mimetype == wire.CONTENT_TYPE:
+        out, status = ingest_packet(request.get_data(cache=False))
+    else:
+        out, status = ingest_json(request.get_json(force=True, silent=True) or {})
+    return jsonify(out), status, retry_headers(out)
+
+class StreamIngest:
+    """Running summary of one /ingest/stream upload; add() analyzes one parsed line."""
+
+    def __init__(self, forward=False):
+        self.forward = forward
+        self.frames = self.sensors = self.errors = 0
+        self.severities = { 'normal': 0, 'warning': 0, 'critical': 0 }
+        self.units = set()
+        self.first_ts = self.last_ts = None
+
+    def add(self, unit_id, ts, sensors):
+        if sensors is None:
+            self.errors += 1
+            return
+        # a client ts that is not a number counts as missing, for the analysis and the summary alike
+        if isinstance(ts, bool) or not isinstance(ts, (int, float)):
+            ts = None
+        unit = units.get(unit_id)
+        analyzed = analyze_sensors(unit, sensors, ts)
+        self.frames += 1
+        self.sensors += len(analyzed)
+        self.units.add(unit.unit_id)
+        severities = self.severities
+        for s in analyzed:
+            sev = s.get('severity')
+            if sev in severities:
+                severities[sev] += 1
+        if ts is not None:
+            if self.first_ts is None:
+                self.first_ts = ts
+            self.last_ts = ts
+        if self.forward:
+            forward(unit, analyzed)
+            hub.publish(unit.unit_id, analyzed)
+
+    def result(self):
+        log.info('[PY-INGEST-STREAM] frames=%d errors=%d units=%d', self.frames, self.errors, len(self.units))
+        return {
+            'ok': True,
+            'frames': self.frames,
+            'sensors': self.sensors,
+            'errors': self.errors,
+            'units': len(self.units),
+            'severities': self.severities,
+            'first_ts': self.first_ts,
+            'last_ts': self.last_ts,
+        }
+
+@app.route('/ingest/stream', methods=['POST'])
+def ingest_stream():
+    """
+    Bulk backfill from data loggers: chunked NDJSON, one frame per line,
+    { "unit_id"?, "ts"?, "sensors": [...] } or a flat telemetry dict.
+    Frames are parsed and analyzed one by one as the body arrives, so memory stays
+    flat regardless of upload size. ?forward=1 also forwards each frame to Nest.
+    """
+    summary = StreamIngest(request.args.get('forward') == '1')
+    for unit_id, ts, sensors in iter_frames(iter_lines(request.stream)):
+        summary.add(unit_id, ts, sensors)
+    return jsonify(summary.result())
+
+def _arg(params, key, default=None, type=str):
+    # like werkzeug's args.get(key, default, type): a value that does not convert gives the default
+    raw = params.get(key)
+    if raw is None:
+        return default
+    try:
+        return type(raw)
+    except (TypeError, ValueError):
+        return default
+
+def history_response(params):
+    """
+    Recent samples of one unit from its in-memory ring; returns (payload, status).
+    ?unit_id=, ?sensor=id[,id...] (default: all with data), ?from=&to= (epoch seconds)
+    or ?last=seconds (default 600), ?points= (default 500) and ?mode=:
+    raw - samples as stored; lttb - at most `points` samples chosen to keep the shape;
+    minmax - `points` time buckets with min/max/mean, sample count n and worst severity.
+    Windows with no more than `points` samples are returned raw in every mode.
+    """
+    if timeseries.np is None:
+        return { 'ok': False, 'error': 'history needs numpy' }, 501
+    unit = units.peek(params.get('unit_id'))
+    hist = unit.history if unit is not None else None
+    if hist is None:
+        return { 'ok': False, 'error': 'no history for unit' }, 404
+    mode = params.get('mode', 'minmax')
+    if mode not in ('raw', 'lttb', 'minmax'):
+        return { 'ok': False, 'error': 'mode must be raw, lttb or minmax' }, 400
+    points = max(3, _arg(params, 'points', 500, int))
+    t1 = _arg(params, 'to', None, float)
+    t0 = _arg(params, 'from', None, float)
+    if t1 is None:
+        t1 = time.time()
+    if t0 is None:
+        t0 = t1 - _arg(params, 'last', 600.0, float)
+    wanted = params.get('sensor')
+    ids = [x for x in wanted.split(',') if x] if wanted else hist.sensors()
+    out = {}
+    with unit.lock:
+        windows = { sid: hist.window(sid, t0, t1) for sid in ids }
+    for sid, (ts, v, sev) in windows.items():
+        samples = int(len(ts))
+        if mode == 'minmax' and samples > points:
+            b = bucket_stats(ts, v, sev, points, t0, t1)
+            out[sid] = { 'mode': 'minmax', 'samples': samples, 't': b['t'], 'min': b['min'], 'max': b['max'],
+                         'mean': b['mean'], 'n': b['count'], 'severity': b['severity'] }
+            continue
+        if mode == 'lttb' and samples > points:
+            idx = lttb(ts, v, points)
+            ts, v, sev = ts[idx], v[idx], sev[idx]
+        out[sid] = { 'mode': 'lttb' if len(ts) < samples else 'raw', 'samples': samples, 't': ts, 'v': v, 'severity': sev }
+    return { 'ok': True, 'unit_id': unit.unit_id, 'from': t0, 'to': t1, 'sensors': out }, 200
+
+@app.route('/history', methods=['GET'])
+def history():
+    out, status = history_response(request.args)
+    return Response(jsonfast.dumps(out), status=status, mimetype='application/json')
+
+def forwarder_payload():
+    out = { **forwarder.stats(), 'stream': hub.stats() }
+    out['simulate'] = simulated.stats()
+    if delta is not None:
+        out['delta'] = delta.stats()
+    if admission is not None:
+        out['admission'] = admission.stats()
+    if webots.connected:
+        out['webots'] = webots.stats()
+    if tlog is not None:
+        out['telemetry_log'] = tlog.stats()
+    if snapshots is not None:
+        out['snapshot'] = snapshots.stats()
+    if frame_dispatch is not None:
+        out['scoring'] = { 'frames': frame_dispatch.stats(), 'sensors': score_dispatch.stats() }
+    return out
+
+@app.route('/forwarder', methods=['GET'])
+def forwarder_stats():
+    return jsonify(forwarder_payload())
+
+@app.route('/debug/profile', methods=['GET', 'POST'])
+def debug_profile():
+    """
+    Profiling state and the latest captures; POST { every?, memory?, routes?, keep? }
+    reconfigures it at runtime (every=0 turns it off). Only answered on loopback.
+    """
+    if request.remote_addr not in ('127.0.0.1', '::1'):
+        return jsonify({ 'ok': False, 'error': 'loopback only' }), 403
+    if request.method == 'POST':
+        body = request.get_json(force=True, silent=True) or {}
         try:
-            resp = requests.post('http://localhost:3000/sensors/ingest', json={'sensors': analyzed}, timeout=1.5)
-            print(f"[PY-FWD->NEST] status={getattr(resp, 'status_code', 'n/a')} count={len(analyzed)}", flush=True)
-        except Exception:
-            print("[PY-FWD->NEST] error forwarding to Nest", flush=True)
-    threading.Thread(target=_forward, daemon=True).start()
+            routes = body.get('routes')
+            if isinstance(routes, str):
+                routes = [r for r in routes.split(',') if r]
+            profiler.configure(body.get('every'), body.get('memory'), routes, body.get('keep'))
+        except (TypeError, ValueError):
+            return jsonify({ 'ok': False, 'error': 'every and keep must be integers' }), 400
+    return jsonify({ 'ok': True, **profiler.stats(), 'recent': profiler.recent(request.args.get('n', 10, type=int)) })
 
-    return jsonify({ 'ok': True, 'count': len(sensors) })
+@app.route('/metrics', methods=['GET'])
+def metrics_endpoint():
+    return Response(metrics.render(), content_type='text/plain; version=0.0.4; charset=utf-8')
 
 @app.route('/telemetry', methods=['POST'])
 def telemetry():
@@ -146,4 +672,5 @@ def telemetry():
     return ingest()
 
 if __name__ == '__main__':
-    app.run(port=5000)
+    start_webots()
+    app.run(port=int(os.getenv('AI_PORT', '5000')))
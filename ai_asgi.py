@@ -0,0 +1,214 @@
+"""
+asyncio serving mode of ai_analyzer.py: the same analysis, state and payloads,
+served by uvicorn/Starlette with async handlers and an async Nest forwarder.
+
+    python ai_asgi.py                 # one process on AI_PORT (default 5000)
+    python ai_asgi.py --workers 4     # unit-affinity router on AI_PORT + 4 worker processes
+    uvicorn ai_asgi:app --port 5000   # or under any ASGI server (one process)
+
+Handlers run the (short, CPU-bound) analysis inline on the event loop; only
+with SCORE_BATCHING (off by default, and slower for the built-in detector) it
+goes to a thread, since the dispatcher blocks until its batch is scored. /stream subscribers wait on the loop instead of holding a
+thread each, and the simulator tick is an asyncio task. Request profiling
+(/debug/profile) stays with the Flask server: cProfile follows one thread, and
+coroutines of concurrent requests interleave on it.
+"""
+import argparse
+import asyncio
+import contextlib
+import json
+import logging
+import os
+import time
+
+from starlette.applications import Starlette
+from starlette.requests import Request
+from starlette.responses import Response, StreamingResponse
+from starlette.routing import Route
+
+import ai_analyzer as core
+from analysis.units import DEFAULT_UNIT, partition, unit_key
+from observability import logs
+from transport import jsonfast, wire
+from transport.async_forwarder import AsyncNestForwarder
+from transport.ndjson import LineSplitter, iter_frames
+
+# position in a --workers deployment (set by serving/router.py); only the worker
+# that owns the default unit ticks it for /stream
+WORKER_INDEX = int(os.getenv('AI_WORKER_INDEX', '0'))
+WORKERS = int(os.getenv('AI_WORKERS', '1'))
+
+core.forwarder = AsyncNestForwarder(
+    os.getenv('NEST_INGEST_URL', 'http://localhost:3000/sensors/ingest'),
+    max_queue=int(os.getenv('FWD_QUEUE_MAX', '1000')),
+    batch_max=int(os.getenv('FWD_BATCH_MAX', '20')),
+    batch_window=float(os.getenv('FWD_BATCH_WINDOW_MS', '20')) / 1000.0,
+    # concurrent POSTs, each unit's frames through one of them (in order); tasks are cheap,
+    # and one POST per loop turn falls behind a busy loop
+    workers=int(os.getenv('FWD_WORKERS', '4')),
+    on_post=core.on_forward_post,
+)
+ROUTES = ('/ingest', '/telemetry', '/ingest/stream', '/simulate', '/stream', '/analyze', '/analyze/batch',
+          '/history', '/forwarder', '/metrics')
+SSE_HEADERS = { 'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no' }
+
+
+async def _call(fn, *args):
+    # the score dispatchers block the caller until the batch is scored
+    if core.frame_dispatch is not None:
+        return await asyncio.to_thread(fn, *args)
+    return fn(*args)
+
+
+def _json(payload, status: int = 200, headers=None) -> Response:
+    return Response(jsonfast.dumps(payload), status, headers, media_type='application/json')
+
+
+async def _body_json(request: Request):
+    try:
+        return json.loads(await request.body())
+    except ValueError:
+        return None
+
+
+async def ingest(request: Request) -> Response:
+    """POST /ingest and /telemetry: JSON frame or binary wire packet (see ai_analyzer.ingest)."""
+    if request.headers.get('content-type', '').split(';')[0].strip() == wire.CONTENT_TYPE:
+        out, status = await _call(core.ingest_packet, await request.body())
+    else:
+        out, status = await _call(core.ingest_json, await _body_json(request) or {})
+    return _json(out, status, core.retry_headers(out))
+
+
+async def ingest_stream(request: Request) -> Response:
+    """NDJSON backfill analyzed chunk by chunk as the body arrives."""
+    summary = core.StreamIngest(request.query_params.get('forward') == '1')
+    splitter = LineSplitter()
+    async for chunk in request.stream():
+        for unit_id, ts, sensors in iter_frames(splitter.feed(chunk)):
+            await _call(summary.add, unit_id, ts, sensors)
+    for unit_id, ts, sensors in iter_frames(splitter.close()):
+        await _call(summary.add, unit_id, ts, sensors)
+    return _json(summary.result())
+
+
+async def simulate(request: Request) -> Response:
+    frame = await _call(core.simulated.get, unit_key(request.query_params.get('unit_id')))
+    return Response(frame.body, media_type='application/json')
+
+
+async def stream(request: Request) -> Response:
+    unit_id = request.query_params.get('unit_id')
+    sub = core.hub.subscribe(unit_key(unit_id) if unit_id else None, request.query_params.get('source'),
+                             core._arg(request.query_params, 'buffer', 64, int))
+    return StreamingResponse(core.hub.aevents(sub), media_type='text/event-stream', headers=SSE_HEADERS)
+
+
+async def analyze(request: Request) -> Response:
+    data = await _body_json(request)
+    if not isinstance(data, dict):
+        data = {}
+    res = await _call(core.score_sensor, data, core.units.peek(data.get('unit_id')))
+    return _json({ 'risk': res.get('severity'), 'probability': res.get('risk_probability') })
+
+
+async def analyze_batch(request: Request) -> Response:
+    out, status = await _call(core.batch_response, await _body_json(request))
+    return _json(out, status)
+
+
+async def history(request: Request) -> Response:
+    out, status = core.history_response(request.query_params)
+    return _json(out, status)
+
+
+async def forwarder_stats(request: Request) -> Response:
+    return _json(core.forwarder_payload())
+
+
+async def metrics_endpoint(request: Request) -> Response:
+    return Response(core.metrics.render(), media_type='text/plain; version=0.0.4; charset=utf-8')
+
+
+async def _sim_tick():
+    period = 1.0 / core.SIM_TICK_HZ
+    # units polled here are owned here; the stream's default unit only by its owner
+    stream_default = partition(DEFAULT_UNIT, WORKERS) == WORKER_INDEX
+    loop = asyncio.get_running_loop()
+    deadline = loop.time()
+    while True:
+        deadline += period
+        await asyncio.sleep(max(0.0, deadline - loop.time()))
+        try:
+            await _call(core.sim_tick, stream_default)
+        except Exception:
+            logs.sampled(core.log, logging.WARNING, 'sim-tick', '[PY-SIM-TICK] simulation step failed')
+        if deadline < loop.time() - period:
+            deadline = loop.time()
+
+
+@contextlib.asynccontextmanager
+async def lifespan(app):
+    await core.forwarder.start()
+    core.start_webots()
+    tick = None
+    if core.SIM_TICK_HZ > 0:
+        tick = asyncio.create_task(_sim_tick())
+    try:
+        yield
+    finally:
+        if tick is not None:
+            tick.cancel()
+        await core.forwarder.stop()
+
+
+class ObserveRequests:
+    """Request latency and status counters per route, like the Flask before/after_request hooks."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] != 'http':
+            return await self.app(scope, receive, send)
+        t0 = time.perf_counter()
+
+        async def send_observed(message):
+            # measured up to the response head, so a long-lived /stream counts its setup only
+            if message['type'] == 'http.response.start':
+                route = scope['path'] if scope['path'] in ROUTES else 'unmatched'
+                method = scope['method']
+                core.metrics.requests.observe(time.perf_counter() - t0, (route, method))
+                core.metrics.responses.inc((route, method, str(message['status'])))
+            await send(message)
+
+        await self.app(scope, receive, send_observed)
+
+
+app = ObserveRequests(Starlette(routes=[
+    Route('/ingest', ingest, methods=['POST']),
+    Route('/telemetry', ingest, methods=['POST']),
+    Route('/ingest/stream', ingest_stream, methods=['POST']),
+    Route('/simulate', simulate, methods=['GET']),
+    Route('/stream', stream, methods=['GET']),
+    Route('/analyze', analyze, methods=['POST']),
+    Route('/analyze/batch', analyze_batch, methods=['POST']),
+    Route('/history', history, methods=['GET']),
+    Route('/forwarder', forwarder_stats, methods=['GET']),
+    Route('/metrics', metrics_endpoint, methods=['GET']),
+], lifespan=lifespan))
+
+
+if __name__ == '__main__':
+    ap = argparse.ArgumentParser(description='asyncio serving mode of ai_analyzer.py')
+    ap.add_argument('--workers', type=int, default=int(os.getenv('AI_WORKERS', '1')),
+                    help='worker processes behind a unit-affinity router (default AI_WORKERS or 1)')
+    args = ap.parse_args()
+    host = os.getenv('AI_HOST', '127.0.0.1')
+    port = int(os.getenv('AI_PORT', '5000'))
+    if args.workers > 1:
+        from serving.router import serve
+        serve(os.path.abspath(__file__), host, port, args.workers)
+    else:
+        import uvicorn
+        uvicorn.run(app, host=host, port=port, log_level='warning', access_log=False)
@@ -1,6 +1,13 @@
 import { Injectable } from '@nestjs/common';
 import axios from 'axios';
 
+export interface AiFrame {
+  unit_id?: string;
+  source?: 'simulate' | 'ingest';
+  ts?: number;
+  sensors: any[];
+}
+
 @Injectable()
 export class AiService {
   async simulateSensors(): Promise<any[]> {
@@ -21,4 +28,90 @@ export class AiService {
       return 'normal';
     }
   }
+  /**
+   * Scores many sensors in one round trip instead of one /analyze call each.
+   * Risks come back in input order.
+   */
+  async analyzeBatch(
+    sensors: any[],
+    unitId?: string,
+  ): Promise<Array<'normal' | 'warning' | 'critical'>> {
+    try {
+      const res = await axios.post('http://localhost:5000/analyze/batch', {
+        unit_id: unitId,
+        sensors,
+      });
+      return (res.data?.results ?? []).map((r: any) => r.risk ?? 'normal');
+    } catch (error) {
+      console.error('AI batch analysis error', error);
+      return sensors.map(() => 'normal');
+    }
+  }
+  /**
+   * Runs whole frames through the analyzer, derived signals (ecu_errors, fuel_leak,
+   * overheat, emergency_stop) included. With unitId the frames advance that unit's state.
+   */
+  async analyzeFrames(frames: any[][], unitId?: string): Promise<any[][]> {
+    try {
+      const res = await axios.post('http://localhost:5000/analyze/batch', {
+        unit_id: unitId,
+        frames,
+      });
+      return res.data?.frames ?? [];
+    } catch (error) {
+      console.error('AI frame analysis error', error);
+      return [];
+    }
+  }
+  /**
+   * Subscribes to the Python server-sent events stream of analyzed frames.
+   * source narrows it to 'simulate' or 'ingest' frames (ingest frames also arrive via POST /sensors/ingest).
+   * onClose fires once when the stream ends or fails; the returned function aborts it.
+   */
+  streamFrames(
+    onFrame: (frame: AiFrame) => void,
+    onClose: (error?: unknown) => void,
+    source?: 'simulate' | 'ingest',
+  ): () => void {
+    const controller = new AbortController();
+    let closed = false;
+    const close = (error?: unknown) => {
+      if (closed) return;
+      closed = true;
+      onClose(error);
+    };
+    axios
+      .get('http://localhost:5000/stream', {
+        params: source ? { source } : undefined,
+        responseType: 'stream',
+        signal: controller.signal,
+      })
+      .then((res) => {
+        let buf = '';
+        res.data.setEncoding('utf8');
+        res.data.on('data', (chunk: string) => {
+          buf += chunk;
+          let idx: number;
+          while ((idx = buf.indexOf('\n\n')) >= 0) {
+            const block = buf.slice(0, idx);
+            buf = buf.slice(idx + 2);
+            const data = block
+              .split('\n')
+              .filter((line) => line.startsWith('data:'))
+              .map((line) => line.slice(5).trimStart())
+              .join('\n');
+            if (!data) continue;
+            try {
+              onFrame(JSON.parse(data));
+            } catch (error) {
+              console.error('AI stream parse error', error);
+            }
+          }
+        });
+        res.data.on('end', () => close());
+        res.data.on('error', (error: unknown) => close(error));
+      })
+      .catch((error) => close(error));
+    return () => controller.abort();
+  }
 }
@@ -2,8 +2,20 @@ import { Controller, Get, Post, Body } from '@nestjs/common';
 import { SensorsService } from './sensors.service';
 import { AlertsGateway } from '../../alerts/alerts/alerts.gateway';
 
+// units whose last sensor list is kept for merging delta frames (least recently keyframed dropped first)
+const MAX_UNITS = 1000;
+
+// merged sensors of a unit, each with the seq of the frame that set it
+interface UnitView {
+  epoch: unknown;
+  seq: number;
+  sensors: Map<string, { sensor: any; seq: number }>;
+}
+
 @Controller('sensors')
 export class SensorsController {
+  private readonly units = new Map<string, UnitView>();
+
   constructor(
     private readonly sensorsService: SensorsService,
     private readonly alertsGateway: AlertsGateway,
@@ -17,9 +29,20 @@ export class SensorsController {
 
   @Post('ingest')
   async ingest(@Body() body: any): Promise<{ ok: boolean; count: number }>{
+    // Python forwarder coalesces bursts into one POST: { frames: [{ unit_id, sensors }, ...] }
+    const frames = Array.isArray(body?.frames) ? body.frames : [body];
+    let count = 0;
+    for (const frame of frames) {
+      count += this.ingestFrame(frame);
+    }
+    return { ok: true, count };
+  }
+
+  private ingestFrame(body: any): number {
     const sensors = Array.isArray(body?.sensors) ? body.sensors : [];
+    const merged = this.merge(String(body?.unit_id ?? 'default'), sensors, body);
     // Map incoming analyzed sensors to service state and emit immediately
-    this.sensorsService.sensors = sensors.map((s: any) => ({
+    this.sensorsService.sensors = merged.map((s: any) => ({
       id: s.id,
       type: s.type,
       value: s.value,
@@ -28,16 +51,54 @@ export class SensorsController {
       unit: s.unit,
       critical: s.severity === 'critical',
     }));
-    // Log and emit
+    // Log what arrived (only the changed sensors of a delta) and emit the unit's full list
     for (const s of sensors) {
       const status = s.severity === 'critical' ? 'NOT OK' : 'OK';
       const probStr = typeof s.risk_probability === 'number' ? ` p=${s.risk_probability}` : '';
       console.log(`[NEST-INGEST] ${s.id}=${s.value} status=${status}${probStr}`);
     }
-    console.log(`[NEST-EMIT] sensors:update count=${sensors.length}`);
-    this.alertsGateway.emit('sensors:update', sensors);
-    return { ok: true, count: sensors.length };
+    console.log(`[NEST-EMIT] sensors:update count=${merged.length}${body?.delta === true ? ` delta=${sensors.length}` : ''}`);
+    this.alertsGateway.emit('sensors:update', merged);
+    return sensors.length;
   }
-}
-
 
+  /**
+   * With FWD_DELTA=1 the Python forwarder sends a unit's full list as a keyframe
+   * ({ keyframe: true }) and then only the sensors that changed ({ delta: true }).
+   * A delta is merged into the last keyframe of its unit; plain frames pass through.
+   *
+   * Frames carry { epoch, seq } (one counter per Python process) and concurrent
+   * POSTs may deliver them out of order: a sensor is only replaced by a frame at
+   * least as new as the one that set it, so a late keyframe cannot overwrite a
+   * newer delta. Frames without seq merge in arrival order.
+   */
+  private merge(unitId: string, sensors: any[], body: any): any[] {
+    const delta = body?.delta === true;
+    if (!delta && body?.keyframe !== true) {
+      return sensors;
+    }
+    let state = this.units.get(unitId);
+    if (state && state.epoch !== body?.epoch) {
+      state = undefined; // another Python process: its seq count starts over
+    }
+    const seq = typeof body?.seq === 'number' ? body.seq : state ? state.seq + 1 : 0;
+    if (!state || (!delta && seq > state.seq)) {
+      // a keyframe newer than anything merged, or a delta before any keyframe (Nest restarted)
+      // that stays partial until the next one
+      state = { epoch: body?.epoch, seq, sensors: new Map() };
+      this.units.delete(unitId);
+      this.units.set(unitId, state);
+      if (this.units.size > MAX_UNITS) {
+        this.units.delete(this.units.keys().next().value as string);
+      }
+    }
+    for (const s of sensors) {
+      const cur = state.sensors.get(s.id);
+      if (!cur || cur.seq <= seq) {
+        state.sensors.set(s.id, { sensor: s, seq });
+      }
+    }
+    state.seq = Math.max(state.seq, seq);
+    return Array.from(state.sensors.values(), (e) => e.sensor);
+  }
+}
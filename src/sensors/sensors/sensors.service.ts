@@ -32,17 +32,48 @@ export class SensorsService implements OnModuleInit {
   async onModuleInit() {
     console.log('[NEST-BOOT] SensorsService initialized');
 
+    // AI_STREAM=0 возвращает старый опрос /simulate раз в 3 секунды
+    if (process.env.AI_STREAM === '0') {
+      this.startPolling();
+      return;
+    }
+    this.subscribe();
+  }
+
+  private startPolling() {
     setInterval(async () => {
       const sensors = await this.simulateSensors();
       console.log(`[NEST-SIM-EMIT] count=${sensors.length}`);
       this.alertsGateway.emit('sensors:update', sensors);
-    }, 3000); 
+    }, 3000);
+  }
+
+  // Одна подписка на SSE-поток симуляции Python вместо опроса; переподключение с экспоненциальной задержкой
+  private subscribe(attempt = 0) {
+    this.aiService.streamFrames(
+      (frame) => {
+        attempt = 0;
+        const sensors = this.applyFrame(frame?.sensors ?? []);
+        console.log(`[NEST-STREAM-EMIT] unit=${frame?.unit_id ?? 'default'} count=${sensors.length}`);
+        this.alertsGateway.emit('sensors:update', sensors);
+      },
+      (error) => {
+        const delay = Math.min(30000, 1000 * 2 ** attempt);
+        console.error(`[NEST-STREAM] disconnected, retry in ${delay}ms`, error ?? '');
+        setTimeout(() => this.subscribe(attempt + 1), delay);
+      },
+      // кадры /ingest уже приходят через POST /sensors/ingest
+      'simulate',
+    );
   }
 
   async simulateSensors(): Promise<Sensor[]> {
     // Получаем симулированные данные и риски из Python (Webots/ASL + PySAD/Sintel)
     const simulated = await this.aiService.simulateSensors();
+    return this.applyFrame(simulated);
+  }
 
+  private applyFrame(simulated: any[]): Sensor[] {
     // Приводим к нашему типу и логируем
     this.sensors = (simulated || []).map((s: any) => {
       const severity = s.severity as 'normal' | 'warning' | 'critical' | undefined;